@@ -0,0 +1 @@
+"""Shared building blocks (caches, plugins, policies) used by the agent packages."""
@@ -0,0 +1,151 @@
+"""Small in-process caches shared by the agent packages.
+
+`TTLCache` is a bounded LRU map whose entries expire after a TTL and can be
+served "stale" for a grace period while a refresh happens in the background.
+`SingleFlight` collapses concurrent calls for the same key into one call.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Freshness of a cache lookup
+FRESH = "fresh"
+STALE = "stale"
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a cache."""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["hit_rate"] = round(self.hit_rate, 4)
+        return data
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and an optional stale window.
+
+    An entry is *fresh* for `ttl` seconds after it was stored and *stale* for a
+    further `stale_ttl` seconds; after that it is treated as missing.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 300.0,
+        stale_ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, expires_at)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+    def lookup(self, key: Hashable) -> Tuple[Any, Optional[str]]:
+        """Returns (value, FRESH|STALE) or (None, None) and updates the counters."""
+        now = self._clock()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.stats.hits += 1
+                    return value, FRESH
+                if now < expires_at + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stats.stale_hits += 1
+                    return value, STALE
+                del self._data[key]
+            self.stats.misses += 1
+            return None, None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the fresh value for `key`, or `default`."""
+        value, state = self.lookup(key)
+        return value if state == FRESH else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.shared = 0  # callers that piggy-backed on an in-flight call
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Calls `fn()` unless a call for `key` is already running, then waits for it."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
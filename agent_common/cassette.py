@@ -0,0 +1,384 @@
+"""Record/replay cassettes of model and tool traffic, for deterministic load tests.
+
+Recording: `CassetteRecorder` is a plugin that appends to a cassette every
+user message, every model call that actually reaches the model (cache hits
+and callback short-circuits never do) and every client-side tool call. A
+cassette is an append-only JSONL file with one compact record per line, and
+several worker processes can append to the same file. A model call keeps its
+answer (the streamed chunks with their offsets, and the final response) and
+its latency. Its request is kept as a fingerprint from
+`fingerprint_llm_request` plus the latest user message, not in full: every
+request repeats the whole history. A tool call keeps its arguments, result,
+latency and the state changes it made.
+
+Replay: `install_replay` swaps every model in an agent tree for a `ReplayLlm`
+and every function tool for a `ReplayTool`, both backed by a loaded
+`Cassette`. It is the same swap `install_fakes` does, so runs go through the
+same runner, plugins and callbacks, and only the network is replaced. Each
+recorded answer is served after its recorded latency times `latency_scale`
+(0 serves it at once). Each replayed call appends (start, start + scaled
+recorded latency) to the list in `replay_spans`, when a caller has set one,
+so a load test can split a turn's wall time into replayed latency and
+orchestration overhead. Event-loop lag that stretches a replayed call under
+load counts as overhead.
+
+Lookup: a model call is matched by its exact fingerprint. Failing that, it
+is matched by (agent, latest user message, step within the turn), the same
+position FakeLlm scripts use, so a cassette recorded with one version still
+replays after an instruction or plugin changes the prompts. Last comes
+(agent, step): the latest user message of an agent reading other agents'
+output depends on which of them finished last. A tool call is
+matched by name and arguments, then by name alone. Repeated keys cycle
+through their recorded answers in order. A call with no recording raises
+`CassetteMiss`, or goes to the real model/tool with `strict=False`.
+
+    app = App(..., plugins=[..., CassetteRecorder("traffic.cassette.jsonl")])
+    cassette = Cassette.load("traffic.cassette.jsonl")
+    install_replay(root_agent, cassette, latency_scale=0.5)
+"""
+import asyncio
+import atexit
+import contextvars
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.function_tool import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+from pydantic import PrivateAttr
+
+from agent_common.fakes import AGENT_LABEL, FakeLlm, iter_agents
+from agent_common.response_cache import _normalize, fingerprint_llm_request
+
+logger = logging.getLogger(__name__)
+
+USER, MODEL, TOOL = "user", "model", "tool"
+EXACT, TURN, AGENT, NAME, MISS = "exact", "turn", "agent", "name", "miss"
+# Tool-context actions a replayed tool call re-applies
+_REPLAYED_ACTIONS = ("state_delta", "transfer_to_agent", "escalate", "skip_summarization")
+
+replay_spans: contextvars.ContextVar[Optional[List[Tuple[float, float]]]] = contextvars.ContextVar(
+    "replay_spans", default=None)
+
+
+class CassetteMiss(LookupError):
+    """A replayed model or tool call has no recording in the cassette."""
+
+
+def tool_key(tool_name: str, args: Dict[str, Any]) -> str:
+    """Stable hash of a tool call (name and normalized arguments)."""
+    encoded = json.dumps(_normalize({"tool": tool_name, "args": args}), sort_keys=True, separators=(",", ":"),
+                         default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+def turn_position(llm_request: LlmRequest) -> Tuple[str, int]:
+    """(latest user message, whitespace-normalized; model turns since it) of a request."""
+    return " ".join(FakeLlm._latest_user_text(llm_request).split()), FakeLlm._step_index(llm_request)
+
+
+class CassetteWriter:
+    """Append-only JSONL writer. One write() per record, so processes appending to one file never interleave lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.records = 0
+        atexit.register(self.close)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, line)
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+# --- Recording ---
+
+class CassetteRecorder(BasePlugin):
+    """Appends user messages and the model and tool calls that really ran to a cassette."""
+
+    def __init__(self, path: str, name: str = "cassette_recorder"):
+        super().__init__(name=name)
+        self.writer = CassetteWriter(path)
+        # (invocation_id, agent, branch) -> [request, start time, chunks so far]
+        self._models: Dict[Tuple[str, str, Optional[str]], List[Any]] = {}
+        # (invocation_id, function_call_id) -> start time
+        self._tools: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def _call_key(callback_context: CallbackContext) -> Tuple[str, str, Optional[str]]:
+        branch = getattr(callback_context._invocation_context, "branch", None)
+        return callback_context.invocation_id, callback_context.agent_name, branch
+
+    async def on_user_message_callback(self, *, invocation_context, user_message) -> None:
+        # AgentTools run their agent in a nested runner; its "user" messages carry that agent's name
+        self.writer.write({
+            "kind": USER, "ts": round(time.time(), 3), "app": invocation_context.app_name,
+            "agent": invocation_context.agent.name, "session": invocation_context.session.id,
+            "user": invocation_context.user_id, "content": user_message.model_dump(mode="json", exclude_none=True),
+        })
+        return None
+
+    async def before_model_callback(self, *, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        # Only a call that reaches the model gets an after_model_callback; the others are never written.
+        # The request is fingerprinted then, after later plugins and callbacks have changed it.
+        self._models[self._call_key(callback_context)] = [llm_request, time.perf_counter(), []]
+        return None
+
+    async def after_model_callback(self, *, callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+        key = self._call_key(callback_context)
+        pending = self._models.get(key)
+        if pending is None:
+            return None
+        llm_request, started, chunks = pending
+        offset = round(time.perf_counter() - started, 4)
+        chunks.append([offset, llm_response.model_dump(mode="json", exclude_none=True)])
+        if llm_response.partial:
+            return None
+        del self._models[key]
+        query, step = turn_position(llm_request)
+        self.writer.write({
+            "kind": MODEL, "agent": callback_context.agent_name, "model": llm_request.model,
+            "key": fingerprint_llm_request(llm_request), "query": query, "step": step,
+            "latency": offset, "chunks": chunks,
+        })
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        self._models.pop(self._call_key(callback_context), None)
+        return None
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext):
+        if not hasattr(tool, "agent"):  # an AgentTool's own model and tool calls are recorded instead
+            self._tools[tool_context.invocation_id, tool_context.function_call_id] = time.perf_counter()
+        return None
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext,
+                                  result: Any):
+        started = self._tools.pop((tool_context.invocation_id, tool_context.function_call_id), None)
+        if started is None:
+            return None
+        actions = tool_context.actions.model_dump(mode="json", include=set(_REPLAYED_ACTIONS), exclude_none=True)
+        self.writer.write({
+            "kind": TOOL, "agent": tool_context.agent_name, "tool": tool.name, "key": tool_key(tool.name, tool_args),
+            "args": tool_args, "latency": round(time.perf_counter() - started, 4), "result": result,
+            **({"actions": {k: v for k, v in actions.items() if v}} if any(actions.values()) else {}),
+        })
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._tools.pop((tool_context.invocation_id, tool_context.function_call_id), None)
+        return None
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        # Calls short-circuited by a callback or another plugin never get an after_model_callback
+        invocation_id = invocation_context.invocation_id
+        for key in [k for k in self._models if k[0] == invocation_id]:
+            del self._models[key]
+        for key in [k for k in self._tools if k[0] == invocation_id]:
+            del self._tools[key]
+
+    async def close(self) -> None:
+        # AgentTool closes its nested runner, and with it every plugin (shared with the parent runner
+        # and its other runs), after each call: keep the in-flight calls, and the file open until
+        # exit (or `writer.close()`).
+        return None
+
+
+# --- Replay ---
+
+class Cassette:
+    """Recorded traffic indexed for replay."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.users: List[Dict[str, Any]] = []
+        self._index: Dict[Tuple, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[Tuple, int] = defaultdict(int)
+        self._stats: Counter = Counter()
+        for record in records:
+            kind = record.get("kind")
+            if kind == USER:
+                self.users.append(record)
+            elif kind == MODEL:
+                self._index[(MODEL, EXACT, record["agent"], record["key"])].append(record)
+                self._index[(MODEL, TURN, record["agent"], record["query"], record["step"])].append(record)
+                self._index[(MODEL, AGENT, record["agent"], record["step"])].append(record)
+            elif kind == TOOL:
+                self._index[(TOOL, EXACT, record["key"])].append(record)
+                self._index[(TOOL, NAME, record["tool"])].append(record)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.loads(line) for line in f if line.strip())
+
+    def _next(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        recorded = self._index.get(key)
+        if not recorded:
+            return None
+        position = self._cursors[key]
+        self._cursors[key] = position + 1
+        return recorded[position % len(recorded)]
+
+    def model_answer(self, agent: str, llm_request: LlmRequest) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(recorded model call, match kind) for a request; (None, MISS) when nothing matches."""
+        record = self._next((MODEL, EXACT, agent, fingerprint_llm_request(llm_request)))
+        if record is not None:
+            self._stats[f"model_{EXACT}"] += 1
+            return record, EXACT
+        query, step = turn_position(llm_request)
+        for match, key in ((TURN, (MODEL, TURN, agent, query, step)), (AGENT, (MODEL, AGENT, agent, step))):
+            record = self._next(key)
+            if record is not None:
+                self._stats[f"model_{match}"] += 1
+                return record, match
+        self._stats[f"model_{MISS}"] += 1
+        return None, MISS
+
+    def tool_answer(self, tool_name: str, args: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(recorded tool call, match kind) for a call; (None, MISS) when the tool was never recorded."""
+        record = self._next((TOOL, EXACT, tool_key(tool_name, args)))
+        if record is not None:
+            self._stats[f"tool_{EXACT}"] += 1
+            return record, EXACT
+        record = self._next((TOOL, NAME, tool_name))
+        self._stats[f"tool_{NAME if record else MISS}"] += 1
+        return record, NAME if record else MISS
+
+    def sessions(self, agent: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """Recorded sessions (their user messages in order) for a root agent, by first message time."""
+        by_session: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for record in self.users:
+            if agent is None or record["agent"] == agent:
+                by_session[(record["app"], record["session"])].append(record)
+        return sorted(by_session.values(), key=lambda turns: turns[0]["ts"])
+
+    def stats(self) -> Dict[str, int]:
+        """Replayed calls by match kind: model_exact/turn/agent/miss and tool_exact/name/miss."""
+        return dict(self._stats)
+
+
+def _record_span(started: float, latency: float) -> None:
+    spans = replay_spans.get()
+    if spans is not None:
+        spans.append((started, started + latency))
+
+
+class ReplayLlm(BaseLlm):
+    """Serves recorded model answers, with their recorded latency times `latency_scale`."""
+
+    inner: Optional[BaseLlm] = None
+    """The replaced model, called on a miss when not `strict`."""
+    latency_scale: float = 1.0
+    strict: bool = True
+
+    _cassette: Cassette = PrivateAttr()
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return []
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        started = time.perf_counter()
+        labels = llm_request.config.labels if llm_request.config and llm_request.config.labels else {}
+        agent_name = labels.get(AGENT_LABEL, "agent")
+        record, _ = self._cassette.model_answer(agent_name, llm_request)
+        if record is None:
+            if self.strict or self.inner is None:
+                query, step = turn_position(llm_request)
+                raise CassetteMiss(f"no recorded model call for {agent_name} (turn {query[:80]!r}, step {step})")
+            async for response in self.inner.generate_content_async(llm_request, stream):
+                yield response
+            return
+        latency = record["latency"] * self.latency_scale
+        try:
+            for offset, data in record["chunks"]:
+                if data.get("partial") and not stream:
+                    continue
+                delay = offset * self.latency_scale - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield LlmResponse.model_validate(data)
+        finally:
+            _record_span(started, latency)
+
+
+class ReplayTool(BaseTool):
+    """Serves a function tool's recorded results and re-applies the state changes it made."""
+
+    def __init__(self, inner: BaseTool, cassette: Cassette, latency_scale: float = 1.0, strict: bool = True):
+        super().__init__(name=inner.name, description=inner.description, is_long_running=inner.is_long_running)
+        self.inner = inner
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+    def _get_declaration(self):
+        return self.inner._get_declaration()
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        started = time.perf_counter()
+        record, _ = self.cassette.tool_answer(self.name, args)
+        if record is None:
+            if self.strict:
+                raise CassetteMiss(f"no recorded call of tool {self.name}")
+            return await self.inner.run_async(args=args, tool_context=tool_context)
+        latency = record["latency"] * self.latency_scale
+        try:
+            if latency > 0:
+                await asyncio.sleep(latency)
+            for name, value in record.get("actions", {}).items():
+                if name == "state_delta":
+                    tool_context.state.update(value)
+                else:
+                    setattr(tool_context.actions, name, value)
+            return copy.deepcopy(record["result"])
+        finally:
+            _record_span(started, latency)
+
+
+def install_replay(root_agent, cassette: Cassette, latency_scale: float = 1.0, strict: bool = True) -> None:
+    """Points every LLM agent in the tree (incl. AgentTools) at the cassette, and every function tool too.
+
+    Built-in tools such as google_search run inside the model call and are replayed with it;
+    AgentTools stay, and their agents' calls are replayed instead.
+    """
+    for agent in iter_agents(root_agent):
+        if not hasattr(agent, "model"):
+            continue
+        inner = agent.canonical_model
+        llm = ReplayLlm(model=inner.model, inner=inner, latency_scale=latency_scale, strict=strict)
+        llm._cassette = cassette
+        agent.model = llm
+        tools = []
+        for tool in agent.tools:
+            if callable(tool) and not isinstance(tool, BaseTool):
+                tool = FunctionTool(tool)
+            if isinstance(tool, FunctionTool) and not tool.is_long_running:
+                tool = ReplayTool(tool, cassette, latency_scale, strict)
+            tools.append(tool)
+        agent.tools = tools
@@ -0,0 +1,102 @@
+"""Compile fixed-order AgentTool coordinators into direct pipelines.
+
+A coordinator LLM whose instruction says it MUST call agent-tool A, then B,
+spends a model turn per step only to emit a call it has no choice about, and
+every step's output is fed back through the coordinator's context. When the
+order is fixed, `compile_coordinator` replaces the coordinator with a
+`CompiledCoordinator` that runs the wrapped agents directly, in order.
+
+Each step runs like AgentTool runs it (the user's message as input, the
+current session state, no conversation history) and its events, including
+the `output_key` state delta, go straight into the session, so later steps
+read earlier results from state. Tools outside the fixed order are the
+genuinely dynamic part: if there are any, a final LLM step (the coordinator
+with only those tools) runs after the fixed steps.
+"""
+import logging
+import re
+from typing import AsyncGenerator, List, Optional, Sequence
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.llm_agent import LlmAgent
+from google.adk.events.event import Event
+from google.adk.tools.agent_tool import AgentTool
+
+from agent_common.deadline_parallel import apply_event
+
+logger = logging.getLogger(__name__)
+
+MUST_CALL_PATTERN = re.compile(r"\bMUST\s+(?:call|use|invoke|run)\s+(?:the\s+)?`?([A-Za-z_][\w-]*)`?", re.IGNORECASE)
+
+
+def detect_tool_order(agent: LlmAgent) -> Optional[List[str]]:
+    """Agent-tool names the instruction says MUST be called, in order.
+
+    Returns None when the instruction is not a plain string, names no tool, or
+    makes a mandatory call to something that is not an AgentTool (whose
+    arguments only the LLM could fill in).
+    """
+    if not isinstance(agent.instruction, str):
+        return None
+    tools = {getattr(tool, "name", None): tool for tool in agent.tools}
+    order = []
+    for name in MUST_CALL_PATTERN.findall(agent.instruction):
+        tool = tools.get(name)
+        if not isinstance(tool, AgentTool):
+            return None
+        if name not in order:
+            order.append(name)
+    return order or None
+
+
+class CompiledCoordinator(BaseAgent):
+    """Runs its first `len(sub_agents) - dynamic_steps` sub-agents in order, without an LLM in between."""
+
+    dynamic_steps: int = 0
+    """1 when the last sub-agent is the LLM step for the tools outside the fixed order."""
+
+    def _step_ctx(self, ctx: InvocationContext) -> InvocationContext:
+        # AgentTool gives the wrapped agent a fresh session holding the state and one user
+        # message; do the same, with the turn's user message instead of a coordinator-written one.
+        user_events = [e for e in ctx.session.events if e.author == "user" and e.invocation_id == ctx.invocation_id]
+        session = ctx.session.model_copy(update={"events": user_events[-1:], "state": dict(ctx.session.state)})
+        return ctx.model_copy(update={"session": session})
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        fixed = self.sub_agents[:len(self.sub_agents) - self.dynamic_steps]
+        for step in fixed:
+            step_ctx = self._step_ctx(ctx)
+            async for event in step.run_async(step_ctx):
+                apply_event(step_ctx.session, event)
+                yield event
+                if ctx.end_invocation:
+                    return
+        for step in self.sub_agents[len(fixed):]:
+            async for event in step.run_async(ctx):
+                yield event
+
+
+def compile_coordinator(agent: LlmAgent, order: Optional[Sequence[str]] = None) -> BaseAgent:
+    """A CompiledCoordinator for `agent`, or `agent` itself if no fixed order is declared or detected."""
+    order = list(order) if order is not None else detect_tool_order(agent)
+    if not order:
+        logger.info("%s: no fixed tool order; keeping the LLM coordinator", agent.name)
+        return agent
+    tools = {getattr(tool, "name", None): tool for tool in agent.tools}
+    steps = [tools[name].agent.clone() for name in order]
+    dynamic_tools = [tool for tool in agent.tools if getattr(tool, "name", None) not in order]
+    if dynamic_tools:
+        note = (f"\n\nThe steps {', '.join(order)} have already run; their results are in the conversation. "
+                "Do not call them again.")
+        steps.append(agent.clone(update={
+            "name": f"{agent.name}_dynamic",
+            "tools": dynamic_tools,
+            "instruction": agent.instruction + note if isinstance(agent.instruction, str) else agent.instruction,
+        }))
+    return CompiledCoordinator(
+        name=agent.name,
+        description=agent.description,
+        sub_agents=steps,
+        dynamic_steps=1 if dynamic_tools else 0,
+    )
@@ -0,0 +1,253 @@
+"""ParallelAgent with an overall deadline and hedged (duplicate) branch requests.
+
+`DeadlineParallelAgent` runs its sub-agents concurrently like `ParallelAgent`,
+but:
+
+* Once a branch has been running longer than its usual latency (a percentile of
+  its recent run times, or `hedge_after_s` until there is enough history), a
+  duplicate "hedge" run of the same sub-agent is started and whichever attempt
+  finishes first wins; the other is cancelled.
+* When `deadline_s` expires, unfinished branches are cancelled and their
+  `output_key` is set to a placeholder, so later agents whose instructions
+  reference `{output_key}` still render. Failed branches get a placeholder too.
+
+Each attempt runs against a private copy of the session and its events are
+buffered; only the winning attempt's events are yielded (when the branch
+finishes), so the session never contains a loser's or a cut-off branch's
+half-finished turn. Per-branch timings are written to session state under
+`timings_state_key`; cumulative counters are available from `stats()`.
+
+A cancelled attempt never reaches its after_model/after_tool callbacks, so
+plugins that hold per-call state until then can define
+`release_branch(invocation_id, branch)`: it is called for every plugin of the
+runner when an attempt is cancelled (see `in_branch`).
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional
+
+from google.adk.agents import ParallelAgent
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions.state import State
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+HEDGE_BRANCH_SUFFIX = ".hedge"
+"""Appended to the branch of hedge attempts (so per-call caches keep them apart)."""
+
+PRIMARY, HEDGE, TIMEOUT, ERROR = "primary", "hedge", "timeout", "error"
+
+
+def is_hedge_branch(branch: Optional[str]) -> bool:
+    """True for invocation branches created for a hedge attempt."""
+    return bool(branch) and branch.endswith(HEDGE_BRANCH_SUFFIX)
+
+
+def in_branch(branch: Optional[str], root: str) -> bool:
+    """True if `branch` is `root` or nested below it."""
+    return bool(branch) and (branch == root or branch.startswith(root + "."))
+
+
+def release_branch(ctx: InvocationContext) -> None:
+    """Lets every plugin drop the per-call state it holds for the (cancelled) branch of `ctx`."""
+    for plugin in ctx.plugin_manager.plugins:
+        release = getattr(plugin, "release_branch", None)
+        if release is not None:
+            release(ctx.invocation_id, ctx.branch)
+
+
+def apply_event(session, event: Event) -> None:
+    """Applies `event` to an in-memory (private) session copy, as append_event would, minus persistence."""
+    if event.partial:
+        return
+    session.events.append(event)
+    for key, value in (event.actions.state_delta or {}).items() if event.actions else ():
+        if not key.startswith(State.TEMP_PREFIX):
+            session.state[key] = value
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class BranchStats:
+    runs: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        return {
+            "runs": self.runs,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "p50_s": statistics.median(latencies) if latencies else None,
+            "p95_s": _percentile(latencies, 95) if latencies else None,
+        }
+
+
+@dataclass
+class _Attempt:
+    kind: str
+    events: List[Event] = field(default_factory=list)
+
+
+class DeadlineParallelAgent(ParallelAgent):
+    """ParallelAgent that hedges slow branches and cuts off stragglers at a deadline."""
+
+    deadline_s: Optional[float] = None
+    """Overall time budget for all branches; None waits for every branch."""
+    hedge_percentile: Optional[float] = None
+    """Start a hedge once a branch exceeds this percentile (0-100) of its history; None disables hedging."""
+    hedge_after_s: Optional[float] = None
+    """Hedge delay to use until a branch has `hedge_min_samples` recorded runs."""
+    hedge_min_samples: int = 5
+    placeholder: str = "[{agent} returned no results ({reason} after {elapsed:.1f}s).]"
+    """State value for branches that time out or fail. Fields: agent, reason, elapsed."""
+    timings_state_key: Optional[str] = "parallel_timings"
+
+    _branch_stats: Dict[str, BranchStats] = PrivateAttr(default_factory=dict)
+
+    # --- attempt plumbing ---
+
+    def _branch_ctx(self, sub_agent: BaseAgent, ctx: InvocationContext, hedge: bool) -> InvocationContext:
+        suffix = f"{self.name}.{sub_agent.name}" + (HEDGE_BRANCH_SUFFIX if hedge else "")
+        branch = f"{ctx.branch}.{suffix}" if ctx.branch else suffix
+        # Private session copy: the attempt sees its own events while they are buffered.
+        session = ctx.session.model_copy(update={"events": list(ctx.session.events), "state": dict(ctx.session.state)})
+        return ctx.model_copy(update={"branch": branch, "session": session})
+
+    async def _run_attempt(self, sub_agent: BaseAgent, ctx: InvocationContext, attempt: _Attempt) -> _Attempt:
+        try:
+            async for event in sub_agent.run_async(ctx):
+                apply_event(ctx.session, event)
+                if not event.partial:
+                    attempt.events.append(event)
+        except asyncio.CancelledError:
+            # Lost the hedge race or missed the deadline, possibly mid model/tool call
+            release_branch(ctx)
+            raise
+        return attempt
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        if self.hedge_percentile is None:
+            return None
+        latencies = self._branch_stats[name].latencies
+        if len(latencies) >= self.hedge_min_samples:
+            return _percentile(latencies, self.hedge_percentile)
+        return self.hedge_after_s
+
+    async def _run_branch(self, sub_agent: BaseAgent, ctx: InvocationContext) -> _Attempt:
+        """Runs one branch (with an optional hedge) and returns the winning attempt."""
+        stats = self._branch_stats[sub_agent.name]
+        primary_ctx = self._branch_ctx(sub_agent, ctx, hedge=False)
+        running = {asyncio.create_task(self._run_attempt(sub_agent, primary_ctx, _Attempt(PRIMARY)))}
+        try:
+            delay = self._hedge_delay(sub_agent.name)
+            if delay is not None:
+                done, _ = await asyncio.wait(running, timeout=delay)
+                if not done:
+                    stats.hedges += 1
+                    hedge_ctx = self._branch_ctx(sub_agent, ctx, hedge=True)
+                    running.add(asyncio.create_task(self._run_attempt(sub_agent, hedge_ctx, _Attempt(HEDGE))))
+            error = None
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    # --- main loop ---
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if not self.sub_agents:
+            return
+        started = time.perf_counter()
+        tasks: Dict[asyncio.Task, BaseAgent] = {}
+        for sub_agent in self.sub_agents:
+            self._branch_stats.setdefault(sub_agent.name, BranchStats())
+            if not ctx.end_of_agents.get(sub_agent.name):
+                tasks[asyncio.create_task(self._run_branch(sub_agent, ctx))] = sub_agent
+
+        timings: Dict[str, Dict[str, Any]] = {}
+        placeholders: Dict[str, str] = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                remaining = None if self.deadline_s is None else self.deadline_s - (time.perf_counter() - started)
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    sub_agent = tasks[task]
+                    stats = self._branch_stats[sub_agent.name]
+                    elapsed = time.perf_counter() - started
+                    stats.runs += 1
+                    if task.exception() is not None:
+                        stats.errors += 1
+                        logger.warning("%s: branch %s failed: %r", self.name, sub_agent.name, task.exception())
+                        timings[sub_agent.name] = {"elapsed_s": round(elapsed, 3), "outcome": ERROR}
+                        self._add_placeholder(placeholders, sub_agent, ERROR, elapsed)
+                        continue
+                    attempt = task.result()
+                    stats.latencies.append(elapsed)
+                    stats.hedge_wins += attempt.kind == HEDGE
+                    timings[sub_agent.name] = {"elapsed_s": round(elapsed, 3), "outcome": attempt.kind}
+                    canonical_branch = self._branch_ctx(sub_agent, ctx, hedge=False).branch
+                    for event in attempt.events:
+                        event.branch = canonical_branch
+                        yield event
+        finally:
+            for task in pending:
+                task.cancel()
+
+        elapsed = time.perf_counter() - started
+        for task in pending:
+            sub_agent = tasks[task]
+            stats = self._branch_stats[sub_agent.name]
+            stats.runs += 1
+            stats.timeouts += 1
+            timings[sub_agent.name] = {"elapsed_s": round(elapsed, 3), "outcome": TIMEOUT}
+            self._add_placeholder(placeholders, sub_agent, TIMEOUT, elapsed)
+            logger.warning("%s: branch %s missed the %.1fs deadline", self.name, sub_agent.name, self.deadline_s)
+
+        state_delta = dict(placeholders)
+        if self.timings_state_key:
+            state_delta[self.timings_state_key] = timings
+        if state_delta:
+            yield Event(
+                invocation_id=ctx.invocation_id,
+                author=self.name,
+                branch=ctx.branch,
+                actions=EventActions(state_delta=state_delta),
+            )
+
+    def _add_placeholder(self, placeholders: Dict[str, str], sub_agent: BaseAgent, reason: str, elapsed: float):
+        output_key = getattr(sub_agent, "output_key", None)
+        if output_key:
+            placeholders[output_key] = self.placeholder.format(agent=sub_agent.name, reason=reason, elapsed=elapsed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Cumulative per-branch counters: runs, hedges, hedge wins, timeouts, errors, p50/p95 latency."""
+        return {name: stats.as_dict() for name, stats in self._branch_stats.items()}
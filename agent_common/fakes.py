@@ -0,0 +1,352 @@
+"""Deterministic offline stand-ins for Gemini, Google Search and OpenWeatherMap.
+
+`FakeLlm` is a `BaseLlm` with configurable latency, token counts and
+per-agent scripts of function calls, so any `root_agent` in this repo can be
+driven through a real runner without network access. `install_fakes` swaps it
+(plus the stub search backend and a fake weather endpoint) into an agent tree.
+
+`FakeGeminiServer` is a local HTTP endpoint speaking the generateContent REST
+API with a server-side quota, for exercising the real client stack
+(PooledGemini, rate limiting, retries) under throttling.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import Field, PrivateAttr
+
+from agent_common.search_cache import StubSearchBackend, use_stub_search
+
+AGENT_LABEL = "adk_agent_name"  # label ADK puts on every request (see base_llm_flow)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for fake usage metadata."""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class ScriptStep:
+    """One model turn: a function call (`call` + `args`) or a text answer (`text`).
+
+    String values in `args` and `text` may use {query}, the latest user text.
+    """
+    call: Optional[str] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+    text: Optional[str] = None
+
+
+def _fill(value: Any, query: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{query}", query)
+    if isinstance(value, list):
+        return [_fill(v, query) for v in value]
+    if isinstance(value, dict):
+        return {k: _fill(v, query) for k, v in value.items()}
+    return value
+
+
+@dataclass
+class FakeLlmStats:
+    calls: int = 0
+    streamed_calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    simulated_s: float = 0.0
+    calls_by_agent: Dict[str, int] = field(default_factory=dict)
+
+
+class FakeLlm(BaseLlm):
+    """Scripted, latency-simulating model.
+
+    For each request the step index is the number of model turns since the
+    latest user text, so a script like [call tool, text] makes the agent call
+    the tool once and then answer. Agents without a script answer with text.
+    """
+
+    model: str = "fake-gemini"
+    latency_s: float = 0.05
+    """Time to first token."""
+    tokens_per_s: float = 0.0
+    """Output speed; 0 means the whole answer arrives with the first token."""
+    output_tokens: int = 64
+    chunk_tokens: int = 8
+    """Tokens per partial response when streaming."""
+    scripts: Dict[str, List[ScriptStep]] = Field(default_factory=dict)
+
+    _stats: FakeLlmStats = PrivateAttr(default_factory=FakeLlmStats)
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"fake-.*"]
+
+    @property
+    def stats(self) -> FakeLlmStats:
+        return self._stats
+
+    @staticmethod
+    def _latest_user_text(llm_request: LlmRequest) -> str:
+        for content in reversed(llm_request.contents):
+            if content.role == "user" and content.parts and any(p.text for p in content.parts):
+                return " ".join(p.text for p in content.parts if p.text)
+        return ""
+
+    @staticmethod
+    def _step_index(llm_request: LlmRequest) -> int:
+        steps = 0
+        for content in reversed(llm_request.contents):
+            if content.role == "user" and content.parts and any(p.text for p in content.parts):
+                break
+            if content.role == "model":
+                steps += 1
+        return steps
+
+    def _answer_text(self, agent_name: str, query: str) -> str:
+        # Deterministic filler of `output_tokens` words derived from the request
+        seed = hashlib.sha256(f"{agent_name}|{query}".encode("utf-8")).hexdigest()
+        words = [f"{agent_name}:"] + [seed[i % 60:i % 60 + 4] for i in range(max(0, self.output_tokens - 1))]
+        return " ".join(words)
+
+    def _next_part(self, llm_request: LlmRequest, agent_name: str, query: str) -> types.Part:
+        script = self.scripts.get(agent_name, [])
+        step_index = self._step_index(llm_request)
+        if step_index < len(script):
+            step = script[step_index]
+            if step.call and step.call in llm_request.tools_dict:
+                return types.Part(function_call=types.FunctionCall(name=step.call, args=_fill(step.args, query)))
+            if step.text is not None:
+                return types.Part(text=_fill(step.text, query))
+        return types.Part(text=self._answer_text(agent_name, query))
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        labels = llm_request.config.labels if llm_request.config and llm_request.config.labels else {}
+        agent_name = labels.get(AGENT_LABEL, "agent")
+        query = self._latest_user_text(llm_request)
+        prompt_text = json.dumps(
+            [c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents], default=str
+        ) + str(llm_request.config.system_instruction if llm_request.config else "")
+        prompt_tokens = estimate_tokens(prompt_text)
+
+        part = self._next_part(llm_request, agent_name, query)
+        stats = self._stats
+        stats.calls += 1
+        stats.calls_by_agent[agent_name] = stats.calls_by_agent.get(agent_name, 0) + 1
+        stats.prompt_tokens += prompt_tokens
+
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency_s)
+        if part.text is not None and stream and self.tokens_per_s > 0:
+            stats.streamed_calls += 1
+            words = part.text.split(" ")
+            for start in range(0, len(words), self.chunk_tokens):
+                chunk = words[start:start + self.chunk_tokens]
+                await asyncio.sleep(len(chunk) / self.tokens_per_s)
+                text = " ".join(chunk) + (" " if start + self.chunk_tokens < len(words) else "")
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), partial=True)
+        elif part.text is not None and self.tokens_per_s > 0:
+            await asyncio.sleep(len(part.text.split(" ")) / self.tokens_per_s)
+
+        output_tokens = len(part.text.split(" ")) if part.text is not None else 8
+        stats.output_tokens += output_tokens
+        stats.simulated_s += time.perf_counter() - started
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            partial=False if stream else None,
+            turn_complete=True,
+            finish_reason=types.FinishReason.STOP,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
+
+
+class _FakeWeatherResponse:
+    def __init__(self, payload: Dict[str, Any]):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class FakeWeatherSession:
+    """Stand-in for the weather service's `requests.Session`: fixed latency, deterministic weather."""
+
+    CONDITIONS = ["clear sky", "light rain", "overcast clouds", "snow", "mist"]
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    def _city_payload(self, name: str, city_id: int = 0) -> Dict[str, Any]:
+        digest = int(hashlib.md5(name.casefold().encode("utf-8")).hexdigest(), 16)
+        return {
+            "id": city_id or digest % 10_000_000,
+            "name": name,
+            "main": {"temp": round(-5 + (digest % 400) / 10, 1)},
+            "weather": [{"description": self.CONDITIONS[digest % len(self.CONDITIONS)]}],
+        }
+
+    def get(self, url, params=None, timeout=None):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        params = params or {}
+        if "id" in params:
+            ids = [int(i) for i in str(params["id"]).split(",")]
+            return _FakeWeatherResponse({"cnt": len(ids), "list": [self._city_payload(str(i), i) for i in ids]})
+        return _FakeWeatherResponse(self._city_payload(params.get("q", "")))
+
+    def close(self):
+        pass
+
+
+@dataclass
+class FakeGeminiStats:
+    requests: int = 0
+    ok: int = 0
+    throttled: int = 0
+    unavailable: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class FakeGeminiServer:
+    """Local generateContent endpoint that throttles like the real API.
+
+    A request is answered 429 RESOURCE_EXHAUSTED when it would exceed
+    `max_concurrency` concurrent requests or the `rpm` quota (a token bucket
+    holding `burst` requests), and 503 UNAVAILABLE with probability
+    `error_rate`; otherwise it answers with a short text after `latency_s`.
+    Point a client at it with `ModelClientPool(base_url=server.url, api_key="fake")`.
+
+        async with FakeGeminiServer(rpm=600, max_concurrency=8) as server:
+            ...
+    """
+
+    def __init__(self, rpm: float = 600.0, burst: Optional[float] = None, max_concurrency: int = 8,
+                 error_rate: float = 0.0, latency_s: float = 0.05, host: str = "127.0.0.1", port: int = 0):
+        self.rate = rpm / 60.0
+        self.burst = burst if burst is not None else max(1.0, self.rate)
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self.latency_s = latency_s
+        self.host = host
+        self.port = port
+        self.stats = FakeGeminiStats()
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _error(self, web, code: int, status: str, message: str):
+        body = {"error": {"code": code, "message": message, "status": status}}
+        return web.json_response(body, status=code)
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        stats = self.stats
+        stats.requests += 1
+        if stats.in_flight >= self.max_concurrency or not self._take_token():
+            stats.throttled += 1
+            return self._error(web, 429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota).")
+        if self.error_rate and random.random() < self.error_rate:
+            stats.unavailable += 1
+            return self._error(web, 503, "UNAVAILABLE", "The model is overloaded. Please try again later.")
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            payload = await request.json()
+            prompt_tokens = estimate_tokens(json.dumps(payload.get("contents", [])))
+            await asyncio.sleep(self.latency_s)
+        finally:
+            stats.in_flight -= 1
+        stats.ok += 1
+        model = request.match_info["model_action"].split(":", 1)[0]
+        body = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": f"{model} says hello"}]},
+                            "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": 3,
+                              "totalTokenCount": prompt_tokens + 3},
+        }
+        if request.match_info["model_action"].endswith(":streamGenerateContent"):
+            return web.Response(text=f"data: {json.dumps(body)}\n\n", content_type="text/event-stream")
+        return web.json_response(body)
+
+    async def start(self) -> "FakeGeminiServer":
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/{version}/models/{model_action}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeGeminiServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+def iter_agents(root) -> List[Any]:
+    """Every agent in a tree, including agents wrapped in AgentTools."""
+    found, seen, stack = [], set(), [root]
+    while stack:
+        node = stack.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        found.append(node)
+        stack.extend(getattr(node, "sub_agents", []) or [])
+        stack.extend(getattr(tool, "agent", None) for tool in getattr(node, "tools", []) or [])
+    return found
+
+
+def install_fakes(
+    root_agent,
+    llm: FakeLlm,
+    search_backend: Optional[StubSearchBackend] = None,
+) -> StubSearchBackend:
+    """Points every LLM agent in the tree at `llm` and google_search at a stub backend."""
+    backend = search_backend or StubSearchBackend()
+    for agent in iter_agents(root_agent):
+        if hasattr(agent, "model"):
+            agent.model = llm
+    use_stub_search(root_agent, backend)
+    return backend
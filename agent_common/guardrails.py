@@ -0,0 +1,211 @@
+"""Compiled multi-pattern guardrail engine for `before_model_callback`s.
+
+Deny rules (plain keywords and regexes) are loaded from a JSON file and
+compiled once: keywords into an Aho-Corasick automaton, regexes into one
+combined pattern. Each message is scanned once, in time linear in its length,
+and verdicts are cached by message hash so repeated model calls in one
+invocation are free. The rules file is re-read when it changes on disk.
+
+Rules file format::
+
+    {
+      "message": "I cannot process this request because it contains the blocked keyword '{term}'.",
+      "keywords": ["BLOCK", "..."],
+      "patterns": ["\\\\bssn[:\\\\s]*\\\\d{3}-\\\\d{2}-\\\\d{4}\\\\b"]
+    }
+
+Keywords match case-insensitively anywhere in the text; patterns are compiled
+with re.IGNORECASE.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern
+
+from agent_common.cache import TTLCache
+
+DEFAULT_MESSAGE = "I cannot process this request because it contains the blocked keyword '{term}'."
+
+
+@dataclass(frozen=True)
+class GuardrailMatch:
+    """The rule that matched: `term` is the keyword as written in the rules, or the regex match text."""
+    term: str
+    kind: str  # "keyword" or "pattern"
+
+
+class AhoCorasick:
+    """Keyword automaton; `search` reports the first keyword found in one pass over the text."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [-1]  # index into self.keywords, -1 if no keyword ends here
+        for keyword in keywords:
+            if keyword:
+                self._insert(keyword)
+        self._build_failure_links()
+
+    def _insert(self, keyword: str) -> None:
+        state = 0
+        for ch in keyword.casefold():
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(-1)
+            state = nxt
+        if self._out[state] == -1:
+            self._out[state] = len(self.keywords)
+            self.keywords.append(keyword)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                # Inherit a match ending at the fallback state (suffix keywords)
+                if self._out[nxt] == -1:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> Optional[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text.casefold():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] != -1:
+                return self.keywords[out[state]]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+
+class _CompiledRules:
+    """Immutable compiled rule set; swapped as a whole on reload."""
+
+    def __init__(self, keywords: Iterable[str], patterns: Iterable[str], message: str, version: int):
+        self.automaton = AhoCorasick(keywords)
+        patterns = [p for p in patterns if p]
+        self.regex: Optional[Pattern[str]] = (
+            re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE) if patterns else None
+        )
+        self.pattern_count = len(patterns)
+        self.message = message
+        self.version = version
+
+    def scan(self, text: str) -> Optional[GuardrailMatch]:
+        keyword = self.automaton.search(text)
+        if keyword is not None:
+            return GuardrailMatch(keyword, "keyword")
+        if self.regex is not None:
+            match = self.regex.search(text)
+            if match:
+                return GuardrailMatch(match.group(0), "pattern")
+        return None
+
+
+class GuardrailEngine:
+    """Scans text against a compiled deny list with a verdict cache and hot reload."""
+
+    def __init__(
+        self,
+        keywords: Iterable[str] = (),
+        patterns: Iterable[str] = (),
+        message: str = DEFAULT_MESSAGE,
+        cache_size: int = 4096,
+        cache_ttl: float = 3600.0,
+    ):
+        self._rules = _CompiledRules(keywords, patterns, message, version=1)
+        self._verdicts = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self.path: Optional[str] = None
+        self.reload_interval = 0.0
+        self._mtime = 0.0
+        self._next_reload_check = 0.0
+        self.scans = 0
+
+    @classmethod
+    def from_file(cls, path: str, reload_interval: float = 5.0, **kwargs) -> "GuardrailEngine":
+        """Builds an engine from a rules file, re-checking its mtime every `reload_interval` seconds."""
+        engine = cls(**kwargs)
+        engine.path = path
+        engine.reload_interval = reload_interval
+        engine.reload()
+        return engine
+
+    @property
+    def message(self) -> str:
+        return self._rules.message
+
+    @property
+    def rule_count(self) -> int:
+        return len(self._rules.automaton) + self._rules.pattern_count
+
+    def reload(self) -> bool:
+        """Re-reads and recompiles the rules file if it changed. Returns True if rules were swapped."""
+        if not self.path:
+            return False
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding="utf-8") as f:
+                config = json.load(f)
+            self._rules = _CompiledRules(
+                config.get("keywords", []),
+                config.get("patterns", []),
+                config.get("message", DEFAULT_MESSAGE),
+                version=self._rules.version + 1,
+            )
+            self._mtime = mtime
+            # Cached verdicts belong to the previous rule set
+            self._verdicts.clear()
+            return True
+
+    def _maybe_reload(self) -> None:
+        if self.path and self.reload_interval >= 0:
+            now = time.monotonic()
+            if now >= self._next_reload_check:
+                self._next_reload_check = now + self.reload_interval
+                try:
+                    self.reload()
+                except (OSError, ValueError, re.error):
+                    # Keep enforcing the last good rule set if the file is mid-edit or broken
+                    pass
+
+    def check(self, text: str) -> Optional[GuardrailMatch]:
+        """Returns the first matching rule for `text`, or None if it is allowed."""
+        self._maybe_reload()
+        rules = self._rules
+        key = (rules.version, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        verdict = self._verdicts.get(key, _UNSEEN)
+        if verdict is not _UNSEEN:
+            return verdict
+        self.scans += 1
+        verdict = rules.scan(text)
+        self._verdicts.set(key, verdict)
+        return verdict
+
+    def stats(self) -> Dict[str, int]:
+        stats = self._verdicts.stats.as_dict()
+        stats.update(rules=self.rule_count, version=self._rules.version, scans=self.scans)
+        return stats
+
+
+_UNSEEN = object()
@@ -0,0 +1,292 @@
+"""Fan-out over a runtime list of topics with a bounded, hierarchical reduce.
+
+`MapReduceAgent` has two sub-agents, a mapper and a reducer. It reads a list
+of topics from session state (`topics_key`: a list, or text with one topic
+per line as a planner agent would write it) and:
+
+* runs the mapper once per topic, each run seeing its topic under
+  `topic_key`, with at most `max_concurrency` model-driven runs (mapper or
+  reducer) in flight;
+* combines the mapper outputs in a tree: leaf reports are grouped
+  `branching_factor` at a time in topic order, each group is summarized by a
+  reducer run that sees the group's reports under `reports_key`, and the
+  summaries are grouped again until one remains. A group is reduced as soon
+  as its last member is done, and reductions are started before further
+  leaves, so summaries stream out while leaves are still running;
+* keeps every reducer prompt bounded: when a group's reports exceed
+  `max_reduce_tokens`, each is compacted (extractive summary) to its share.
+
+Leaf and reducer runs use private session copies on their own branches, like
+DeadlineParallelAgent. With `isolate_runs` (the default) the only history a
+run sees is the user's message, so its prompt is its instruction, the request
+and its own turn, however long the session or the topic list. The
+`max_llm_calls` limit of the run config applies to each run separately. Their events are yielded as each run completes, and a
+final event stores the top summary under `output_key` and per-run progress
+under `progress_key`. A failed leaf becomes a placeholder report; a failed
+reduction falls back to an extractive summary of its group.
+
+    team = MapReduceAgent(name="SubtopicTeam", sub_agents=[researcher, aggregator],
+                          branching_factor=8, max_concurrency=8, output_key="report")
+"""
+import asyncio
+import itertools
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext, _InvocationCostManager
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from pydantic import PrivateAttr
+
+from agent_common.deadline_parallel import apply_event
+from agent_common.state_injection import estimate_tokens, extractive_summary
+from agent_common.streaming_pipeline import event_text
+
+logger = logging.getLogger(__name__)
+
+_LIST_MARKER = re.compile(r"^\s*(?:[-*+•]|\d+[.)]|#+)\s*")
+FINAL, PARTIAL = "final", "partial"
+
+
+def parse_topics(value: Any, max_topics: Optional[int] = None) -> List[str]:
+    """Topics from a list or from text with one per line (bullets/numbering stripped); duplicates dropped."""
+    if value is None:
+        return []
+    lines = value if isinstance(value, (list, tuple)) else str(value).splitlines()
+    topics, seen = [], set()
+    for line in lines:
+        topic = _LIST_MARKER.sub("", str(line)).strip().strip("*").strip()
+        if topic and topic.casefold() not in seen:
+            seen.add(topic.casefold())
+            topics.append(topic)
+    return topics[:max_topics] if max_topics else topics
+
+
+def tree_shape(leaves: int, branching_factor: int) -> List[int]:
+    """Number of items per level, leaves first: [200, 25, 4, 1] for 200 leaves and b=8."""
+    levels = [leaves]
+    while levels[-1] > 1:
+        levels.append(math.ceil(levels[-1] / branching_factor))
+    return levels
+
+
+@dataclass
+class _Item:
+    """A leaf report or a summary, covering topics first..last."""
+    text: str
+    first: int
+    last: int
+
+
+@dataclass
+class _Job:
+    level: int  # 0: leaf (mapper run); >0: reduction producing an item of this level
+    index: int
+    children: Tuple[_Item, ...] = ()
+
+
+class MapReduceAgent(BaseAgent):
+    """Runs sub_agents[0] per topic and reduces the results with sub_agents[1] in a bounded tree."""
+
+    topics_key: str = "topics"
+    """State key with the topics: a list, or one topic per line."""
+    topic_key: str = "topic"
+    """State key each mapper run sees its topic under."""
+    reports_key: str = "reports"
+    """State key each reducer run sees its group's reports under."""
+    scope_key: str = "reduce_scope"
+    """State key telling the reducer whether it writes the final summary ("final") or an intermediate one ("partial")."""
+    output_key: Optional[str] = None
+    """State key for the top summary."""
+    progress_key: Optional[str] = "map_reduce_progress"
+    max_topics: int = 200
+    max_concurrency: int = 8
+    branching_factor: int = 8
+    max_reduce_tokens: int = 3000
+    """Cap on the reports injected into one reducer prompt (estimated tokens)."""
+    isolate_runs: bool = True
+    """Start each mapper/reducer run from the user's message alone (the instruction carries its input)."""
+    placeholder: str = "(No report for {topic}: {error}.)"
+
+    _stats: Dict[str, Any] = PrivateAttr(default_factory=lambda: {
+        "runs": 0, "leaves": 0, "leaf_errors": 0, "reductions": 0, "reduce_errors": 0,
+        "compacted_reports": 0, "max_reduce_input_tokens": 0,
+    })
+
+    @property
+    def mapper(self) -> BaseAgent:
+        return self.sub_agents[0]
+
+    @property
+    def reducer(self) -> BaseAgent:
+        return self.sub_agents[1]
+
+    # --- runs ---
+
+    def _child_ctx(self, agent: BaseAgent, ctx: InvocationContext, suffix: str, state: Dict[str, Any]) -> InvocationContext:
+        branch_suffix = f"{self.name}.{agent.name}.{suffix}"
+        branch = f"{ctx.branch}.{branch_suffix}" if ctx.branch else branch_suffix
+        if self.isolate_runs:
+            events = [Event(invocation_id=ctx.invocation_id, author="user", content=ctx.user_content)] if ctx.user_content else []
+        else:
+            events = list(ctx.session.events)
+        session = ctx.session.model_copy(update={"events": events, "state": {**ctx.session.state, **state}})
+        child = ctx.model_copy(update={"branch": branch, "session": session})
+        # run_config.max_llm_calls (500 by default) applies per run: 200 topics share one invocation
+        child._invocation_cost_manager = _InvocationCostManager()
+        return child
+
+    @staticmethod
+    async def _collect(agent: BaseAgent, ctx: InvocationContext) -> Tuple[List[Event], str]:
+        events, text = [], ""
+        async for event in agent.run_async(ctx):
+            apply_event(ctx.session, event)
+            if event.partial:
+                continue
+            events.append(event)
+            if event.author == agent.name and event_text(event):
+                text = event_text(event)
+        return events, text
+
+    def _label(self, item: _Item, topics: List[str]) -> str:
+        if item.first == item.last:
+            return topics[item.first]
+        return f"Topics {item.first + 1}-{item.last + 1} ({topics[item.first]} ... {topics[item.last]})"
+
+    def render_reports(self, children: Tuple[_Item, ...], topics: List[str]) -> str:
+        """The group's reports as markdown sections, each compacted to its share of `max_reduce_tokens` if needed."""
+        sections = [(f"### {self._label(item, topics)}\n", item.text.strip()) for item in children]
+        total = sum(estimate_tokens(head) + estimate_tokens(text) for head, text in sections)
+        if total > self.max_reduce_tokens:
+            share = self.max_reduce_tokens // len(sections)
+            compacted = []
+            for head, text in sections:
+                budget = max(1, share - estimate_tokens(head))
+                if estimate_tokens(text) > budget:
+                    text = extractive_summary(text, budget)
+                    self._stats["compacted_reports"] += 1
+                compacted.append((head, text))
+            sections = compacted
+        return "\n\n".join(head + text for head, text in sections)
+
+    async def _run_job(self, job: _Job, ctx: InvocationContext, topics: List[str], top_level: int):
+        if job.level == 0:
+            topic = topics[job.index]
+            leaf_ctx = self._child_ctx(self.mapper, ctx, f"topic{job.index}", {self.topic_key: topic})
+            try:
+                events, text = await self._collect(self.mapper, leaf_ctx)
+            except Exception as e:  # one failed topic shouldn't sink the other 199
+                logger.warning("%s: topic %r failed: %r", self.name, topic, e)
+                self._stats["leaf_errors"] += 1
+                return job, [], self.placeholder.format(topic=topic, error=type(e).__name__)
+            return job, events, text or self.placeholder.format(topic=topic, error="empty answer")
+
+        reports = self.render_reports(job.children, topics)
+        self._stats["max_reduce_input_tokens"] = max(self._stats["max_reduce_input_tokens"], estimate_tokens(reports))
+        scope = FINAL if job.level == top_level else PARTIAL
+        reduce_ctx = self._child_ctx(self.reducer, ctx, f"level{job.level}.group{job.index}",
+                                     {self.reports_key: reports, self.scope_key: scope})
+        try:
+            events, text = await self._collect(self.reducer, reduce_ctx)
+            if text:
+                return job, events, text
+        except Exception as e:
+            logger.warning("%s: reduction %d.%d failed: %r", self.name, job.level, job.index, e)
+        self._stats["reduce_errors"] += 1
+        return job, [], extractive_summary(reports, max(1, self.max_reduce_tokens // self.branching_factor))
+
+    # --- scheduling ---
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if len(self.sub_agents) != 2:
+            raise ValueError(f"{self.name}: expected sub_agents=[mapper, reducer], got {len(self.sub_agents)}")
+        topics = parse_topics(ctx.session.state.get(self.topics_key), self.max_topics)
+        if not topics:
+            logger.warning("%s: no topics under %r", self.name, self.topics_key)
+            return
+        started = time.perf_counter()
+        shape = tree_shape(len(topics), self.branching_factor)
+        top_level = len(shape) - 1
+        levels: List[List[Optional[_Item]]] = [[None] * n for n in shape]
+        self._stats["runs"] += 1
+
+        # Reductions (priority 0) go before pending leaves (priority 1), so summaries stream early
+        jobs: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        order = itertools.count()
+        for i in range(len(topics)):
+            jobs.put_nowait((1, next(order), _Job(0, i)))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                _, _, job = await jobs.get()
+                try:
+                    await results.put(await self._run_job(job, ctx, topics, top_level))
+                except Exception as e:
+                    await results.put(e)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_concurrency, len(topics)))]
+        progress = {"topics": len(topics), "levels": top_level, "leaves_done": 0, "reductions_done": 0,
+                    "first_leaf_s": None, "first_summary_s": None}
+
+        def place(level: int, index: int, item: _Item) -> Optional[_Item]:
+            """Stores an item; queues its group's reduction once complete. Returns the top summary when done."""
+            while True:
+                levels[level][index] = item
+                if level == top_level:
+                    return item
+                group = index // self.branching_factor
+                members = levels[level][group * self.branching_factor:(group + 1) * self.branching_factor]
+                if any(member is None for member in members):
+                    return None
+                if len(members) > 1:
+                    jobs.put_nowait((0, next(order), _Job(level + 1, group, tuple(members))))
+                    return None
+                level, index = level + 1, group  # a group of one moves up unchanged
+
+        final: Optional[_Item] = None
+        try:
+            while final is None:
+                outcome = await results.get()
+                if isinstance(outcome, Exception):
+                    raise outcome
+                job, events, text = outcome
+                elapsed = round(time.perf_counter() - started, 3)
+                if job.level == 0:
+                    self._stats["leaves"] += 1
+                    progress["leaves_done"] += 1
+                    progress["first_leaf_s"] = progress["first_leaf_s"] or elapsed
+                    item = _Item(text, job.index, job.index)
+                else:
+                    self._stats["reductions"] += 1
+                    progress["reductions_done"] += 1
+                    progress["first_summary_s"] = progress["first_summary_s"] or elapsed
+                    item = _Item(text, job.children[0].first, job.children[-1].last)
+                for event in events:
+                    yield event
+                final = place(job.level, job.index, item)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        progress["elapsed_s"] = round(time.perf_counter() - started, 3)
+        state_delta: Dict[str, Any] = {}
+        if self.output_key:
+            state_delta[self.output_key] = final.text
+        if self.progress_key:
+            state_delta[self.progress_key] = progress
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Cumulative counters: runs, leaves, reductions, errors, compacted reports, largest reducer input."""
+        return dict(self._stats)
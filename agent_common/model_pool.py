@@ -0,0 +1,218 @@
+"""Process-wide, lifecycle-managed pool of Gemini API clients.
+
+Every `PooledGemini` model resolves its `api_client` through a shared
+`ModelClientPool`, so all agents in a process that use the same
+(model, retry config) share one `google.genai.Client` and one connection pool
+instead of each building their own. The pool owns the HTTP transport
+(an `httpx.AsyncClient` with explicit connection limits), caps concurrent
+requests per client, reports utilization, and closes everything in
+`shutdown()` so nothing is left for the garbage collector to warn about.
+
+Each call is also admitted by the process-wide `rate_limiter`
+(agent_common/rate_limit.py) for its model, and retried there: the model's
+`retry_options` become a `RetryPolicy` (capped, jittered backoff through the
+shared limiter) instead of per-client HTTP retries, so the clients themselves
+never retry.
+
+    model = PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config)
+    ...
+    await model_pool.startup()   # optional: build clients before the first request
+    ...
+    await model_pool.shutdown()  # on process exit
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+import httpx
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import Client, errors, types
+
+from agent_common.rate_limit import THROTTLE_STATUSES, RetryPolicy, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.environ.get("MODEL_POOL_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.environ.get("MODEL_POOL_MAX_KEEPALIVE", "10"))
+# Alternative API endpoint, e.g. a local fake (agent_common.fakes.FakeGeminiServer)
+BASE_URL = os.environ.get("MODEL_POOL_BASE_URL") or None
+
+PoolKey = Tuple[str, str]  # (model, retry config JSON)
+
+
+def pool_key(model: str, retry_options: Optional[types.HttpRetryOptions]) -> PoolKey:
+    retry = retry_options.model_dump_json(exclude_none=True) if retry_options else ""
+    return model, retry
+
+
+@dataclass
+class _PooledClient:
+    client: Client
+    transport: httpx.AsyncClient
+    limit: asyncio.Semaphore
+    max_connections: int
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    waiting: int = 0
+    requests: int = 0
+    wait_time_s: float = 0.0
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class ModelClientPool:
+    """Registry of shared genai clients keyed by (model, retry config)."""
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, max_keepalive: int = MAX_KEEPALIVE,
+                 base_url: Optional[str] = BASE_URL, api_key: Optional[str] = None):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.base_url = base_url
+        self.api_key = api_key
+        self._clients: Dict[PoolKey, _PooledClient] = {}
+        self._closed = False
+
+    def _create(self, key: PoolKey, retry_options: Optional[types.HttpRetryOptions], headers: Optional[Dict[str, str]]) -> _PooledClient:
+        transport = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive),
+            timeout=httpx.Timeout(None),  # per-request timeouts come from HttpOptions
+        )
+        client = Client(
+            api_key=self.api_key,
+            http_options=types.HttpOptions(
+                base_url=self.base_url,
+                headers=headers,
+                retry_options=retry_options,
+                httpx_async_client=transport,
+            ),
+        )
+        return _PooledClient(
+            client=client,
+            transport=transport,
+            limit=asyncio.Semaphore(self.max_connections),
+            max_connections=self.max_connections,
+        )
+
+    def client_for(
+        self,
+        model: str,
+        retry_options: Optional[types.HttpRetryOptions] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Client:
+        """Returns the shared client for (model, retry_options), creating it on first use."""
+        return self._entry(model, retry_options, headers).client
+
+    def _entry(self, model, retry_options, headers=None) -> _PooledClient:
+        key = pool_key(model, retry_options)
+        entry = self._clients.get(key)
+        if entry is None:
+            self._closed = False
+            entry = self._clients[key] = self._create(key, retry_options, headers)
+        return entry
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, model: str, retry_options: Optional[types.HttpRetryOptions] = None):
+        """Holds one of the client's request slots for the duration of a model call."""
+        entry = self._entry(model, retry_options)
+        entry.waiting += 1
+        started = time.monotonic()
+        try:
+            await entry.limit.acquire()
+        finally:
+            entry.waiting -= 1
+        entry.wait_time_s += time.monotonic() - started
+        entry.requests += 1
+        entry.in_flight += 1
+        entry.peak_in_flight = max(entry.peak_in_flight, entry.in_flight)
+        try:
+            yield entry.client
+        finally:
+            entry.in_flight -= 1
+            entry.limit.release()
+
+    async def startup(self, models: Tuple[Tuple[str, Optional[types.HttpRetryOptions]], ...] = ()) -> None:
+        """Creates clients for `models` up front so the first request doesn't pay for it."""
+        for model, retry_options in models:
+            self._entry(model, retry_options)
+
+    async def shutdown(self) -> None:
+        """Closes every client and its transport. The pool can be reused afterwards."""
+        entries, self._clients = list(self._clients.values()), {}
+        for entry in entries:
+            await entry.client.aio.aclose()
+            entry.client.close()
+            await entry.transport.aclose()
+        self._closed = True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for (model, retry), entry in self._clients.items():
+            report[f"{model}{' +retry' if retry else ''}"] = {
+                "requests": entry.requests,
+                "in_flight": entry.in_flight,
+                "peak_in_flight": entry.peak_in_flight,
+                "waiting": entry.waiting,
+                "max_connections": entry.max_connections,
+                "utilization": round(entry.in_flight / entry.max_connections, 3),
+                "peak_utilization": round(entry.peak_in_flight / entry.max_connections, 3),
+                "avg_wait_ms": round(entry.wait_time_s / entry.requests * 1000, 2) if entry.requests else 0.0,
+            }
+        return report
+
+
+# Process-wide default pool
+model_pool = ModelClientPool()
+
+
+def _retry_after(error: errors.APIError) -> Optional[float]:
+    """Seconds from the response's Retry-After header, if it has a numeric one."""
+    headers = getattr(error.response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class PooledGemini(Gemini):
+    """`Gemini` whose API client comes from a shared `ModelClientPool`, rate limited and retried per model."""
+
+    @property
+    def pool(self) -> ModelClientPool:
+        return model_pool
+
+    @property
+    def api_client(self) -> Client:  # type: ignore[override]
+        # No client-level retries: generate_content_async retries through the shared limiter
+        return self.pool.client_for(self.model, None, self._tracking_headers)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # The request's model, which a router plugin may have changed from this instance's
+        limiter = rate_limiter.get(llm_request.model or self.model)
+        policy = RetryPolicy.from_options(self.retry_options)
+        attempt = 0
+        while True:
+            attempt += 1
+            yielded = False
+            async with limiter.slot() as slot, self.pool.acquire(self.model):
+                try:
+                    async for response in super().generate_content_async(llm_request, stream):
+                        yielded = True
+                        yield response
+                    return
+                except errors.APIError as e:
+                    if e.code in THROTTLE_STATUSES:
+                        slot.throttled()
+                    # A stream that already produced output can't be replayed transparently
+                    if yielded or not policy.should_retry(e.code, attempt):
+                        raise
+                    status, delay = e.code, policy.delay(attempt, _retry_after(e))
+            logger.info("%s: HTTP %s, retry %d/%d in %.2fs", self.model, status, attempt, policy.attempts - 1, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,411 @@
+"""Complexity-based model routing and token budgets for any runner/App.
+
+`ModelRouterPlugin` looks at each model request before it is sent and picks a
+tier, "fast" (cheap) or "strong", by rewriting `llm_request.model`. The
+complexity score adds up:
+
+* prompt size: estimated prompt tokens / `strong_prompt_tokens`;
+* the agent's role (`RoutePolicy.role`): "router" -1.0, "tool" -0.5,
+  "general" 0, "synthesis" +0.5;
+* tool use: -0.5 when the agent has tools and the turn starts from user
+  text (usually a dispatch decision), +0.25 when it follows tool results
+  that have to be read and combined.
+
+A score of `threshold` (1.0) or more goes to the strong tier.
+
+Budgets shorten output instead of failing:
+
+* per request, `RoutePolicy.max_output_tokens` caps the answer and
+  `max_prompt_tokens` drops the oldest whole turns from the history;
+* per session, `session_budget` caps the tokens (prompt + output) a session
+  may spend. As it runs out, the output cap shrinks to the remainder; once it
+  is spent, calls go to the fast tier with `min_output_tokens`.
+
+A capped request also gets a one-line "keep it under N words" instruction, so
+the model ends its answer properly instead of being cut off mid-sentence. On
+models that think by default (`THINKING_MODELS`), thinking tokens count
+toward `max_output_tokens`, so a capped request there also gets a bounded
+`thinking_budget`, added on top of the cap rather than taken from it.
+
+Every decision, with actual token usage and estimated cost against the
+agent's own model, is appended to a JSONL log (`log_path`) for offline
+analysis; `stats()` has per-agent totals.
+
+    router = ModelRouterPlugin.from_env({"AggregatorAgent": RoutePolicy("synthesis", max_output_tokens=600)})
+    app = App(name="my_app", root_agent=root_agent, plugins=[router, ...])  # before any response cache
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from agent_common.state_injection import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FAST, STRONG = "fast", "strong"
+DEFAULT_TIERS = {FAST: "gemini-2.5-flash-lite", STRONG: "gemini-2.5-flash"}
+# Models that think unless told otherwise; their thoughts use up max_output_tokens
+THINKING_MODELS = ("gemini-2.5-flash", "gemini-2.5-pro")
+
+ROLE_WEIGHTS = {"router": -1.0, "tool": -0.5, "general": 0.0, "synthesis": 0.5}
+TOOL_DISPATCH_WEIGHT = -0.5
+TOOL_RESULTS_WEIGHT = 0.25
+
+# USD per million (input, output) tokens, for the cost estimates in the decision log
+PRICES_PER_MTOK: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+SESSION_TOKENS_KEY = "model_router_session_tokens"
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = PRICES_PER_MTOK.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * price_in + output_tokens * price_out) / 1e6
+
+
+def parse_tiers(spec: str) -> Dict[str, str]:
+    """Parses "fast=gemini-2.5-flash-lite,strong=gemini-2.5-flash" into {tier: model}."""
+    tiers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        tier, _, model = item.partition("=")
+        tiers[tier.strip()] = model.strip()
+    return tiers
+
+
+@dataclass
+class RoutePolicy:
+    """Routing and budget settings for one agent."""
+    role: str = "general"
+    max_output_tokens: Optional[int] = None
+    """Per-request output cap."""
+    max_prompt_tokens: Optional[int] = None
+    """Per-request prompt cap: the oldest whole turns of history are dropped above it."""
+    tier: Optional[str] = None
+    """Always use this tier (skips scoring)."""
+
+
+@dataclass
+class RouteDecision:
+    agent: str
+    baseline_model: Optional[str]
+    model: str
+    tier: str
+    score: float
+    reason: str
+    prompt_tokens: int
+    trimmed_tokens: int = 0
+    max_output_tokens: Optional[int] = None
+    started: float = 0.0
+
+
+# --- History trimming ---
+
+def _content_tokens(content: types.Content, count: Callable[[str], int]) -> int:
+    total = 0
+    for part in content.parts or []:
+        if part.text:
+            total += count(part.text)
+        elif part.function_call or part.function_response:
+            total += count(json.dumps((part.function_call or part.function_response).model_dump(
+                mode="json", exclude_none=True), default=str))
+    return total
+
+
+def _is_user_text(content: types.Content) -> bool:
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def trim_history(contents: List[types.Content], max_tokens: int, count: Callable[[str], int]) -> Tuple[List[types.Content], int]:
+    """Drops the oldest whole turns (a user message and everything up to the next one) above `max_tokens`.
+
+    The latest turn is always kept, so function calls stay paired with their
+    responses. Returns (contents, tokens dropped).
+    """
+    sizes = [_content_tokens(c, count) for c in contents]
+    total = sum(sizes)
+    if total <= max_tokens:
+        return contents, 0
+    starts = [i for i, c in enumerate(contents) if _is_user_text(c)]
+    dropped, cut = 0, 0
+    for start in starts[1:]:
+        if total - dropped <= max_tokens:
+            break
+        dropped += sum(sizes[cut:start])
+        cut = start
+    return contents[cut:], dropped
+
+
+# --- Decision log ---
+
+class DecisionLog:
+    """Buffered, append-only JSONL writer; flushed every `flush_every` records, by `flush()` and at exit."""
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending = 0
+        atexit.register(self.close)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+@dataclass
+class _AgentStats:
+    fast: int = 0
+    strong: int = 0
+    capped: int = 0
+    trimmed_tokens: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    baseline_cost_usd: float = 0.0
+
+
+# --- Plugin ---
+
+class ModelRouterPlugin(BasePlugin):
+    """Routes each model call to a fast or strong model and enforces token budgets."""
+
+    def __init__(
+        self,
+        name: str = "model_router",
+        policies: Optional[Dict[str, RoutePolicy]] = None,
+        tiers: Optional[Dict[str, str]] = None,
+        threshold: float = 1.0,
+        strong_prompt_tokens: int = 6000,
+        session_budget: Optional[int] = None,
+        min_output_tokens: int = 256,
+        thinking_budget: int = 512,
+        log_path: Optional[str] = None,
+        routing: bool = True,
+        count: Callable[[str], int] = estimate_tokens,
+    ):
+        super().__init__(name=name)
+        self.policies = dict(policies or {})
+        self.tiers = {**DEFAULT_TIERS, **(tiers or {})}
+        self.threshold = threshold
+        self.strong_prompt_tokens = strong_prompt_tokens
+        self.session_budget = session_budget
+        self.min_output_tokens = min_output_tokens
+        self.thinking_budget = thinking_budget
+        self.routing = routing
+        self.count = count
+        self.log = DecisionLog(log_path) if log_path else None
+        # (invocation_id, agent, branch) -> decision for calls sent to the model
+        self._pending: Dict[Tuple[str, str, Optional[str]], RouteDecision] = {}
+        self._stats: Dict[str, _AgentStats] = {}
+
+    @classmethod
+    def from_env(cls, policies: Dict[str, RoutePolicy], **kwargs) -> "ModelRouterPlugin":
+        """Reads MODEL_ROUTER (0 keeps every agent's own model; budgets still apply), MODEL_ROUTER_TIERS,
+        MODEL_ROUTER_THRESHOLD, MODEL_ROUTER_SESSION_BUDGET (tokens; 0 = none), MODEL_ROUTER_THINKING_BUDGET
+        (thinking tokens allowed on capped requests to thinking models) and MODEL_ROUTER_LOG."""
+        kwargs.setdefault("routing", os.environ.get("MODEL_ROUTER", "1") != "0")
+        kwargs.setdefault("tiers", parse_tiers(os.environ.get("MODEL_ROUTER_TIERS", "")))
+        kwargs.setdefault("threshold", float(os.environ.get("MODEL_ROUTER_THRESHOLD", "1.0")))
+        kwargs.setdefault("session_budget", int(os.environ.get("MODEL_ROUTER_SESSION_BUDGET", "0")) or None)
+        kwargs.setdefault("thinking_budget", int(os.environ.get("MODEL_ROUTER_THINKING_BUDGET", "512")))
+        kwargs.setdefault("log_path", os.environ.get("MODEL_ROUTER_LOG") or None)
+        return cls(policies=policies, **kwargs)
+
+    @staticmethod
+    def _call_key(callback_context: CallbackContext) -> Tuple[str, str, Optional[str]]:
+        branch = getattr(callback_context._invocation_context, "branch", None)
+        return callback_context.invocation_id, callback_context.agent_name, branch
+
+    def _agent_stats(self, agent: str) -> _AgentStats:
+        return self._stats.setdefault(agent, _AgentStats())
+
+    def score(self, policy: RoutePolicy, llm_request: LlmRequest, prompt_tokens: int) -> Tuple[float, str]:
+        """Complexity score and the main reason for it."""
+        parts = {"size": prompt_tokens / self.strong_prompt_tokens, "role": ROLE_WEIGHTS.get(policy.role, 0.0)}
+        has_tools = bool(llm_request.tools_dict) or bool(llm_request.config and llm_request.config.tools)
+        if has_tools and llm_request.contents:
+            latest = llm_request.contents[-1]
+            if any(part.function_response for part in latest.parts or []):
+                parts["tools"] = TOOL_RESULTS_WEIGHT
+            elif _is_user_text(latest):
+                parts["tools"] = TOOL_DISPATCH_WEIGHT
+        reason = max(parts, key=lambda k: abs(parts[k]))
+        return sum(parts.values()), reason
+
+    def _bound_thinking(self, llm_request: LlmRequest) -> int:
+        """Limits thinking on a capped request to a thinking model; returns the tokens to add to the cap."""
+        if llm_request.model not in THINKING_MODELS:
+            return 0
+        thinking = llm_request.config.thinking_config or types.ThinkingConfig()
+        budget = thinking.thinking_budget
+        if budget is None or budget < 0 or budget > self.thinking_budget:  # unset or -1 (dynamic)
+            budget = self.thinking_budget
+        llm_request.config.thinking_config = thinking.model_copy(update={"thinking_budget": budget})
+        return budget
+
+    def _output_cap(self, policy: RoutePolicy, session_tokens: int) -> Tuple[Optional[int], Optional[str]]:
+        cap, reason = policy.max_output_tokens, "request_budget" if policy.max_output_tokens else None
+        if self.session_budget is not None:
+            remaining = self.session_budget - session_tokens
+            if remaining <= 0:
+                return self.min_output_tokens, "session_budget_spent"
+            if cap is None or remaining < cap:
+                cap, reason = max(self.min_output_tokens, remaining), "session_budget"
+        return cap, reason
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        agent = callback_context.agent_name
+        policy = self.policies.get(agent, RoutePolicy())
+        stats = self._agent_stats(agent)
+
+        trimmed = 0
+        if policy.max_prompt_tokens:
+            llm_request.contents, trimmed = trim_history(llm_request.contents, policy.max_prompt_tokens, self.count)
+            stats.trimmed_tokens += trimmed
+        system = llm_request.config.system_instruction if llm_request.config else None
+        prompt_tokens = sum(_content_tokens(c, self.count) for c in llm_request.contents)
+        prompt_tokens += self.count(system) if isinstance(system, str) else 0
+
+        session_tokens = callback_context.state.get(SESSION_TOKENS_KEY, 0)
+        cap, cap_reason = self._output_cap(policy, session_tokens)
+        score, reason = self.score(policy, llm_request, prompt_tokens)
+        if cap_reason == "session_budget_spent":
+            tier, reason = FAST, cap_reason
+        elif policy.tier:
+            tier, reason = policy.tier, "pinned"
+        else:
+            tier = STRONG if score >= self.threshold else FAST
+
+        baseline = llm_request.model
+        if self.routing:
+            llm_request.model = self.tiers[tier]
+        if cap is not None:
+            if llm_request.config is None:
+                llm_request.config = types.GenerateContentConfig()
+            current = llm_request.config.max_output_tokens
+            cap = min(cap, current) if current else cap
+            llm_request.config.max_output_tokens = cap + self._bound_thinking(llm_request)
+            # ~0.75 words per token; aim at ~80% of the hard cap so the answer ends on its own
+            llm_request.append_instructions(
+                [f"Keep your answer under {int(cap * 0.6)} words and finish your last sentence."]
+            )
+            stats.capped += 1
+        if tier == STRONG:
+            stats.strong += 1
+        else:
+            stats.fast += 1
+
+        self._pending[self._call_key(callback_context)] = RouteDecision(
+            agent=agent, baseline_model=baseline, model=llm_request.model, tier=tier, score=round(score, 3),
+            reason=reason if cap_reason is None or reason == cap_reason else f"{reason}+{cap_reason}",
+            prompt_tokens=prompt_tokens, trimmed_tokens=trimmed, max_output_tokens=cap, started=time.time(),
+        )
+        return None
+
+    def _finish(self, callback_context: CallbackContext, llm_response: Optional[LlmResponse], error: Optional[str]) -> None:
+        decision = self._pending.pop(self._call_key(callback_context), None)
+        if decision is None:
+            return
+        usage = llm_response.usage_metadata if llm_response is not None else None
+        prompt = (usage.prompt_token_count or 0) if usage else decision.prompt_tokens
+        output = (usage.candidates_token_count or 0) if usage else 0
+        if usage is not None:
+            state = callback_context.state
+            state[SESSION_TOKENS_KEY] = state.get(SESSION_TOKENS_KEY, 0) + prompt + output
+
+        cost = estimate_cost(decision.model, prompt, output)
+        baseline_cost = estimate_cost(decision.baseline_model, prompt + decision.trimmed_tokens, output)
+        stats = self._agent_stats(decision.agent)
+        stats.prompt_tokens += prompt
+        stats.output_tokens += output
+        stats.cost_usd += cost
+        stats.baseline_cost_usd += baseline_cost
+        if self.log is not None:
+            finish_reason = llm_response.finish_reason if llm_response is not None else None
+            self.log.write({
+                "ts": decision.started,
+                "session_id": callback_context._invocation_context.session.id,
+                "invocation_id": callback_context.invocation_id,
+                "agent": decision.agent,
+                "tier": decision.tier,
+                "model": decision.model,
+                "baseline_model": decision.baseline_model,
+                "score": decision.score,
+                "reason": decision.reason,
+                "estimated_prompt_tokens": decision.prompt_tokens,
+                "trimmed_tokens": decision.trimmed_tokens,
+                "max_output_tokens": decision.max_output_tokens,
+                "prompt_tokens": prompt,
+                "output_tokens": output,
+                "finish_reason": getattr(finish_reason, "value", finish_reason),
+                "latency_s": round(time.time() - decision.started, 3),
+                "cost_usd": round(cost, 8),
+                "baseline_cost_usd": round(baseline_cost, 8),
+                "error": error,
+            })
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if not llm_response.partial:
+            self._finish(callback_context, llm_response, None)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> Optional[LlmResponse]:
+        self._finish(callback_context, None, type(error).__name__)
+        return None
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        # Calls answered before reaching the model (e.g. by a response cache) never get an after_model_callback
+        for key in [k for k in self._pending if k[0] == invocation_context.invocation_id]:
+            del self._pending[key]
+        if self.log is not None:
+            self.log.flush()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for agent, s in self._stats.items():
+            report[agent] = {
+                "fast": s.fast, "strong": s.strong, "capped": s.capped, "trimmed_tokens": s.trimmed_tokens,
+                "prompt_tokens": s.prompt_tokens, "output_tokens": s.output_tokens,
+                "cost_usd": round(s.cost_usd, 6), "baseline_cost_usd": round(s.baseline_cost_usd, 6),
+                "saved_usd": round(s.baseline_cost_usd - s.cost_usd, 6),
+            }
+        return report
@@ -0,0 +1,419 @@
+"""Local, deduplicated store of research papers, with per-topic search history.
+
+`PaperCorpus` keeps every paper the research agent has seen in SQLite (WAL):
+
+* Identity: papers are normalized on the way in: DOIs lower-cased without
+  resolver prefixes, arXiv IDs without "arXiv:"/URL/version, titles folded to
+  lower-case ASCII words. A paper matches an existing one by arXiv ID, then
+  DOI, then normalized title, then fuzzily: a MinHash signature over
+  character shingles of the title is banded into an LSH index (16 bands of 4
+  rows: candidates are likely at ~50% similarity), and a candidate counts as
+  the same paper when the shingle Jaccard similarity is at least
+  `threshold`. Matches fill in whatever IDs the stored copy was missing.
+* Topics: each search records which papers it found under the topic's
+  normalized key (word order, case and filler words like "find recent papers"
+  don't matter) and when. `topic()` answers "fresh" within `fresh_s` of the
+  last search, "stale" after that (search again only for what is newer), or
+  "miss".
+
+Free-form strings ("Title (Author et al., 2023) arXiv:2301.01234", markdown
+links, quoted titles) are parsed with `parse_paper`. All methods are
+synchronous and thread-safe; each is a few indexed queries.
+
+    corpus = PaperCorpus("corpus.db")
+    result = corpus.add_many(["Attention Is All You Need (arXiv:1706.03762)"], topic="transformers")
+    corpus.topic("find papers on transformers").status   # "fresh"
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY, title TEXT NOT NULL, norm_title TEXT NOT NULL, doi TEXT UNIQUE, arxiv_id TEXT UNIQUE,
+    url TEXT, year INTEGER, first_seen REAL NOT NULL, last_seen REAL NOT NULL, seen_count INTEGER NOT NULL DEFAULT 1);
+CREATE INDEX IF NOT EXISTS papers_by_title ON papers (norm_title);
+CREATE TABLE IF NOT EXISTS lsh (bucket INTEGER NOT NULL, paper_id INTEGER NOT NULL, PRIMARY KEY (bucket, paper_id))
+    WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS topics (
+    key TEXT PRIMARY KEY, query TEXT NOT NULL, last_searched REAL NOT NULL, searches INTEGER NOT NULL DEFAULT 1);
+CREATE TABLE IF NOT EXISTS topic_papers (
+    key TEXT NOT NULL, paper_id INTEGER NOT NULL, added REAL NOT NULL, PRIMARY KEY (key, paper_id)) WITHOUT ROWID;
+"""
+
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+# Words that say "papers, please" rather than what about. Question words are kept: "why do
+# transformers fail" and "how do transformers fail" are different topics.
+TOPIC_FILLER = frozenset(
+    "find list get give count them recent latest new paper papers research articles article publications "
+    "studies study literature some any all top best a an the and or of on in for about to with by from "
+    "please me show tell search i is are".split()
+)
+
+_DOI = re.compile(r"\b(10\.\d{4,9}/[^\s\"'<>\]]+)", re.IGNORECASE)
+_ARXIV = re.compile(
+    r"arxiv(?:\.org/(?:abs|pdf)/|:\s*|\s+)([a-z\-]+(?:\.[a-z]{2})?/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?", re.IGNORECASE
+)
+_ARXIV_DOI = re.compile(r"^10\.48550/arxiv\.(.+)$", re.IGNORECASE)
+_URL = re.compile(r"https?://\S+")
+_MD_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_QUOTED = re.compile(r"[\"“”«»]([^\"“”«»]{8,})[\"“”«»]")
+_YEAR = re.compile(r"\b(19[5-9]\d|20\d\d)\b")
+_BY_AUTHORS = re.compile(r"\s+(?:by\s+[A-Z]|[-–—]\s+[A-Z][\w.\-]*,?\s+(?:[A-Z][\w.\-]*,?\s+)*et\s+al\b).*$")
+_NUMBERS = re.compile(r"\b\d+\b")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s*")
+
+
+# --- normalization ---
+
+def normalize_title(title: str) -> str:
+    """Lower-case ASCII words of a title: accents, punctuation and spacing ignored."""
+    folded = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii").casefold()
+    return " ".join(re.findall(r"[a-z0-9]+", folded))
+
+
+def normalize_doi(text: str) -> Optional[str]:
+    match = _DOI.search(text or "")
+    return match.group(1).rstrip(".,;:)").lower() if match else None
+
+
+def normalize_arxiv_id(text: str) -> Optional[str]:
+    """"2301.01234" for "arXiv:2301.01234v2", arxiv.org/abs|pdf URLs and arXiv DOIs; old-style IDs too."""
+    if not text:
+        return None
+    doi = normalize_doi(text)
+    if doi and _ARXIV_DOI.match(doi):
+        return _ARXIV_DOI.match(doi).group(1).lower()
+    match = _ARXIV.search(text)
+    return match.group(1).lower() if match else None
+
+
+def topic_key(query: str) -> str:
+    """Normalized topic of a request: order- and case-insensitive, without filler such as "find recent papers on"."""
+    words = re.findall(r"\w+", query.casefold())
+    kept = [w for w in words if w not in TOPIC_FILLER] or words
+    return " ".join(sorted(set(kept)))
+
+
+@dataclass
+class Paper:
+    title: str
+    doi: Optional[str] = None
+    arxiv_id: Optional[str] = None
+    url: Optional[str] = None
+    year: Optional[int] = None
+    id: Optional[int] = None
+
+    @property
+    def norm_title(self) -> str:
+        return normalize_title(self.title)
+
+    def cite(self) -> str:
+        """One-line reference: title, year and IDs."""
+        ids = [f"arXiv:{self.arxiv_id}" if self.arxiv_id else None, f"doi:{self.doi}" if self.doi else None]
+        extra = ", ".join(filter(None, [str(self.year) if self.year else None, *ids]))
+        return f"{self.title} ({extra})" if extra else self.title
+
+
+def parse_paper(value: Union[str, Dict[str, Any]]) -> Paper:
+    """A `Paper` from a dict (title/doi/arxiv_id/url/year) or a free-form reference string."""
+    if isinstance(value, dict):
+        text = " ".join(str(v) for v in value.values() if v)
+        year = value.get("year")
+        return Paper(
+            title=str(value.get("title") or text).strip(),
+            doi=normalize_doi(str(value.get("doi") or "")) or normalize_doi(text),
+            arxiv_id=normalize_arxiv_id(str(value.get("arxiv_id") or value.get("arxiv") or "")) or normalize_arxiv_id(text),
+            url=value.get("url"),
+            year=int(year) if str(year or "").isdigit() else None,
+        )
+    text = _LIST_MARKER.sub("", str(value)).strip()
+    doi, arxiv_id = normalize_doi(text), normalize_arxiv_id(text)
+    link = _MD_LINK.search(text)
+    url = link.group(2) if link else (_URL.search(text).group(0).rstrip(".,;)") if _URL.search(text) else None)
+    year_match = _YEAR.search(_URL.sub(" ", text))
+    quoted = _QUOTED.search(text)
+    if quoted:
+        title = quoted.group(1)
+    elif link:
+        title = link.group(1)
+    else:
+        title = _URL.sub(" ", text)
+        title = re.sub(r"\b(?:arxiv:\s*\S+|doi:\s*\S+|10\.\d{4,9}/\S+)", " ", title, flags=re.IGNORECASE)
+        title = re.split(r"\s\(|\s\[|\s\|\s|\.\s", title)[0]  # stop at "(Author, year)", "[pdf]", ". Venue"
+        title = _BY_AUTHORS.sub("", title)
+    title = title.strip(" \t*_.,;:-–—\"'") or text
+    return Paper(title=title, doi=doi, arxiv_id=arxiv_id, url=url,
+                 year=int(year_match.group(1)) if year_match else None)
+
+
+# --- MinHash / LSH ---
+
+_MASK64 = (1 << 64) - 1
+
+
+def shingles(norm_title: str, k: int = 4) -> frozenset:
+    """Character k-grams of a normalized title (the whole title if shorter)."""
+    text = f" {norm_title} "
+    if len(text) <= k:
+        return frozenset([text])
+    return frozenset(text[i:i + k] for i in range(len(text) - k + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    """MinHash signatures: `num_perm` seeded multiply-shift hashes over the crc32 of each shingle.
+
+    Parameters derive from `seed` alone, so signatures (and LSH buckets) are stable across processes.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        params = []
+        for i in range(num_perm):
+            block = hashlib.blake2b(f"minhash-{seed}-{i}".encode(), digest_size=16).digest()
+            params.append((int.from_bytes(block[:8], "big") | 1, int.from_bytes(block[8:], "big")))
+        self.params = params
+
+    def signature(self, shingle_set: Iterable[str]) -> List[int]:
+        values = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+        # ((a*x + b) mod 2^64) >> 32 is universal for 32-bit keys and avoids a modulo
+        return [min([(a * v + b) & _MASK64 for v in values]) >> 32 for a, b in self.params]
+
+    @staticmethod
+    def buckets(signature: Sequence[int], bands: int) -> List[int]:
+        """One signed 64-bit bucket key per band (band number included)."""
+        rows = len(signature) // bands
+        keys = []
+        for band in range(bands):
+            chunk = ",".join(map(str, signature[band * rows:(band + 1) * rows]))
+            digest = hashlib.blake2b(f"{band}:{chunk}".encode(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+
+# --- store ---
+
+@dataclass
+class TopicHit:
+    status: str
+    key: str
+    papers: List[Paper] = field(default_factory=list)
+    last_searched: Optional[float] = None
+    searches: int = 0
+
+    @property
+    def since(self) -> Optional[str]:
+        """Date of the last search (YYYY-MM-DD), for "published after" queries."""
+        return time.strftime("%Y-%m-%d", time.gmtime(self.last_searched)) if self.last_searched else None
+
+
+@dataclass
+class CorpusStats:
+    added: int = 0
+    merged_exact: int = 0  # same arXiv ID, DOI or normalized title
+    merged_fuzzy: int = 0  # MinHash candidate above the similarity threshold
+    topic_lookups: int = 0
+    topic_fresh: int = 0
+    topic_stale: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class PaperCorpus:
+    """SQLite paper store with exact and fuzzy (MinHash LSH) dedup and per-topic search history."""
+
+    def __init__(self, path: str = ":memory:", num_perm: int = 64, bands: int = 16, threshold: float = 0.7,
+                 shingle_size: int = 4, fresh_s: float = 24 * 3600):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.fresh_s = fresh_s
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.stats = CorpusStats()
+
+    @classmethod
+    def from_env(cls, default_path: str, **kwargs) -> "PaperCorpus":
+        """Reads RESEARCH_CORPUS_DB ("" keeps the corpus in memory) and CORPUS_FRESH_S (seconds a search stays fresh)."""
+        path = os.environ.get("RESEARCH_CORPUS_DB", default_path) or ":memory:"
+        kwargs.setdefault("fresh_s", float(os.environ.get("CORPUS_FRESH_S", str(24 * 3600))))
+        return cls(path, **kwargs)
+
+    # --- dedup ---
+
+    def _row_paper(self, row) -> Paper:
+        return Paper(id=row[0], title=row[1], doi=row[2], arxiv_id=row[3], url=row[4], year=row[5])
+
+    def _find(self, paper: Paper, norm: str, buckets: List[int]) -> Tuple[Optional[int], Optional[str]]:
+        """(id, "exact"|"fuzzy") of the stored copy of `paper`, or (None, None)."""
+        conn = self._conn
+        for column, value in (("arxiv_id", paper.arxiv_id), ("doi", paper.doi)):
+            if value:
+                row = conn.execute(f"SELECT id FROM papers WHERE {column} = ?", (value,)).fetchone()
+                if row:
+                    return row[0], "exact"
+        if not norm:
+            return None, None
+        candidates = conn.execute(
+            "SELECT id, norm_title, doi, arxiv_id FROM papers WHERE norm_title = ? UNION"
+            " SELECT p.id, p.norm_title, p.doi, p.arxiv_id FROM lsh JOIN papers p ON p.id = lsh.paper_id"
+            f" WHERE lsh.bucket IN ({','.join('?' * len(buckets))})", (norm, *buckets)
+        ).fetchall()
+        mine = shingles(norm, self.shingle_size)
+        best, best_score = None, self.threshold
+        for paper_id, other_title, doi, arxiv_id in candidates:
+            # Different identifiers on both sides: different papers, however similar the titles
+            if (paper.doi and doi and paper.doi != doi) or (paper.arxiv_id and arxiv_id and paper.arxiv_id != arxiv_id):
+                continue
+            # "Llama 2" is not "Llama 3": numbers in the title have to agree
+            if set(_NUMBERS.findall(other_title)) != set(_NUMBERS.findall(norm)):
+                continue
+            score = 1.0 if other_title == norm else jaccard(mine, shingles(other_title, self.shingle_size))
+            if score >= best_score:
+                best, best_score = paper_id, score
+        if best is None:
+            return None, None
+        return best, "exact" if best_score == 1.0 else "fuzzy"
+
+    def _unused(self, column: str, value: Optional[str], paper_id: int) -> Optional[str]:
+        """`value` unless a row other than `paper_id` already has it in `column`."""
+        if value and self._conn.execute(f"SELECT 1 FROM papers WHERE {column} = ? AND id != ?",
+                                        (value, paper_id)).fetchone():
+            return None
+        return value
+
+    def _add(self, paper: Paper, now: float) -> Tuple[int, bool]:
+        norm = paper.norm_title
+        buckets = self.hasher.buckets(self.hasher.signature(shingles(norm, self.shingle_size)), self.bands)
+        paper_id, how = self._find(paper, norm, buckets)
+        if paper_id is not None:
+            # Fill in missing identifiers, but not one another row already has (matched by arXiv ID
+            # here, by DOI there): that would break the UNIQUE constraint and roll back the batch.
+            doi = self._unused("doi", paper.doi, paper_id)
+            arxiv_id = self._unused("arxiv_id", paper.arxiv_id, paper_id)
+            self._conn.execute(
+                "UPDATE papers SET doi = COALESCE(doi, ?), arxiv_id = COALESCE(arxiv_id, ?), url = COALESCE(url, ?),"
+                " year = COALESCE(year, ?), last_seen = ?, seen_count = seen_count + 1 WHERE id = ?",
+                (doi, arxiv_id, paper.url, paper.year, now, paper_id),
+            )
+            if how == "exact":
+                self.stats.merged_exact += 1
+            else:
+                self.stats.merged_fuzzy += 1
+            return paper_id, False
+        paper_id = self._conn.execute(
+            "INSERT INTO papers (title, norm_title, doi, arxiv_id, url, year, first_seen, last_seen)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (paper.title, norm, paper.doi, paper.arxiv_id, paper.url, paper.year, now, now),
+        ).lastrowid
+        self._conn.executemany("INSERT OR IGNORE INTO lsh VALUES (?, ?)", [(b, paper_id) for b in buckets])
+        self.stats.added += 1
+        return paper_id, True
+
+    def add_many(self, papers: Iterable[Union[str, Dict[str, Any], Paper]], topic: Optional[str] = None) -> Dict[str, Any]:
+        """Stores papers (deduplicated) and, with `topic`, records them as that topic's latest search.
+
+        Returns the distinct papers among the input ("count", their "ids"), how many were "new" to
+        the corpus, the inputs that repeated an earlier one ("duplicates"), and the topic's total.
+        """
+        sources = list(papers)
+        parsed = [p if isinstance(p, Paper) else parse_paper(p) for p in sources]
+        now = time.time()
+        ids, new, duplicates = [], 0, []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for source, paper in zip(sources, parsed):
+                    if not paper.norm_title and not (paper.doi or paper.arxiv_id):
+                        continue
+                    paper_id, is_new = self._add(paper, now)
+                    new += is_new
+                    if paper_id in ids:
+                        duplicates.append(source if isinstance(source, str) else paper.title)
+                    else:
+                        ids.append(paper_id)
+                topic_total = None
+                if topic is not None:
+                    key = topic_key(topic)
+                    self._conn.execute(
+                        "INSERT INTO topics (key, query, last_searched) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE"
+                        " SET query = excluded.query, last_searched = excluded.last_searched, searches = searches + 1",
+                        (key, topic, now),
+                    )
+                    self._conn.executemany("INSERT OR IGNORE INTO topic_papers VALUES (?, ?, ?)",
+                                           [(key, paper_id, now) for paper_id in ids])
+                    topic_total = self._conn.execute("SELECT COUNT(*) FROM topic_papers WHERE key = ?", (key,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"count": len(ids), "ids": ids, "new": new, "duplicates": duplicates, "topic_total": topic_total}
+
+    def count_unique(self, papers: Iterable[Union[str, Dict[str, Any], Paper]]) -> int:
+        """Distinct papers among `papers`, resolved through the dedup index (without storing anything)."""
+        seen, unknown = set(), []
+        with self._lock:
+            for paper in (p if isinstance(p, Paper) else parse_paper(p) for p in papers):
+                norm = paper.norm_title
+                buckets = self.hasher.buckets(self.hasher.signature(shingles(norm, self.shingle_size)), self.bands)
+                paper_id, _ = self._find(paper, norm, buckets)
+                if paper_id is not None:
+                    seen.add(paper_id)
+                elif not any(jaccard(shingles(norm, self.shingle_size), shingles(o, self.shingle_size)) >= self.threshold
+                             for o in unknown):
+                    unknown.append(norm)
+        return len(seen) + len(unknown)
+
+    # --- topics ---
+
+    def topic(self, query: str) -> TopicHit:
+        """What the corpus knows for a topic: fresh/stale/miss, its papers and when it was last searched."""
+        key = topic_key(query)
+        with self._lock:
+            self.stats.topic_lookups += 1
+            row = self._conn.execute("SELECT last_searched, searches FROM topics WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return TopicHit(MISS, key)
+            papers = [self._row_paper(r) for r in self._conn.execute(
+                "SELECT p.id, p.title, p.doi, p.arxiv_id, p.url, p.year FROM topic_papers t JOIN papers p"
+                " ON p.id = t.paper_id WHERE t.key = ? ORDER BY t.added, p.id", (key,))]
+        status = FRESH if time.time() - row[0] < self.fresh_s else STALE
+        if status == FRESH:
+            self.stats.topic_fresh += 1
+        else:
+            self.stats.topic_stale += 1
+        return TopicHit(status, key, papers, last_searched=row[0], searches=row[1])
+
+    def summary(self) -> Dict[str, Any]:
+        """Corpus size plus the dedup/topic counters."""
+        with self._lock:
+            papers, topics = (self._conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("papers", "topics"))
+        return {"papers": papers, "topics": topics, **self.stats.as_dict()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
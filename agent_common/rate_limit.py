@@ -0,0 +1,303 @@
+"""Process-wide client-side rate limiting and retry scheduling for model calls.
+
+Every `PooledGemini` call goes through the `ModelLimiter` for its model, shared
+by all agents in the process:
+
+* a token bucket caps the request rate (RATE_LIMIT_RPM per model);
+* an AIMD window caps concurrent requests: each success widens it by
+  1/window (about +1 per window of calls), and a 429/503 halves it. Like
+  TCP, only requests admitted after the last cut can cut again, so one burst
+  of throttling costs one cut, not one per failed request;
+* waiting requests are served strictly by priority: interactive before batch.
+  The priority comes from the `request_priority` context variable, which
+  tasks inherit, so `set_batch_priority()` at the top of a batch job covers
+  every model call it makes;
+* retries (`RetryPolicy`) use capped, jittered exponential backoff and go back
+  through the limiter, so retrying agents don't stampede the API together.
+
+    async with rate_limiter.get("gemini-2.0-flash").slot() as slot:
+        ...                      # one model request
+        slot.throttled()         # on 429/503
+
+RATE_LIMIT=0 turns the bucket and window off (calls are still retried).
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# --- Priorities ---
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+request_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+def set_batch_priority() -> contextvars.Token:
+    """Marks model calls made from the current context (and tasks it starts) as batch traffic."""
+    return request_priority.set(BATCH)
+
+
+@contextlib.contextmanager
+def priority(level: int):
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+# --- Configuration ---
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT", "1") != "0"
+# Requests per minute per model (paid tier 1 quotas); override with RATE_LIMIT_RPM="model=rpm,..."
+DEFAULT_RPM: Dict[str, float] = {"gemini-2.5-flash-lite": 4000, "gemini-2.0-flash": 2000, "gemini-2.5-flash": 1000}
+FALLBACK_RPM = float(os.environ.get("RATE_LIMIT_DEFAULT_RPM", "1000"))
+INITIAL_CONCURRENCY = int(os.environ.get("RATE_LIMIT_INITIAL_CONCURRENCY", "8"))
+MAX_CONCURRENCY = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENCY", os.environ.get("MODEL_POOL_MAX_CONNECTIONS", "20")))
+
+# HTTP statuses that mean "slow down": they shrink the window
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+def parse_rpm(spec: str) -> Dict[str, float]:
+    """Parses "gemini-2.0-flash=600,gemini-2.5-flash-lite=900" into {model: rpm}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rpm = item.partition("=")
+        limits[model.strip()] = float(rpm)
+    return limits
+
+
+# --- Retry policy ---
+class RetryPolicy:
+    """Capped exponential backoff with jitter, configured from `types.HttpRetryOptions` fields."""
+
+    def __init__(self, attempts: int = 5, initial_delay: float = 1.0, max_delay: float = 30.0, exp_base: float = 2.0,
+                 jitter: float = 0.5, statuses: Iterable[int] = (429, 500, 503, 504)):
+        self.attempts = attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.exp_base = exp_base
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+
+    @classmethod
+    def from_options(cls, retry_options: Any) -> "RetryPolicy":
+        """From `types.HttpRetryOptions` (None: the defaults above). `jitter` is the random fraction of each delay."""
+        if retry_options is None:
+            return cls()
+        default = cls()
+        return cls(
+            attempts=retry_options.attempts or default.attempts,
+            initial_delay=retry_options.initial_delay if retry_options.initial_delay is not None else default.initial_delay,
+            max_delay=retry_options.max_delay or default.max_delay,
+            exp_base=retry_options.exp_base or default.exp_base,
+            jitter=min(1.0, retry_options.jitter) if retry_options.jitter is not None else default.jitter,
+            statuses=retry_options.http_status_codes or default.statuses,
+        )
+
+    def should_retry(self, status: Optional[int], attempt: int) -> bool:
+        """`attempt` is the number of attempts made so far."""
+        return status in self.statuses and attempt < self.attempts
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Wait before attempt `attempt + 1`: capped exponential, of which a `jitter` fraction is random."""
+        delay = min(self.max_delay, self.initial_delay * self.exp_base ** (attempt - 1))
+        delay = delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+# --- Per-model limiter ---
+class Slot:
+    """One admitted request; report how it went with `throttled()` (success is the default)."""
+
+    __slots__ = ("seq", "was_throttled")
+
+    def __init__(self, seq: int = 0):
+        self.seq = seq  # admission number, compared with the limiter's last cut
+        self.was_throttled = False
+
+    def throttled(self) -> None:
+        self.was_throttled = True
+
+
+class ModelLimiter:
+    """Token bucket + AIMD concurrency window + priority queue for one model."""
+
+    def __init__(
+        self,
+        model: str,
+        rpm: float,
+        burst: Optional[float] = None,
+        initial_concurrency: int = INITIAL_CONCURRENCY,
+        min_concurrency: int = 1,
+        max_concurrency: int = MAX_CONCURRENCY,
+        decrease: float = 0.5,
+        enabled: bool = True,
+    ):
+        self.model = model
+        self.rate = rpm / 60.0
+        self.burst = burst if burst is not None else max(1.0, min(self.rate, float(max_concurrency)))
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.enabled = enabled
+        self.window = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._admissions = 0
+        self._cut_at = 0  # admissions before the last window cut
+        # (priority, seq, future); cancelled futures are skipped when they reach the top
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {
+            "admitted": {name: 0 for name in PRIORITY_NAMES.values()},
+            "wait_s": {name: 0.0 for name in PRIORITY_NAMES.values()},
+            "throttled": 0,
+            "window_cuts": 0,
+            "peak_in_flight": 0,
+        }
+
+    # --- Admission ---
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_admit(self) -> bool:
+        if self.in_flight >= int(self.window):
+            return False
+        self._refill(time.monotonic())
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        self.in_flight += 1
+        self._admissions += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self.in_flight)
+        return True
+
+    def _dispatch(self) -> None:
+        """Admits waiters in priority order while there is capacity; re-arms a timer when tokens run out."""
+        self._timer = None
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_admit():
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+        if self._waiters and self.in_flight < int(self.window):
+            # Blocked on the bucket, not the window: nothing else will wake the queue
+            delay = max(0.0, (1.0 - self._tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, level: Optional[int] = None) -> None:
+        level = request_priority.get() if level is None else level
+        started = time.monotonic()
+        if not self._waiters and self._try_admit():
+            self._admitted(level, started)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(None)  # admitted just as we were cancelled: give the slot back
+            raise
+        self._admitted(level, started)
+
+    def _admitted(self, level: int, started: float) -> None:
+        name = PRIORITY_NAMES.get(level, str(level))
+        self._stats["admitted"][name] = self._stats["admitted"].get(name, 0) + 1
+        self._stats["wait_s"][name] = self._stats["wait_s"].get(name, 0.0) + time.monotonic() - started
+
+    def release(self, slot: Optional[Slot]) -> None:
+        """Frees a slot and applies the AIMD update for its outcome (None: the slot went unused)."""
+        self.in_flight -= 1
+        if slot is None:
+            pass
+        elif slot.was_throttled:
+            self._stats["throttled"] += 1
+            if slot.seq > self._cut_at:
+                self._cut_at = self._admissions
+                self.window = max(float(self.min_concurrency), self.window * self.decrease)
+                self._stats["window_cuts"] += 1
+        else:
+            self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, level: Optional[int] = None):
+        """Holds one admitted request for the duration of the block."""
+        if not self.enabled:
+            yield Slot()
+            return
+        await self.acquire(level)
+        slot = Slot(self._admissions)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self._stats.items()}
+        stats["wait_ms_avg"] = {
+            name: round(stats["wait_s"][name] / n * 1000, 2) if n else 0.0 for name, n in stats["admitted"].items()
+        }
+        del stats["wait_s"]
+        stats.update(model=self.model, rpm=round(self.rate * 60, 1), window=round(self.window, 2),
+                     in_flight=self.in_flight, waiting=sum(not w[2].done() for w in self._waiters))
+        return stats
+
+
+class RateLimiterRegistry:
+    """One `ModelLimiter` per model name, created on first use."""
+
+    def __init__(self, rpm: Optional[Dict[str, float]] = None, default_rpm: float = FALLBACK_RPM,
+                 enabled: bool = RATE_LIMIT_ENABLED, **limiter_kwargs):
+        self.rpm = {**DEFAULT_RPM, **parse_rpm(os.environ.get("RATE_LIMIT_RPM", "")), **(rpm or {})}
+        self.default_rpm = default_rpm
+        self.enabled = enabled
+        self.limiter_kwargs = limiter_kwargs
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def get(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            rpm = self.rpm.get(model, self.default_rpm)
+            limiter = self._limiters[model] = ModelLimiter(model, rpm, enabled=self.enabled, **self.limiter_kwargs)
+        return limiter
+
+    def configure(self, **kwargs) -> None:
+        """Replaces the settings for limiters created from now on (existing ones are dropped)."""
+        rpm = kwargs.pop("rpm", None)
+        if rpm is not None:
+            self.rpm.update(rpm)
+        for key in ("default_rpm", "enabled"):
+            if key in kwargs:
+                setattr(self, key, kwargs.pop(key))
+        self.limiter_kwargs.update(kwargs)
+        self._limiters.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+
+# Process-wide default registry, shared by every PooledGemini
+rate_limiter = RateLimiterRegistry()
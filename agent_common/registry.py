@@ -0,0 +1,120 @@
+"""Lazy registry of the repo's root agents.
+
+Importing an agent package builds nothing: each package's `__init__` uses
+`lazy_agent_attributes`, so `root_agent`, `app` and `agent` are resolved
+(and the agent module, with google.adk/google.genai behind it, imported) on
+first access. That is what `adk web`/`adk run` do when they load a package,
+so they work unchanged.
+
+`registry.load(name)` builds one agent by name on first use and caches it, so
+a process that serves one agent never imports the others:
+
+    loaded = registry.load("agent_team")
+    runner = Runner(app_name=loaded.name, agent=loaded.root_agent, plugins=loaded.plugins, ...)
+
+This module imports nothing heavy itself.
+"""
+import importlib
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Registered name -> agent module. Names are the package directories, or the app name for a
+# package's second app.
+AGENT_MODULES: Dict[str, str] = {
+    "ai_agent_with_adk": "ai_agent_with_adk.agent",
+    "ai_sequential_agent_with_adk_for_blog_creation": "ai_sequential_agent_with_adk_for_blog_creation.agent",
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research":
+        "ai_paralle_agent_to_aggergate_Tech_health_finance_research.agent",
+    "subtopic_research": "ai_paralle_agent_to_aggergate_Tech_health_finance_research.subtopics",
+    "research-agent": "research-agent.agent",
+    "agent_team": "agent_team.agent",
+}
+
+LAZY_ATTRIBUTES = ("root_agent", "app")
+
+
+def lazy_agent_attributes(package: str, module: str = "agent") -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Module-level (__getattr__, __dir__) for an agent package.
+
+    `package.agent`, `package.root_agent` and `package.app` import
+    `package.agent` on first access; the resolved values are then cached as
+    real attributes of the package.
+    """
+    def __getattr__(name: str) -> Any:
+        if name == module or name in LAZY_ATTRIBUTES:
+            agent_module = importlib.import_module(f"{package}.{module}")
+            if name == module:
+                return agent_module
+            if hasattr(agent_module, name):
+                value = getattr(agent_module, name)
+                setattr(sys.modules[package], name, value)
+                return value
+        raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | {module, *LAZY_ATTRIBUTES})
+
+    return __getattr__, __dir__
+
+
+class LoadedAgent:
+    """An agent module, its root agent and the plugins of its `app` (or `runner`, for modules without one)."""
+
+    # A plain class: dataclasses (and the inspect module behind it) would double this module's import time.
+    __slots__ = ("name", "module", "root_agent", "plugins")
+
+    def __init__(self, name: str, module: Any, root_agent: Any, plugins: List[Any]):
+        self.name = name
+        self.module = module
+        self.root_agent = root_agent
+        self.plugins = plugins
+
+
+def load_agent_module(module_name: str, name: Optional[str] = None) -> LoadedAgent:
+    """Imports an agent module and collects its root agent and plugins."""
+    module = importlib.import_module(module_name)
+    app = getattr(module, "app", None)
+    if app is not None:
+        return LoadedAgent(name or app.name, module, app.root_agent, list(app.plugins))
+    runner = getattr(module, "runner", None)
+    plugins = list(runner.plugin_manager.plugins) if runner is not None else []
+    return LoadedAgent(name or module_name, module, module.root_agent, plugins)
+
+
+class AgentRegistry:
+    """Builds registered agents by name on first use; thread-safe."""
+
+    def __init__(self, modules: Optional[Dict[str, str]] = None):
+        self._modules = dict(AGENT_MODULES if modules is None else modules)
+        self._loaded: Dict[str, LoadedAgent] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, module_name: str) -> None:
+        with self._lock:
+            self._modules[name] = module_name
+            self._loaded.pop(name, None)
+
+    def names(self) -> List[str]:
+        return list(self._modules)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def load(self, name: str) -> LoadedAgent:
+        """The agent registered as `name`, importing its module the first time."""
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+        if name not in self._modules:
+            raise KeyError(f"unknown agent {name!r}; registered: {', '.join(self._modules)}")
+        with self._lock:  # the import lock is per module; this keeps one LoadedAgent per name
+            if name not in self._loaded:
+                self._loaded[name] = load_agent_module(self._modules[name], name)
+            return self._loaded[name]
+
+    def root_agent(self, name: str) -> Any:
+        return self.load(name).root_agent
+
+
+registry = AgentRegistry()
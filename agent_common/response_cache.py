@@ -0,0 +1,258 @@
+"""LLM response cache plugin for any runner/App.
+
+`ResponseCachePlugin` fingerprints each normalized `LlmRequest` (model, system
+instruction, contents, tool declarations and generation settings) and serves
+a stored `LlmResponse` instead of calling the model when the same request was
+answered recently. Entries live in a bounded in-memory LRU and, optionally, in
+an SQLite file shared between processes and restarts.
+
+Caching is per agent: `agent_ttls` maps agent names to a TTL in seconds (0
+opts an agent out) and `default_ttl` applies to every other agent, or to none
+when it is None (opt-in mode).
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+
+from agent_common.cache import TTLCache
+from agent_common.deadline_parallel import in_branch
+
+logger = logging.getLogger(__name__)
+
+# Request fields that never change the answer
+_IGNORED_CONFIG_FIELDS = {"labels", "http_options"}
+# Per-call identifiers that differ between otherwise identical requests
+_IGNORED_PART_FIELDS = {"id", "thought_signature"}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if k not in _IGNORED_PART_FIELDS}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def normalize_contents(contents) -> list:
+    """JSON form of request contents without the per-call ids, for building cache keys."""
+    return _normalize([c.model_dump(mode="json", exclude_none=True) for c in contents])
+
+
+def fingerprint_llm_request(llm_request: LlmRequest) -> str:
+    """Stable hash of everything in the request that can change the model's answer."""
+    config = {}
+    if llm_request.config is not None:
+        config = llm_request.config.model_dump(mode="json", exclude_none=True, exclude=_IGNORED_CONFIG_FIELDS)
+    payload = {
+        "model": llm_request.model,
+        "config": config,
+        "contents": [c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents],
+    }
+    encoded = json.dumps(_normalize(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _AgentStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    latency_saved_s: float = 0.0
+
+
+class SqliteResponseStore:
+    """On-disk response tier: one SQLite file in WAL mode, safe to share between processes."""
+
+    def __init__(self, path: str, max_entries: int = 50_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, agent TEXT, response TEXT, latency REAL,"
+            " created_at REAL, expires_at REAL)"
+        )
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float, float]]:
+        """Returns (response dict, original latency, remaining ttl) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2] - now
+
+    def put(self, key: str, agent: str, response: Dict[str, Any], latency: float, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, json.dumps(response), latency, now, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCachePlugin(BasePlugin):
+    """Serves repeated model requests from a memory (and optional disk) cache."""
+
+    def __init__(
+        self,
+        name: str = "response_cache",
+        default_ttl: Optional[float] = None,
+        agent_ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = 512,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 50_000,
+    ):
+        super().__init__(name=name)
+        self.default_ttl = default_ttl
+        self.agent_ttls = dict(agent_ttls or {})
+        self._memory = TTLCache(maxsize=max_entries, ttl=default_ttl or 0)
+        self._disk = SqliteResponseStore(disk_path, max_disk_entries) if disk_path else None
+        # (invocation_id, agent, branch) -> (fingerprint, start time) for calls that went to the model
+        self._pending: Dict[Tuple[str, str, Optional[str]], Tuple[str, float]] = {}
+        self._stats: Dict[str, _AgentStats] = {}
+
+    @classmethod
+    def from_env(cls, agent_ttls: Dict[str, float], **kwargs) -> "ResponseCachePlugin":
+        """Reads RESPONSE_CACHE (0 disables every agent), RESPONSE_CACHE_DB and RESPONSE_CACHE_MAX_ENTRIES."""
+        if os.environ.get("RESPONSE_CACHE", "1") == "0":
+            agent_ttls = {}
+        kwargs.setdefault("disk_path", os.environ.get("RESPONSE_CACHE_DB") or None)
+        kwargs.setdefault("max_entries", int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "512")))
+        return cls(agent_ttls=agent_ttls, **kwargs)
+
+    def ttl_for(self, agent_name: str) -> float:
+        ttl = self.agent_ttls.get(agent_name, self.default_ttl)
+        return ttl or 0.0
+
+    def _agent_stats(self, agent_name: str) -> _AgentStats:
+        return self._stats.setdefault(agent_name, _AgentStats())
+
+    @staticmethod
+    def _call_key(callback_context: CallbackContext) -> Tuple[str, str, Optional[str]]:
+        branch = getattr(callback_context._invocation_context, "branch", None)
+        return callback_context.invocation_id, callback_context.agent_name, branch
+
+    @staticmethod
+    def _to_response(data: Dict[str, Any], tier: str) -> LlmResponse:
+        response = LlmResponse.model_validate(data)
+        response.custom_metadata = {**(response.custom_metadata or {}), "response_cache": tier}
+        return response
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        agent_name = callback_context.agent_name
+        ttl = self.ttl_for(agent_name)
+        if ttl <= 0:
+            return None
+        stats = self._agent_stats(agent_name)
+        key = fingerprint_llm_request(llm_request)
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            stats.hits += 1
+            stats.latency_saved_s += entry[1]
+            return self._to_response(entry[0], "memory")
+        if self._disk is not None:
+            stored = self._disk.get(key)
+            if stored is not None:
+                data, latency, remaining = stored
+                self._memory.set(key, (data, latency), ttl=remaining)
+                stats.hits += 1
+                stats.disk_hits += 1
+                stats.latency_saved_s += latency
+                return self._to_response(data, "disk")
+
+        stats.misses += 1
+        self._pending[self._call_key(callback_context)] = (key, time.monotonic())
+        return None
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        pending = self._pending.pop(self._call_key(callback_context), None)
+        if pending is None:
+            return None
+        key, started = pending
+        # Never cache failures or empty answers
+        if llm_response.error_code or llm_response.content is None or not llm_response.content.parts:
+            return None
+        agent_name = callback_context.agent_name
+        ttl = self.ttl_for(agent_name)
+        latency = time.monotonic() - started
+        data = llm_response.model_dump(mode="json", exclude_none=True)
+        self._memory.set(key, (data, latency), ttl=ttl)
+        if self._disk is not None:
+            self._disk.put(key, agent_name, data, latency, ttl)
+        self._agent_stats(agent_name).stores += 1
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> Optional[LlmResponse]:
+        self._pending.pop(self._call_key(callback_context), None)
+        return None
+
+    def release_branch(self, invocation_id: str, branch: Optional[str]) -> None:
+        """Forgets the model calls of a cancelled branch (called by deadline_parallel)."""
+        for call in [c for c in self._pending if c[0] == invocation_id and in_branch(c[2], branch)]:
+            del self._pending[call]
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        logger.info("response cache stats: %s", self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-agent hit/miss counts, hit rate and model latency saved by hits."""
+        report = {}
+        for agent_name, s in self._stats.items():
+            total = s.hits + s.misses
+            report[agent_name] = {
+                "hits": s.hits,
+                "disk_hits": s.disk_hits,
+                "misses": s.misses,
+                "stores": s.stores,
+                "hit_rate": round(s.hits / total, 4) if total else 0.0,
+                "latency_saved_s": round(s.latency_saved_s, 3),
+            }
+        return report
+
+    async def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
@@ -0,0 +1,307 @@
+"""Deduplicating cache for Google Search traffic, plus a stub search backend.
+
+`google_search` is a Gemini built-in tool: the search runs inside the model
+call and comes back as grounding metadata on the `LlmResponse`. So for agents
+using it, `SearchCachePlugin` caches the whole grounded model response, keyed
+on the model, the agent's system instruction, the earlier turns of the
+conversation and the user's question (case and whitespace do not matter, but
+every word and their order do: "when did X happen" and "why did X happen"
+need different answers). Concurrent identical searches are collapsed: one
+request goes upstream and the others wait for its response. Only the first
+model call of a turn (the one that searches) is cached.
+
+Client-side search tools named "google_search" (such as the stub below) are
+cached at the tool level instead, keyed on their *normalized* `query` argument
+(case, whitespace, stopwords and word order do not matter to the search).
+
+Hedge attempts (see deadline_parallel) read completed entries but never wait
+on an in-flight search: waiting for the straggler would defeat the hedge.
+A search whose leader is cancelled (a hedge or deadline, a disconnected
+client) or whose run ends without an answer is released, so its followers
+stop waiting and search themselves.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.function_tool import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+
+from agent_common.cache import TTLCache
+from agent_common.deadline_parallel import in_branch, is_hedge_branch
+from agent_common.response_cache import normalize_contents
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TOOL_NAME = "google_search"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it me of on or please show tell the this "
+    "to was what when where which who why with about find search".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Order-, case- and stopword-insensitive form of a search query."""
+    words = re.findall(r"\w+", query.casefold())
+    kept = [w for w in words if w not in STOPWORDS] or words
+    return " ".join(sorted(set(kept)))
+
+
+def _uses_builtin_search(llm_request: LlmRequest) -> bool:
+    tools = llm_request.config.tools if llm_request.config and llm_request.config.tools else []
+    return any(
+        getattr(tool, "google_search", None) is not None
+        or getattr(tool, "google_search_retrieval", None) is not None
+        for tool in tools
+    )
+
+
+def _latest_user_text(llm_request: LlmRequest) -> Optional[str]:
+    """Text of the last content if it is a fresh user message, else None."""
+    if not llm_request.contents:
+        return None
+    latest = llm_request.contents[-1]
+    if latest.role != "user" or not latest.parts:
+        return None
+    texts = [p.text for p in latest.parts if p.text]
+    return " ".join(texts) if texts else None
+
+
+@dataclass
+class SearchCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # requests that waited on an identical in-flight search
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
+
+
+class SearchCachePlugin(BasePlugin):
+    """Single-flight, TTL/size-bounded cache for google_search calls."""
+
+    def __init__(
+        self,
+        name: str = "search_cache",
+        ttl: float = 1800.0,
+        max_entries: int = 1024,
+        wait_timeout: float = 60.0,
+    ):
+        super().__init__(name=name)
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # (invocation_id, agent or function call id, branch) -> cache key, for leaders
+        self._pending: Dict[Tuple[str, str, Optional[str]], str] = {}
+        self.model_stats = SearchCacheStats()
+        self.tool_stats = SearchCacheStats()
+
+    # --- shared single-flight logic ---
+
+    async def _lookup_or_lead(self, key: str, stats: SearchCacheStats, owner: Any, wait: bool = True) -> Optional[Any]:
+        """Returns a cached/shared result, or None after registering `owner` as the leader."""
+        cached = self._cache.get(key)
+        if cached is not None:
+            stats.hits += 1
+            return cached
+        future = self._inflight.get(key)
+        if future is not None and wait:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except Exception:
+                result = None  # leader failed or is too slow: search ourselves
+            if result is not None:
+                stats.coalesced += 1
+                return result
+        stats.misses += 1
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+        self._pending[owner] = key
+        # A cancelled leader never reaches its after_* callback: release the search when its task ends
+        task = asyncio.current_task()
+        if task is not None:
+            task.add_done_callback(lambda _: self._finish(owner, None))
+        return None
+
+    def _finish(self, owner: Any, result: Optional[Any]) -> None:
+        key = self._pending.pop(owner, None)
+        if key is None:
+            return
+        if result is not None:
+            self._cache.set(key, result)
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def release_branch(self, invocation_id: str, branch: Optional[str]) -> None:
+        """Gives up the searches led from a cancelled branch (called by deadline_parallel)."""
+        for owner in [o for o in self._pending if o[0] == invocation_id and in_branch(o[2], branch)]:
+            self._finish(owner, None)
+
+    # --- built-in google_search: cache the grounded model response ---
+
+    @staticmethod
+    def _model_call_owner(callback_context: CallbackContext) -> Tuple[str, str, Optional[str]]:
+        branch = getattr(callback_context._invocation_context, "branch", None)
+        return callback_context.invocation_id, callback_context.agent_name, branch
+
+    @staticmethod
+    def _tool_call_owner(tool_context: ToolContext) -> Tuple[str, str, Optional[str]]:
+        branch = tool_context._invocation_context.branch
+        return tool_context.invocation_id, tool_context.function_call_id, branch
+
+    @staticmethod
+    def _model_key(llm_request: LlmRequest, query: str) -> str:
+        instruction = llm_request.config.system_instruction if llm_request.config else None
+        history = normalize_contents(llm_request.contents[:-1])
+        payload = json.dumps([llm_request.model, str(instruction), history, " ".join(query.casefold().split())],
+                             sort_keys=True, default=str)
+        return "model:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        query = _latest_user_text(llm_request)
+        if query is None or not _uses_builtin_search(llm_request):
+            return None
+        key = self._model_key(llm_request, query)
+        owner = self._model_call_owner(callback_context)
+        data = await self._lookup_or_lead(key, self.model_stats, owner, wait=not is_hedge_branch(owner[2]))
+        if data is None:
+            return None
+        response = LlmResponse.model_validate(data)
+        response.custom_metadata = {**(response.custom_metadata or {}), "search_cache": "hit"}
+        return response
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        usable = not llm_response.error_code and llm_response.content is not None and llm_response.content.parts
+        data = llm_response.model_dump(mode="json", exclude_none=True) if usable else None
+        self._finish(self._model_call_owner(callback_context), data)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> Optional[LlmResponse]:
+        self._finish(self._model_call_owner(callback_context), None)
+        return None
+
+    # --- client-side search tools: cache the tool result ---
+
+    async def before_tool_callback(
+        self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext
+    ) -> Optional[Dict[str, Any]]:
+        if tool.name != SEARCH_TOOL_NAME or not isinstance(tool_args.get("query"), str):
+            return None
+        key = "tool:" + normalize_query(tool_args["query"])
+        owner = self._tool_call_owner(tool_context)
+        return await self._lookup_or_lead(key, self.tool_stats, owner, wait=not is_hedge_branch(owner[2]))
+
+    async def after_tool_callback(
+        self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext, result: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        if tool.name == SEARCH_TOOL_NAME:
+            ok = isinstance(result, dict) and result.get("status") != "error"
+            self._finish(self._tool_call_owner(tool_context), result if ok else None)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> Optional[Dict[str, Any]]:
+        if tool.name == SEARCH_TOOL_NAME:
+            self._finish(self._tool_call_owner(tool_context), None)
+        return None
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        # Searches led from this run that never got an answer (e.g. a callback short-circuited the call)
+        for owner in [o for o in self._pending if o[0] == invocation_context.invocation_id]:
+            self._finish(owner, None)
+        logger.info("search cache stats: %s", self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": self.model_stats.as_dict(), "tool": self.tool_stats.as_dict(), "size": len(self._cache)}
+
+
+class StubSearchBackend:
+    """Deterministic offline search backend for tests and benchmarks.
+
+    Returns canned results for known (normalized) queries and synthetic ones
+    otherwise, after an optional simulated latency.
+    """
+
+    def __init__(self, corpus: Optional[Dict[str, List[Dict[str, str]]]] = None, latency: float = 0.0):
+        self.corpus = {normalize_query(q): results for q, results in (corpus or {}).items()}
+        self.latency = latency
+        self.calls: List[str] = []
+
+    async def search(self, query: str) -> Dict[str, Any]:
+        self.calls.append(query)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        normalized = normalize_query(query)
+        results = self.corpus.get(normalized)
+        if results is None:
+            digest = hashlib.md5(normalized.encode("utf-8")).hexdigest()[:8]
+            results = [
+                {
+                    "title": f"Result {i + 1} for {query}",
+                    "url": f"https://example.com/{digest}/{i + 1}",
+                    "snippet": f"Stub snippet {i + 1} about {query}.",
+                }
+                for i in range(3)
+            ]
+        return {"status": "success", "query": query, "results": results}
+
+    def as_tool(self) -> FunctionTool:
+        """A FunctionTool named google_search that queries this backend."""
+        backend = self
+
+        async def google_search(query: str) -> dict:
+            """Searches the web (offline stub) and returns the top results.
+
+            Args:
+                query (str): The search query.
+
+            Returns:
+                dict: status, query and a list of results with title, url and snippet.
+            """
+            return await backend.search(query)
+
+        return FunctionTool(google_search)
+
+
+def use_stub_search(agent, backend: StubSearchBackend) -> None:
+    """Replaces the built-in google_search with `backend` everywhere in an agent tree (incl. AgentTools)."""
+    stub = backend.as_tool()
+    seen = set()
+
+    def visit(node):
+        if id(node) in seen:
+            return
+        seen.add(id(node))
+        tools = getattr(node, "tools", None)
+        if tools:
+            node.tools = [stub if getattr(t, "name", None) == SEARCH_TOOL_NAME else t for t in tools]
+            for tool in node.tools:
+                if hasattr(tool, "agent"):
+                    visit(tool.agent)
+        for sub_agent in getattr(node, "sub_agents", []):
+            visit(sub_agent)
+
+    visit(agent)
@@ -0,0 +1,672 @@
+"""Multi-process HTTP front end for the repo's root agents.
+
+One FastAPI app (served by uvicorn) accepts runs for any of the five agent
+packages and hands them to a pool of worker processes. Each worker builds the
+served agents once (through agent_common.registry, so agents it doesn't serve
+are never imported) and keeps a warm Runner per agent, so a request pays for
+neither imports nor client setup. The front end:
+
+* admits at most `queue_size` requests waiting for capacity; beyond that, or
+  after `queue_timeout_s` in the queue, it answers 429 with Retry-After;
+* caps concurrent runs per agent (`agent_limits`) and per worker
+  (`worker_concurrency`), and sends each run to the least-loaded worker (runs
+  that continue an in-memory session go back to the worker holding it);
+* streams the run's events back as NDJSON lines as they happen;
+* drains on shutdown: new requests get 503, in-flight runs finish (up to
+  `drain_timeout_s`), then the workers exit. POST /drain starts draining
+  without stopping, for load balancers.
+
+    python -m agent_common.serving --workers 4 --port 8080
+    curl -N localhost:8080/agents/agent_team/run -d '{"message": "Weather in London?"}'
+
+`--fake` points every model at FakeLlm (plus the stub search backend and a fake
+weather API) for load tests without API keys; see benchmarks/serving_load.py.
+`--record traffic.jsonl` appends every run's model and tool traffic to a
+cassette, and `--replay traffic.jsonl` serves it back instead of the real
+models and tools (agent_common/cassette.py; see benchmarks/replay.py).
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional
+
+from agent_common.registry import AGENT_MODULES, registry
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TERMINAL = ("done", "cancelled", "error")
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"agent_team=8,research-agent=2" -> {"agent_team": 8, "research-agent": 2}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+@dataclass
+class ServerConfig:
+    workers: int = 2
+    worker_concurrency: int = 16
+    """Runs in flight per worker process."""
+    queue_size: int = 64
+    """Requests allowed to wait for capacity before new ones get 429."""
+    queue_timeout_s: float = 10.0
+    drain_timeout_s: float = 30.0
+    agent_limits: Dict[str, int] = field(default_factory=dict)
+    """Concurrent runs per agent across all workers; unlisted agents are only bound by the pool."""
+    agents: List[str] = field(default_factory=lambda: list(AGENT_MODULES))
+    session_db: Optional[str] = None
+    """SqliteSessionService file shared by the workers; None keeps sessions in each worker's memory."""
+    fake: Optional[Dict[str, float]] = None
+    """FakeLlm settings (latency_s, tokens_per_s, output_tokens, tool_latency_s); None uses the real models."""
+    quiet: bool = False
+    """Discard what the agent modules print in the workers."""
+    record: Optional[str] = None
+    """Cassette every worker appends its model and tool traffic to."""
+    replay: Optional[str] = None
+    """Cassette to serve model and tool calls from, instead of the real models and tools."""
+    replay_latency_scale: float = 1.0
+
+    @classmethod
+    def from_env(cls, **overrides) -> "ServerConfig":
+        """Reads SERVE_WORKERS, SERVE_WORKER_CONCURRENCY, SERVE_QUEUE_SIZE, SERVE_QUEUE_TIMEOUT_S,
+        SERVE_DRAIN_TIMEOUT_S, SERVE_AGENT_LIMITS ("name=n,...") and SERVE_SESSION_DB."""
+        env = {
+            "workers": int(os.environ.get("SERVE_WORKERS", "2")),
+            "worker_concurrency": int(os.environ.get("SERVE_WORKER_CONCURRENCY", "16")),
+            "queue_size": int(os.environ.get("SERVE_QUEUE_SIZE", "64")),
+            "queue_timeout_s": float(os.environ.get("SERVE_QUEUE_TIMEOUT_S", "10")),
+            "drain_timeout_s": float(os.environ.get("SERVE_DRAIN_TIMEOUT_S", "30")),
+            "agent_limits": parse_limits(os.environ.get("SERVE_AGENT_LIMITS", "")),
+            "session_db": os.environ.get("SERVE_SESSION_DB") or None,
+        }
+        env.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**env)
+
+
+# --- worker process ---
+
+def event_summary(event, full: bool = False) -> Dict[str, Any]:
+    """What a client needs from an ADK event (or all of it, with `full`)."""
+    from agent_common.streaming_pipeline import event_text
+
+    if full:
+        return json.loads(event.model_dump_json(exclude_none=True))
+    summary: Dict[str, Any] = {"author": event.author, "partial": bool(event.partial),
+                               "final": event.is_final_response()}
+    text = event_text(event)
+    if text:
+        summary["text"] = text
+    calls = [call.name for call in event.get_function_calls()]
+    if calls:
+        summary["calls"] = calls
+    if event.actions and event.actions.state_delta:
+        summary["state_keys"] = sorted(event.actions.state_delta)
+    return summary
+
+
+class _Worker:
+    """Runs inside a worker process: warm runners, one asyncio task per run."""
+
+    def __init__(self, index: int, config: ServerConfig, inbox, outbox):
+        self.index = index
+        self.config = config
+        self.inbox = inbox
+        self.outbox = outbox
+        self.runners: Dict[str, Any] = {}
+        self.modules: Dict[str, Any] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    def _send(self, rid: int, kind: str, data: Dict[str, Any]) -> None:
+        self.outbox.put(("msg", rid, kind, data))
+
+    def _load(self) -> Dict[str, str]:
+        from google.adk.plugins.logging_plugin import LoggingPlugin
+        from google.adk.runners import Runner
+        from google.adk.sessions import InMemorySessionService
+
+        if self.config.session_db:
+            from agent_common.session_store import SqliteSessionService
+            session_service = SqliteSessionService(self.config.session_db)
+        else:
+            session_service = InMemorySessionService()
+        recorder = cassette = None
+        if self.config.record:
+            from agent_common.cassette import CassetteRecorder
+            recorder = CassetteRecorder(self.config.record)
+        if self.config.replay:
+            from agent_common.cassette import Cassette, install_replay
+            cassette = Cassette.load(self.config.replay)
+        errors = {}
+        for name in self.config.agents:  # only the agents this server serves are ever imported
+            try:
+                loaded = registry.load(name)
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+                continue
+            plugins = loaded.plugins
+            if self.config.quiet:
+                plugins = [p for p in plugins if not isinstance(p, LoggingPlugin)]
+            if self.config.fake is not None:
+                self._install_fakes(name, loaded.module, loaded.root_agent)
+            if recorder is not None:
+                plugins = plugins + [recorder]
+            if cassette is not None:
+                install_replay(loaded.root_agent, cassette, latency_scale=self.config.replay_latency_scale)
+            self.modules[name] = loaded.module
+            self.runners[name] = Runner(app_name=name, agent=loaded.root_agent, plugins=plugins,
+                                        session_service=session_service)
+        return errors
+
+    def _install_fakes(self, name: str, module, root_agent) -> None:
+        from agent_common.fakes import FakeLlm, FakeWeatherSession, install_fakes
+        from agent_common.search_cache import StubSearchBackend
+        from benchmarks.agents import SCRIPTS
+
+        fake = self.config.fake
+        llm = FakeLlm(latency_s=fake.get("latency_s", 0.05), tokens_per_s=fake.get("tokens_per_s", 0.0),
+                      output_tokens=int(fake.get("output_tokens", 64)), scripts=SCRIPTS)
+        install_fakes(root_agent, llm, StubSearchBackend(latency=fake.get("tool_latency_s", 0.01)))
+        if name == "agent_team":
+            from agent_team.weather_service import WeatherService
+            module.weather_service = WeatherService(session=FakeWeatherSession(fake.get("tool_latency_s", 0.01)),
+                                                    cache_ttl=0, stale_ttl=0)
+
+    async def _session(self, runner, payload: Dict[str, Any]):
+        """The run's session: created when the front end assigned a new id, else looked up (None if unknown)."""
+        user_id, session_id = payload.get("user_id") or "user", payload["session_id"]
+        service = runner.session_service
+        if payload.get("new_session"):
+            return await service.create_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+        return await service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+
+    async def _run(self, rid: int, agent: str, payload: Dict[str, Any]) -> None:
+        from google.adk.agents.run_config import RunConfig, StreamingMode
+        from google.genai import types
+
+        try:
+            runner = self.runners[agent]
+            session = await self._session(runner, payload)
+            if session is None:
+                self._send(rid, "error", {"error": f"unknown session {payload['session_id']!r}", "status": 404})
+                return
+            self._send(rid, "session", {"session_id": session.id, "user_id": session.user_id, "worker": self.index})
+            run_config = RunConfig(streaming_mode=StreamingMode.SSE if payload.get("stream_tokens") else StreamingMode.NONE)
+            message = types.Content(role="user", parts=[types.Part(text=payload["message"])])
+            async for event in runner.run_async(user_id=session.user_id, session_id=session.id,
+                                                new_message=message, run_config=run_config):
+                self._send(rid, "event", event_summary(event, payload.get("full_events", False)))
+            self._send(rid, "done", {})
+        except asyncio.CancelledError:
+            self._send(rid, "cancelled", {})
+        except Exception as e:
+            logger.exception("run %s for %s failed", rid, agent)
+            self._send(rid, "error", {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            self.tasks.pop(rid, None)
+
+    async def serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        errors = self._load()
+        if self.config.fake is None and self.config.replay is None:
+            for module in self.modules.values():
+                if hasattr(module, "start_clients"):
+                    await module.start_clients()
+        incoming: asyncio.Queue = asyncio.Queue()
+
+        def pump():  # blocking multiprocessing queue -> event loop
+            for msg in iter(self.inbox.get, None):
+                loop.call_soon_threadsafe(incoming.put_nowait, msg)
+            loop.call_soon_threadsafe(incoming.put_nowait, None)
+
+        threading.Thread(target=pump, name=f"worker-{self.index}-inbox", daemon=True).start()
+        self.outbox.put(("ready", self.index, sorted(self.runners), errors))
+        while (msg := await incoming.get()) is not None:
+            if msg[0] == "run":
+                _, rid, agent, payload = msg
+                self.tasks[rid] = asyncio.create_task(self._run(rid, agent, payload))
+            elif msg[0] == "cancel" and msg[1] in self.tasks:
+                self.tasks[msg[1]].cancel()
+        # Stop: the front end has drained; anything left was cancelled by it.
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for runner in self.runners.values():
+            await runner.close()
+        for module in self.modules.values():
+            if hasattr(module, "close_clients"):
+                await module.close_clients()
+
+
+def _worker_main(index: int, config: ServerConfig, inbox, outbox) -> None:
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    if config.quiet:
+        sys.stdout = open(os.devnull, "w")
+    asyncio.run(_Worker(index, config, inbox, outbox).serve())
+
+
+# --- front end ---
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+@dataclass
+class _WorkerHandle:
+    index: int
+    process: Any = None
+    inbox: Any = None
+    ready: bool = False
+    inflight: int = 0
+
+
+@dataclass
+class RunHandle:
+    """One admitted run: its worker slot, agent slot and the queue its messages arrive on."""
+    rid: int
+    agent: str
+    worker: _WorkerHandle
+    started: float
+    messages: asyncio.Queue = field(default_factory=asyncio.Queue)
+    finished: bool = False
+
+
+@dataclass
+class _AgentStats:
+    admitted: int = 0
+    completed: int = 0
+    cancelled: int = 0
+    errors: int = 0
+    rejected: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=2048))
+
+    def as_dict(self, inflight: int, limit: Optional[int]) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+        return {
+            "admitted": self.admitted, "completed": self.completed, "cancelled": self.cancelled, "errors": self.errors,
+            "rejected": self.rejected, "inflight": inflight, "limit": limit,
+            "p50_ms": round(statistics.median(ordered) * 1000, 1) if ordered else 0.0,
+            "p99_ms": round(p99 * 1000, 1),
+        }
+
+
+class AgentServer:
+    """Admission control, per-agent limits and routing over a pool of worker processes."""
+
+    def __init__(self, config: ServerConfig):
+        self.config = config
+        self.agents: List[str] = []
+        self.load_errors: Dict[str, str] = {}
+        self.draining = False
+        self.waiting = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [_WorkerHandle(i) for i in range(config.workers)]
+        self._outbox = None
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Condition] = None
+        self._limits = {name: asyncio.Semaphore(n) for name, n in config.agent_limits.items() if n > 0}
+        self._runs: Dict[int, RunHandle] = {}
+        self._ids = itertools.count(1)
+        self._stats: Dict[str, _AgentStats] = {}
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._closing = False
+
+    # --- worker processes ---
+
+    def _spawn(self, worker: _WorkerHandle) -> None:
+        if worker.inbox is not None:
+            worker.inbox.close()
+        worker.inbox = self._ctx.Queue()
+        worker.ready = False
+        worker.process = self._ctx.Process(target=_worker_main, name=f"agent-worker-{worker.index}",
+                                           args=(worker.index, self.config, worker.inbox, self._outbox), daemon=True)
+        worker.process.start()
+
+    async def start(self, timeout: float = 300.0) -> None:
+        """Starts the workers and waits until each has loaded its agents."""
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Condition()
+        self._outbox = self._ctx.Queue()
+        for worker in self._workers:
+            self._spawn(worker)
+        self._reader = threading.Thread(target=self._read_outbox, name="agent-server-outbox", daemon=True)
+        self._reader.start()
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    def _read_outbox(self) -> None:
+        # Blocking reader thread: hands worker messages to the event loop, and notices dead workers.
+        while not self._closing:
+            try:
+                msg = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                for worker in self._workers:
+                    if worker.process is not None and not worker.process.is_alive() and not self._closing:
+                        self._loop.call_soon_threadsafe(self._worker_died, worker)
+                continue
+            except (EOFError, OSError):
+                return
+            self._loop.call_soon_threadsafe(self._dispatch, msg)
+
+    def _dispatch(self, msg) -> None:
+        if msg[0] == "ready":
+            _, index, agents, errors = msg
+            self._workers[index].ready = True
+            self.agents, self.load_errors = agents, errors
+            for name, error in errors.items():
+                logger.warning("worker %s could not load %s: %s", index, name, error)
+            if all(w.ready for w in self._workers):
+                self._ready.set()
+            self._loop.create_task(self._notify_slots())
+            return
+        _, rid, kind, data = msg
+        run = self._runs.get(rid)
+        if run is None:
+            return
+        run.messages.put_nowait((kind, data))
+        if kind in TERMINAL:
+            self._finish(run, "rejected" if data.get("status") == 404 else kind)
+
+    def _worker_died(self, worker: _WorkerHandle) -> None:
+        if worker.process is None or worker.process.is_alive():
+            return  # already handled (and respawned)
+        logger.error("worker %s exited with %s; restarting it", worker.index, worker.process.exitcode)
+        for run in [r for r in self._runs.values() if r.worker is worker]:
+            run.messages.put_nowait(("error", {"error": "worker process exited"}))
+            self._finish(run, "error")
+        worker.inflight = 0
+        self._spawn(worker)
+
+    # --- slots ---
+
+    def _pick(self, sticky_key: Optional[str]) -> Optional[_WorkerHandle]:
+        capacity = self.config.worker_concurrency
+        if sticky_key and not self.config.session_db:
+            # In-memory sessions live in one worker, chosen by session id from the first turn on.
+            worker = self._workers[zlib.crc32(sticky_key.encode("utf-8")) % len(self._workers)]
+            return worker if worker.ready and worker.inflight < capacity else None
+        candidates = [w for w in self._workers if w.ready and w.inflight < capacity]
+        return min(candidates, key=lambda w: w.inflight) if candidates else None
+
+    async def _notify_slots(self) -> None:
+        async with self._slots:
+            self._slots.notify_all()
+
+    async def _reserve(self, agent: str, sticky_key: Optional[str]) -> _WorkerHandle:
+        limit = self._limits.get(agent)
+        if limit is not None:
+            await limit.acquire()
+        try:
+            async with self._slots:
+                await self._slots.wait_for(lambda: self._pick(sticky_key) is not None)
+                worker = self._pick(sticky_key)
+                worker.inflight += 1
+                return worker
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+
+    def _finish(self, run: RunHandle, outcome: str) -> None:
+        """Frees the run's slots and counts it: "done", "cancelled", "error" or "rejected" (unknown session)."""
+        if run.finished:
+            return
+        run.finished = True
+        self._runs.pop(run.rid, None)
+        run.worker.inflight = max(0, run.worker.inflight - 1)
+        if run.agent in self._limits:
+            self._limits[run.agent].release()
+        stats = self._stats[run.agent]
+        if outcome == "done":
+            stats.completed += 1
+            stats.latencies.append(time.perf_counter() - run.started)
+        elif outcome == "cancelled":
+            stats.cancelled += 1
+        elif outcome == "rejected":
+            stats.rejected += 1
+        else:
+            stats.errors += 1
+        if not self._runs:
+            self._idle.set()
+        self._loop.create_task(self._notify_slots())
+
+    # --- requests ---
+
+    async def submit(self, agent: str, payload: Dict[str, Any]) -> RunHandle:
+        """Admits a run and sends it to a worker, or raises Rejected (404/429/503)."""
+        if agent not in self.agents:
+            raise Rejected(404, f"unknown agent {agent!r}; serving {', '.join(self.agents)}")
+        stats = self._stats.setdefault(agent, _AgentStats())
+        if self.draining:
+            raise Rejected(503, "server is draining")
+        if self.waiting >= self.config.queue_size and self._pick(None) is None:
+            stats.rejected += 1
+            raise Rejected(429, "admission queue is full")
+        if not payload.get("session_id"):
+            # The id is assigned here, before routing, so later turns find the worker holding the session
+            payload = {**payload, "session_id": uuid.uuid4().hex, "new_session": True}
+        self.waiting += 1
+        try:
+            worker = await asyncio.wait_for(self._reserve(agent, payload["session_id"]),
+                                            self.config.queue_timeout_s)
+        except asyncio.TimeoutError:
+            stats.rejected += 1
+            raise Rejected(429, f"no capacity within {self.config.queue_timeout_s:g}s")
+        finally:
+            self.waiting -= 1
+        run = RunHandle(next(self._ids), agent, worker, time.perf_counter())
+        self._runs[run.rid] = run
+        self._idle.clear()
+        stats.admitted += 1
+        worker.inbox.put(("run", run.rid, agent, payload))
+        return run
+
+    async def messages(self, run: RunHandle) -> AsyncGenerator[Dict[str, Any], None]:
+        """The run's messages ({"type": "session"|"event"|"done"|"cancelled"|"error", ...}) until it ends.
+
+        If the consumer stops early (client disconnected), the run is cancelled in
+        its worker; its slots are freed once the worker confirms.
+        """
+        try:
+            while True:
+                kind, data = await run.messages.get()
+                yield {"type": kind, **data}
+                if kind in TERMINAL:
+                    return
+        finally:
+            if not run.finished and run.worker.inbox is not None:
+                run.worker.inbox.put(("cancel", run.rid))
+
+    async def drain(self) -> None:
+        """Refuses new runs, waits for in-flight ones (up to drain_timeout_s), then stops the workers."""
+        self.draining = True
+        if self._runs:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.config.drain_timeout_s)
+            except asyncio.TimeoutError:
+                logger.warning("drain timed out; cancelling %d runs", len(self._runs))
+                for run in list(self._runs.values()):
+                    run.worker.inbox.put(("cancel", run.rid))
+        self._closing = True
+        for worker in self._workers:
+            worker.inbox.put(None)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.inbox.close()
+            worker.inbox.join_thread()
+            worker.inbox = None
+        await asyncio.to_thread(self._reader.join, 2)
+        self._outbox.close()
+        self._outbox = None  # release the queues' semaphores before uvicorn re-raises the signal
+
+    def stats(self) -> Dict[str, Any]:
+        inflight: Dict[str, int] = {}
+        for run in self._runs.values():
+            inflight[run.agent] = inflight.get(run.agent, 0) + 1
+        return {
+            "draining": self.draining,
+            "waiting": self.waiting,
+            "queue_size": self.config.queue_size,
+            "workers": [{"index": w.index, "ready": w.ready, "inflight": w.inflight,
+                         "pid": w.process.pid if w.process else None} for w in self._workers],
+            "agents": {name: self._stats.get(name, _AgentStats()).as_dict(
+                inflight.get(name, 0), self.config.agent_limits.get(name)) for name in self.agents},
+            "load_errors": self.load_errors,
+        }
+
+
+# --- HTTP ---
+
+def create_app(config: ServerConfig):
+    """FastAPI app serving `config.agents` from a worker pool started in its lifespan."""
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from pydantic import BaseModel
+
+    class RunRequest(BaseModel):
+        message: str
+        user_id: Optional[str] = None
+        session_id: Optional[str] = None
+        stream: bool = True
+        """NDJSON lines as events happen; false returns one JSON object when the run ends."""
+        stream_tokens: bool = False
+        """Also stream partial (token) events."""
+        full_events: bool = False
+
+    server = AgentServer(config)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        await server.start()
+        yield
+        await server.drain()
+
+    app = FastAPI(title="ADK agents", lifespan=lifespan)
+    app.state.server = server
+
+    @app.get("/healthz")
+    async def healthz():
+        status = 503 if server.draining else 200
+        return JSONResponse({"status": "draining" if server.draining else "ok"}, status_code=status)
+
+    @app.get("/agents")
+    async def agents():
+        return {"agents": server.agents, "load_errors": server.load_errors}
+
+    @app.get("/stats")
+    async def stats():
+        return server.stats()
+
+    @app.post("/drain")
+    async def drain():
+        server.draining = True
+        return {"draining": True, "inflight": len(server._runs)}
+
+    @app.post("/agents/{agent}/run")
+    async def run(agent: str, body: RunRequest):
+        try:
+            handle = await server.submit(agent, body.model_dump(exclude={"stream"}))
+        except Rejected as e:
+            headers = {"Retry-After": "1"} if e.status in (429, 503) else None
+            return JSONResponse({"error": e.reason}, status_code=e.status, headers=headers)
+
+        messages = server.messages(handle)
+        first = await messages.__anext__()
+        if first["type"] == "error" and first.get("status"):  # e.g. 404 for an unknown session_id
+            return JSONResponse({"error": first["error"]}, status_code=first["status"])
+
+        async def all_messages():
+            yield first
+            async for message in messages:
+                yield message
+
+        if body.stream:
+            async def ndjson():
+                async for message in all_messages():
+                    yield json.dumps(message, ensure_ascii=False) + "\n"
+
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        result: Dict[str, Any] = {"events": []}
+        async for message in all_messages():
+            if message["type"] == "event":
+                result["events"].append(message)
+                if message.get("final") and message.get("text"):
+                    result["text"] = message["text"]
+            elif message["type"] == "session":
+                result.update(session_id=message["session_id"], user_id=message["user_id"])
+            elif message["type"] == "error":
+                return JSONResponse({**result, "error": message["error"]}, status_code=500)
+            elif message["type"] == "cancelled":
+                return JSONResponse({**result, "error": "run cancelled"}, status_code=503)
+        return result
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--worker-concurrency", type=int)
+    parser.add_argument("--queue-size", type=int)
+    parser.add_argument("--queue-timeout", type=float, dest="queue_timeout_s")
+    parser.add_argument("--drain-timeout", type=float, dest="drain_timeout_s")
+    parser.add_argument("--agent-limits", type=parse_limits, help='e.g. "agent_team=8,research-agent=2"')
+    parser.add_argument("--agents", nargs="+", choices=list(AGENT_MODULES))
+    parser.add_argument("--session-db", help="share sessions between workers in this SQLite file")
+    parser.add_argument("--fake", action="store_true", help="serve against FakeLlm and stub tools (no API keys)")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="fake model time to first token (s)")
+    parser.add_argument("--fake-tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--fake-output-tokens", type=int, default=64)
+    parser.add_argument("--fake-tool-latency", type=float, default=0.01)
+    parser.add_argument("--quiet", action="store_true", help="silence agent prints and LoggingPlugin in workers")
+    parser.add_argument("--record", help="append model and tool traffic to this cassette")
+    parser.add_argument("--replay", help="serve model and tool calls from this cassette")
+    parser.add_argument("--replay-latency-scale", type=float, help="times recorded latency; 0 = none")
+    args = parser.parse_args()
+
+    fake = None
+    if args.fake:
+        fake = {"latency_s": args.fake_latency, "tokens_per_s": args.fake_tokens_per_s,
+                "output_tokens": args.fake_output_tokens, "tool_latency_s": args.fake_tool_latency}
+    config = ServerConfig.from_env(
+        workers=args.workers, worker_concurrency=args.worker_concurrency, queue_size=args.queue_size,
+        queue_timeout_s=args.queue_timeout_s, drain_timeout_s=args.drain_timeout_s, agent_limits=args.agent_limits,
+        agents=args.agents, session_db=args.session_db, fake=fake, quiet=args.quiet or None,
+        record=args.record, replay=args.replay, replay_latency_scale=args.replay_latency_scale,
+    )
+    logging.basicConfig(level=logging.INFO)
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port,
+                timeout_graceful_shutdown=int(config.drain_timeout_s) or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+"""Durable session service on SQLite (WAL), with batched writes and a read cache.
+
+`SqliteSessionService` is a drop-in `BaseSessionService`: sessions, events and
+app:/user:/session state survive restarts and can be shared by several worker
+processes pointing at the same file.
+
+* Writes: `append_event` updates the in-process copy immediately and queues the
+  event. Queued events are written in one transaction every `flush_interval`
+  seconds (or once `batch_size` events are waiting), and the state deltas of
+  all events queued for a session are merged into one state update
+  (`flush_interval=0` commits every event before returning).
+* Reads: recently used sessions are served from an LRU cache. With
+  `validate_cache` (the default) a hit still costs one primary-key lookup, so
+  writes from other processes are seen; app:/user: state always comes from
+  that lookup.
+* Compaction: only the newest `max_events` events of a session are kept (the
+  state they produced stays in the session row); `compact()` also drops events
+  older than a given age.
+
+Events written in the last `flush_interval` are lost if the process dies. A
+batch that fails to write (a locked database, a full disk) is queued again
+ahead of newer writes and retried every `retry_interval` seconds; until a
+retry succeeds, `flush()` and `get_session()` raise the error.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import BaseSessionService, GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+from agent_common.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY, state TEXT NOT NULL, update_time REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, state TEXT NOT NULL, update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id));
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, id TEXT NOT NULL, state TEXT NOT NULL,
+    create_time REAL NOT NULL, update_time REAL NOT NULL, event_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (app_name, user_id, id));
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, app_name TEXT NOT NULL, user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL, id TEXT NOT NULL, invocation_id TEXT NOT NULL, timestamp REAL NOT NULL,
+    data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (app_name, user_id, session_id, seq);
+"""
+
+SessionKey = Tuple[str, str, str]
+
+
+def split_state_delta(delta: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """(app, user, session) parts of a state delta, prefixes stripped; temp: keys dropped."""
+    app, user, session = {}, {}, {}
+    for key, value in (delta or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+def merge_state(app: Dict[str, Any], user: Dict[str, Any], session: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(session)
+    merged.update({State.APP_PREFIX + k: v for k, v in app.items()})
+    merged.update({State.USER_PREFIX + k: v for k, v in user.items()})
+    return merged
+
+
+@dataclass
+class _CachedSession:
+    state: Dict[str, Any]  # session-level keys only
+    events: List[Event]
+    update_time: float
+
+
+@dataclass
+class _PendingWrites:
+    events: List[Event] = field(default_factory=list)
+    session_delta: Dict[str, Any] = field(default_factory=dict)
+    update_time: float = 0.0
+
+
+@dataclass
+class SessionStoreStats:
+    events_appended: int = 0
+    events_written: int = 0
+    flushes: int = 0
+    state_writes_coalesced: int = 0  # per-event state updates folded into another one
+    cache_hits: int = 0
+    cache_misses: int = 0
+    events_compacted: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class SqliteSessionService(BaseSessionService):
+    """Session service on one SQLite file in WAL mode (see module docstring)."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.05,
+        batch_size: int = 256,
+        max_events: Optional[int] = 500,
+        cache_size: int = 1024,
+        cache_ttl: float = 3600.0,
+        validate_cache: bool = True,
+        retry_interval: float = 1.0,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_events = max_events
+        self.validate_cache = validate_cache
+        self.retry_interval = retry_interval
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._pending: Dict[SessionKey, _PendingWrites] = {}
+        self._pending_app: Dict[str, Dict[str, Any]] = {}
+        self._pending_user: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pending_events = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_error: Optional[Exception] = None  # set while a background flush keeps failing
+        self.stats = SessionStoreStats()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- synchronous storage helpers (run in a worker thread) ---
+
+    @staticmethod
+    def _load_json(conn, sql: str, params) -> Dict[str, Any]:
+        row = conn.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _shared_state(self, conn, app_name: str, user_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        app = self._load_json(conn, "SELECT state FROM app_states WHERE app_name = ?", (app_name,))
+        user = self._load_json(conn, "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?",
+                               (app_name, user_id))
+        return app, user
+
+    def _insert_session(self, key: SessionKey, state: Dict[str, Any], app_delta, user_delta, now: float):
+        app_name, user_id, session_id = key
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer.execute(
+                    "INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (app_name, user_id, session_id, json.dumps(state), now, now),
+                )
+                self._upsert_shared(app_name, user_id, app_delta, user_delta, now)
+                app, user = self._shared_state(self._writer, app_name, user_id)
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+        return app, user
+
+    def _upsert_shared(self, app_name: str, user_id: Optional[str], app_delta, user_delta, now: float) -> None:
+        if app_delta:
+            state = self._load_json(self._writer, "SELECT state FROM app_states WHERE app_name = ?", (app_name,))
+            state.update(app_delta)
+            self._writer.execute("INSERT OR REPLACE INTO app_states VALUES (?, ?, ?)",
+                                 (app_name, json.dumps(state), now))
+        if user_delta:
+            state = self._load_json(self._writer, "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?",
+                                    (app_name, user_id))
+            state.update(user_delta)
+            self._writer.execute("INSERT OR REPLACE INTO user_states VALUES (?, ?, ?, ?)",
+                                 (app_name, user_id, json.dumps(state), now))
+
+    def _load_session(self, key: SessionKey) -> Optional[Tuple[_CachedSession, Dict[str, Any], Dict[str, Any]]]:
+        app_name, user_id, session_id = key
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT state, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            limit = self.max_events if self.max_events else -1
+            rows = self._reader.execute(
+                "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+                " ORDER BY seq DESC LIMIT ?", (*key, limit)
+            ).fetchall()
+            app, user = self._shared_state(self._reader, app_name, user_id)
+        events = [Event.model_validate_json(data) for (data,) in reversed(rows)]
+        return _CachedSession(json.loads(row[0]), events, row[1]), app, user
+
+    def _probe(self, key: SessionKey) -> Optional[Tuple[float, Dict[str, Any], Dict[str, Any]]]:
+        """(update_time, app state, user state) for a cached session, in one query."""
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT s.update_time, a.state, u.state FROM sessions s"
+                " LEFT JOIN app_states a ON a.app_name = s.app_name"
+                " LEFT JOIN user_states u ON u.app_name = s.app_name AND u.user_id = s.user_id"
+                " WHERE s.app_name = ? AND s.user_id = ? AND s.id = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else {}, json.loads(row[2]) if row[2] else {}
+
+    def _write_batch(self, pending, pending_app, pending_user) -> int:
+        now = time.time()
+        written = 0
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                for key, writes in pending.items():
+                    state_sql = ""
+                    params: List[Any] = []
+                    if writes.session_delta:
+                        state = self._load_json(
+                            self._writer, "SELECT state FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+                        state.update(writes.session_delta)
+                        state_sql, params = "state = ?, ", [json.dumps(state)]
+                    updated = self._writer.execute(
+                        f"UPDATE sessions SET {state_sql}update_time = MAX(update_time, ?), event_count = event_count + ?"
+                        " WHERE app_name = ? AND user_id = ? AND id = ?",
+                        (*params, writes.update_time, len(writes.events), *key),
+                    ).rowcount
+                    if not updated:
+                        continue  # deleted meanwhile
+                    self._writer.executemany(
+                        "INSERT INTO events (app_name, user_id, session_id, id, invocation_id, timestamp, data)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(*key, e.id, e.invocation_id, e.timestamp, e.model_dump_json(exclude_none=True))
+                         for e in writes.events],
+                    )
+                    written += len(writes.events)
+                    self._compact_session(key)
+                for app_name, delta in pending_app.items():
+                    self._upsert_shared(app_name, None, delta, None, now)
+                for (app_name, user_id), delta in pending_user.items():
+                    self._upsert_shared(app_name, user_id, None, delta, now)
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+        return written
+
+    def _compact_session(self, key: SessionKey) -> None:
+        # Trim in chunks (once 25% over the cap) rather than on every write.
+        if not self.max_events:
+            return
+        (count,) = self._writer.execute(
+            "SELECT event_count FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key).fetchone()
+        if count <= self.max_events * 1.25:
+            return
+        deleted = self._writer.execute(
+            "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq <= ("
+            " SELECT seq FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            " ORDER BY seq DESC LIMIT 1 OFFSET ?)", (*key, *key, self.max_events)
+        ).rowcount
+        self._writer.execute(
+            "UPDATE sessions SET event_count = event_count - ? WHERE app_name = ? AND user_id = ? AND id = ?",
+            (deleted, *key))
+        self.stats.events_compacted += deleted
+
+    # --- flushing ---
+
+    async def flush(self) -> None:
+        """Writes every queued event and state update now; on failure they stay queued and the error is raised."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:  # batches must reach the database in order
+            if not self._pending and not self._pending_app and not self._pending_user:
+                self._flush_error = None
+                return
+            batch = (self._pending, self._pending_app, self._pending_user)
+            self._pending, self._pending_app, self._pending_user = {}, {}, {}
+            self._pending_events = 0
+            try:
+                written = await asyncio.to_thread(self._write_batch, *batch)
+            except Exception:
+                self._requeue(*batch)
+                raise
+            self._flush_error = None
+            self.stats.flushes += 1
+            self.stats.events_written += written
+
+    def _requeue(self, pending, pending_app, pending_user) -> None:
+        """Puts a batch that failed to write back in the queue, ahead of what was queued since."""
+        for key, writes in pending.items():
+            newer = self._pending.get(key)
+            if newer is not None:
+                writes.events.extend(newer.events)
+                writes.session_delta.update(newer.session_delta)
+                writes.update_time = max(writes.update_time, newer.update_time)
+            self._pending[key] = writes
+        for app_name, delta in pending_app.items():
+            self._pending_app[app_name] = {**delta, **self._pending_app.get(app_name, {})}
+        for user_key, delta in pending_user.items():
+            self._pending_user[user_key] = {**delta, **self._pending_user.get(user_key, {})}
+        self._pending_events = sum(len(writes.events) for writes in self._pending.values())
+
+    async def _flush_later(self, delay: Optional[float] = None) -> None:
+        await asyncio.sleep(self.flush_interval if delay is None else delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.exception("session store flush failed; retrying in %.1fs", self.retry_interval)
+            self._flush_error = e
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later(self.retry_interval))
+
+    # --- BaseSessionService ---
+
+    async def create_session(
+        self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None, session_id: Optional[str] = None
+    ) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        app_delta, user_delta, session_state = split_state_delta(state)
+        now = time.time()
+        await self.flush()  # pending app:/user: updates first
+        try:
+            app, user = await asyncio.to_thread(self._insert_session, key, session_state, app_delta, user_delta, now)
+        except sqlite3.IntegrityError:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        self._cache.set(key, _CachedSession(dict(session_state), [], now))
+        return Session(app_name=app_name, user_id=user_id, id=session_id,
+                       state=merge_state(app, user, session_state), events=[], last_update_time=now)
+
+    async def get_session(
+        self, *, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig] = None
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        if self._flush_error is not None:
+            await self.flush()  # raises while queued writes still can't be stored
+        cached = self._cache.get(key)
+        app = user = None
+        if cached is not None and self.validate_cache:
+            probe = await asyncio.to_thread(self._probe, key)
+            if probe is None:
+                self._cache.pop(key)
+                cached = None
+            elif probe[0] > cached.update_time + 1e-6:
+                cached = None  # another process wrote to it
+            else:
+                _, app, user = probe
+        if cached is not None and app is None:
+            app, user = await asyncio.to_thread(self._shared_state_locked, app_name, user_id)
+        if cached is None:
+            self.stats.cache_misses += 1
+            await self.flush()
+            loaded = await asyncio.to_thread(self._load_session, key)
+            if loaded is None:
+                return None
+            cached, app, user = loaded
+            self._cache.set(key, cached)
+        else:
+            self.stats.cache_hits += 1
+
+        # Queued (not yet written) app:/user: updates are newer than what the database returned.
+        app = {**app, **self._pending_app.get(app_name, {})}
+        user = {**user, **self._pending_user.get((app_name, user_id), {})}
+        events = list(cached.events)
+        if config and config.after_timestamp:
+            events = [e for e in events if e.timestamp >= config.after_timestamp]
+        if config and config.num_recent_events:
+            events = events[-config.num_recent_events:]
+        return Session(app_name=app_name, user_id=user_id, id=session_id,
+                       state=merge_state(app, user, cached.state), events=events,
+                       last_update_time=cached.update_time)
+
+    def _shared_state_locked(self, app_name: str, user_id: str):
+        with self._read_lock:
+            return self._shared_state(self._reader, app_name, user_id)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+
+        def query():
+            with self._read_lock:
+                sql = "SELECT user_id, id, state, update_time FROM sessions WHERE app_name = ?"
+                params = [app_name]
+                if user_id is not None:
+                    sql, params = sql + " AND user_id = ?", params + [user_id]
+                rows = self._reader.execute(sql, params).fetchall()
+                app = self._load_json(self._reader, "SELECT state FROM app_states WHERE app_name = ?", (app_name,))
+                users = {u: json.loads(s) for u, s in self._reader.execute(
+                    "SELECT user_id, state FROM user_states WHERE app_name = ?", (app_name,))}
+            return rows, app, users
+
+        rows, app, users = await asyncio.to_thread(query)
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=uid, id=sid, state=merge_state(app, users.get(uid, {}), json.loads(state)),
+                    events=[], last_update_time=update_time)
+            for uid, sid, state, update_time in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._cache.pop(key)
+        dropped = self._pending.pop(key, None)
+        if dropped:
+            self._pending_events -= len(dropped.events)
+
+        def delete():
+            with self._write_lock:
+                self._writer.execute("BEGIN IMMEDIATE")
+                self._writer.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+                self._writer.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+                self._writer.execute("COMMIT")
+
+        await asyncio.to_thread(delete)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = await super().append_event(session, event)  # trims temp: keys, updates `session`
+        session.last_update_time = event.timestamp
+        key = (session.app_name, session.user_id, session.id)
+        app_delta, user_delta, session_delta = split_state_delta(event.actions.state_delta if event.actions else None)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            cached.events.append(event)
+            if self.max_events and len(cached.events) > self.max_events:
+                del cached.events[:len(cached.events) - self.max_events]
+            cached.state.update(session_delta)
+            cached.update_time = max(cached.update_time, event.timestamp)
+
+        pending = self._pending.setdefault(key, _PendingWrites())
+        if session_delta and pending.session_delta:
+            self.stats.state_writes_coalesced += 1
+        pending.events.append(event)
+        pending.session_delta.update(session_delta)
+        pending.update_time = max(pending.update_time, event.timestamp)
+        if app_delta:
+            self._pending_app.setdefault(session.app_name, {}).update(app_delta)
+        if user_delta:
+            self._pending_user.setdefault((session.app_name, session.user_id), {}).update(user_delta)
+        self._pending_events += 1
+        self.stats.events_appended += 1
+
+        if self.flush_interval <= 0 or self._pending_events >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        return event
+
+    # --- maintenance ---
+
+    async def compact(self, max_age_s: float) -> int:
+        """Deletes events older than `max_age_s` (session state is kept); returns how many."""
+        await self.flush()
+        cutoff = time.time() - max_age_s
+
+        def run():
+            with self._write_lock:
+                self._writer.execute("BEGIN IMMEDIATE")
+                counts = self._writer.execute(
+                    "SELECT app_name, user_id, session_id, COUNT(*) FROM events WHERE timestamp < ?"
+                    " GROUP BY app_name, user_id, session_id", (cutoff,)).fetchall()
+                self._writer.executemany(
+                    "UPDATE sessions SET event_count = event_count - ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                    [(n, a, u, s) for a, u, s, n in counts])
+                deleted = self._writer.execute("DELETE FROM events WHERE timestamp < ?", (cutoff,)).rowcount
+                self._writer.execute("COMMIT")
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return deleted
+
+        deleted = await asyncio.to_thread(run)
+        self.stats.events_compacted += deleted
+        self._cache.clear()
+        return deleted
+
+    async def close(self) -> None:
+        """Flushes queued writes and closes the database."""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
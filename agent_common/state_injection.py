@@ -0,0 +1,247 @@
+"""Token-budgeted state injection for instruction templates.
+
+ADK renders `{key}` placeholders in an agent's instruction with the whole
+session-state value, so prompts grow with every upstream output. A
+`StateInjector` renders the same templates (same syntax, via ADK's own
+`inject_session_state`) but first compacts each budgeted value to fit its
+token budget:
+
+* "truncate": keep the head, cut at a sentence or line boundary.
+* "extract": local extractive summary, picking the highest-scoring sentences
+  (term frequency, position, headings) in their original order.
+
+Compactions are cached by content hash, so re-rendering the same value (the
+next model turn, another agent, a retry) costs a dictionary lookup. Token
+counts come from Gemini's local tokenizer when `sentencepiece` is installed
+and its model file is available, else from a word/punctuation estimate.
+`stats()` reports per-agent prompt tokens before and after compaction.
+
+    injector = StateInjector({"research_findings": KeyBudget(800, "extract")})
+    agent = Agent(..., instruction=injector.instruction("Summarize: {research_findings}"))
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.utils.instructions_utils import inject_session_state
+
+from agent_common.cache import TTLCache
+from agent_common.search_cache import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+TRUNCATE, EXTRACT = "truncate", "extract"
+TRUNCATION_MARK = " [...]"
+PLACEHOLDER = re.compile(r"{+[^{}]*}+")  # same pattern ADK uses
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[*])")
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+# --- token counting ---
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Gemini token count: punctuation is one token, words ~4 characters per token."""
+    return sum(max(1, math.ceil(len(piece) / 4)) if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _PIECES.findall(text))
+
+
+def make_token_counter(model: str = "gemini-2.5-flash") -> Callable[[str], int]:
+    """Exact counts via google.genai's LocalTokenizer when usable, else `estimate_tokens`."""
+    try:
+        from google.genai.local_tokenizer import LocalTokenizer
+        tokenizer = LocalTokenizer(model_name=model)
+        tokenizer.count_tokens("probe")  # loads (possibly downloads) the sentencepiece model
+    except Exception as e:  # sentencepiece missing, offline, unknown model...
+        logger.info("local tokenizer unavailable (%s); estimating token counts", e)
+        return estimate_tokens
+    return lambda text: tokenizer.count_tokens(text).total_tokens
+
+
+# --- compaction strategies ---
+
+def _units(text: str) -> List[Tuple[str, str]]:
+    """(unit, separator-before-next) pairs: lines, and sentences within prose lines."""
+    units = []
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        parts = _SENTENCES.split(line)
+        units.extend((part, " ") for part in parts[:-1])
+        units.append((parts[-1], "\n"))
+    return units
+
+
+def truncate(text: str, max_tokens: int, count: Callable[[str], int] = estimate_tokens) -> str:
+    """Longest prefix within `max_tokens`, cut at the last sentence/line that fits."""
+    if count(text) <= max_tokens:
+        return text
+    kept, used = [], count(TRUNCATION_MARK)
+    for unit, sep in _units(text):
+        cost = count(unit)
+        if used + cost > max_tokens:
+            if not kept:  # a single oversized unit: cut by words
+                words = unit.split()
+                while words and count(" ".join(words)) + used > max_tokens:
+                    words = words[: max(1, len(words) * 3 // 4)] if len(words) > 1 else []
+                kept.append((" ".join(words), ""))
+            break
+        kept.append((unit, sep))
+        used += cost
+    return "".join(unit + sep for unit, sep in kept).rstrip() + TRUNCATION_MARK
+
+
+def extractive_summary(text: str, max_tokens: int, count: Callable[[str], int] = estimate_tokens) -> str:
+    """The best-scoring sentences/lines that fit in `max_tokens`, in their original order.
+
+    A unit scores the average document frequency of its content words, with a
+    bonus for the first unit and for headings, which also keeps the structure
+    of markdown outlines readable.
+    """
+    if count(text) <= max_tokens:
+        return text
+    units = _units(text)
+    freq = Counter(w for unit, _ in units for w in _WORDS.findall(unit.lower()) if w not in STOPWORDS)
+    top = max(freq.values(), default=1)
+
+    def score(index: int, unit: str) -> float:
+        words = [w for w in _WORDS.findall(unit.lower()) if w not in STOPWORDS]
+        value = sum(freq[w] / top for w in words) / math.sqrt(len(words)) if words else 0.0
+        stripped = unit.lstrip()
+        if stripped.startswith("#") or (stripped.startswith("**") and stripped.rstrip().endswith("**")):
+            value += 1.0
+        if index == 0:
+            value += 0.5
+        return value
+
+    ranked = sorted(range(len(units)), key=lambda i: score(i, units[i][0]), reverse=True)
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = count(units[i][0]) + 1
+        if used + cost <= max_tokens:
+            chosen.add(i)
+            used += cost
+    if not chosen:
+        return truncate(text, max_tokens, count)
+    return "".join(units[i][0] + units[i][1] for i in sorted(chosen)).rstrip()
+
+
+STRATEGIES = {TRUNCATE: truncate, EXTRACT: extractive_summary}
+
+
+# --- injector ---
+
+@dataclass(frozen=True)
+class KeyBudget:
+    max_tokens: int
+    strategy: str = TRUNCATE
+
+
+@dataclass
+class _AgentStats:
+    renders: int = 0
+    original_tokens: int = 0
+    injected_tokens: int = 0
+    compactions: int = 0
+    cache_hits: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        saved = self.original_tokens - self.injected_tokens
+        return {
+            "renders": self.renders,
+            "original_tokens": self.original_tokens,
+            "injected_tokens": self.injected_tokens,
+            "saved_tokens": saved,
+            "savings": round(saved / self.original_tokens, 3) if self.original_tokens else 0.0,
+            "compactions": self.compactions,
+            "cache_hits": self.cache_hits,
+        }
+
+
+class StateInjector:
+    """Renders instruction templates with budgeted (compacted) state values."""
+
+    def __init__(
+        self,
+        budgets: Dict[str, KeyBudget],
+        count_tokens: Optional[Callable[[str], int]] = None,
+        cache_size: int = 512,
+        enabled: bool = True,
+    ):
+        self.budgets = dict(budgets)
+        self.count_tokens = count_tokens or estimate_tokens
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=cache_size, ttl=24 * 3600)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _AgentStats] = {}
+
+    @classmethod
+    def from_env(cls, budgets: Dict[str, KeyBudget], **kwargs) -> "StateInjector":
+        """Reads STATE_BUDGETS (0 injects values whole) and STATE_TOKENIZER (local: use Gemini's tokenizer)."""
+        kwargs.setdefault("enabled", os.environ.get("STATE_BUDGETS", "1") != "0")
+        if os.environ.get("STATE_TOKENIZER") == "local":
+            kwargs.setdefault("count_tokens", make_token_counter())
+        return cls(budgets, **kwargs)
+
+    def compact(self, key: str, value: str) -> Tuple[str, int, int, bool]:
+        """(compacted value, original tokens, compacted tokens, cache hit) for one state value."""
+        budget = self.budgets[key]
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).hexdigest()
+        cache_key = (digest, budget)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return (*cached, True)
+        original = self.count_tokens(value)
+        compacted = value
+        if original > budget.max_tokens:
+            compacted = STRATEGIES[budget.strategy](value, budget.max_tokens, self.count_tokens)
+        result = (compacted, original, self.count_tokens(compacted) if compacted is not value else original)
+        self._cache.set(cache_key, result)
+        return (*result, False)
+
+    async def render(self, template: str, context: ReadonlyContext) -> str:
+        """`template` with state placeholders filled in, budgeted keys compacted."""
+        ctx = context._invocation_context
+        state = ctx.session.state
+        referenced = {m.group().strip("{}").strip().removesuffix("?") for m in PLACEHOLDER.finditer(template)}
+        budgeted = [key for key in referenced if key in self.budgets and state.get(key) is not None]
+        if not self.enabled or not budgeted:
+            return await inject_session_state(template, context)
+
+        overrides, original_total, injected_total, compactions, hits = {}, 0, 0, 0, 0
+        for key in budgeted:
+            value, original, injected, hit = self.compact(key, str(state[key]))
+            overrides[key] = value
+            original_total += original
+            injected_total += injected
+            compactions += injected < original
+            hits += hit
+        with self._lock:
+            stats = self._stats.setdefault(context.agent_name, _AgentStats())
+            stats.renders += 1
+            stats.original_tokens += original_total
+            stats.injected_tokens += injected_total
+            stats.compactions += compactions
+            stats.cache_hits += hits
+
+        session = ctx.session.model_copy(update={"state": {**state, **overrides}})
+        return await inject_session_state(template, ReadonlyContext(ctx.model_copy(update={"session": session})))
+
+    def instruction(self, template: str):
+        """An InstructionProvider rendering `template` through this injector."""
+        async def provider(context: ReadonlyContext) -> str:
+            return await self.render(template, context)
+
+        return provider
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent injected-state token counts before/after compaction."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
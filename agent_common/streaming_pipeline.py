@@ -0,0 +1,209 @@
+"""SequentialAgent that pipelines its last two stages over streamed output.
+
+In a plain SequentialAgent every stage waits for the previous stage's complete
+`output_key`. `StreamingSequentialAgent` runs the stages before the producer
+as usual, then streams the producer (e.g. WriterAgent) and starts the section
+stage (e.g. EditorAgent) on each section of the producer's output as soon as
+that section is complete, i.e. when the next markdown heading starts streaming.
+Section runs overlap with the producer and with each other; their tokens are
+forwarded to the caller in document order as partial events (when the caller
+asked for `StreamingMode.SSE`), and the joined result is saved to the section
+stage's `output_key` in one final event.
+
+Each section run sees the section (not the whole draft) under the producer's
+`output_key`, so the section stage's instruction template works unchanged.
+"""
+import asyncio
+import re
+from typing import AsyncGenerator, Dict, List, Optional
+
+from google.adk.agents import SequentialAgent
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+DEFAULT_SECTION_PATTERN = r"(?m)^(?=#{1,6} |\*\*[^*\n]+\*\*[ \t]*$)"
+"""Sections start at markdown headings or at lines that are entirely bold."""
+
+
+def event_text(event: Event) -> str:
+    """The non-thought text of an event."""
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+class SectionSplitter:
+    """Cuts growing text into sections once the heading after them has started.
+
+    Sections shorter than `min_chars` are merged into the next one, so a
+    headline or a one-line intro doesn't become its own model call.
+    """
+
+    def __init__(self, pattern: str = DEFAULT_SECTION_PATTERN, min_chars: int = 200):
+        self.pattern = re.compile(pattern)
+        self.min_chars = min_chars
+        self.offset = 0  # end of the text already handed out
+
+    def feed(self, text: str) -> List[str]:
+        """New complete sections in `text` (the whole output so far)."""
+        sections = []
+        for match in self.pattern.finditer(text, self.offset):
+            end = match.start()
+            if end - self.offset >= self.min_chars:
+                sections.append(text[self.offset:end])
+                self.offset = end
+        return [s for s in sections if s.strip()]
+
+    def finish(self, text: str) -> List[str]:
+        """Remaining sections once `text` is final."""
+        sections = self.feed(text)
+        rest = text[self.offset:]
+        self.offset = len(text)
+        if rest.strip():
+            sections.append(rest)
+        return sections
+
+
+class StreamingSequentialAgent(SequentialAgent):
+    """SequentialAgent whose section stage starts on the producer's partial output."""
+
+    section_stage: Optional[str] = None
+    """Name of the sub-agent run once per section; defaults to the last sub-agent."""
+    section_pattern: str = DEFAULT_SECTION_PATTERN
+    min_section_chars: int = 200
+    section_separator: str = "\n\n"
+
+    def _stage_index(self) -> Optional[int]:
+        names = [agent.name for agent in self.sub_agents]
+        index = names.index(self.section_stage) if self.section_stage in names else len(names) - 1
+        if index < 1:
+            return None
+        producer, consumer = self.sub_agents[index - 1], self.sub_agents[index]
+        if not getattr(producer, "output_key", None) or not getattr(consumer, "output_key", None):
+            return None
+        return index
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        index = self._stage_index()
+        if index is None or ctx.is_resumable:
+            # Nothing to pipeline (or resumption state to honour): behave like SequentialAgent.
+            async for event in super()._run_async_impl(ctx):
+                yield event
+            return
+        for stage in self.sub_agents[:index - 1]:
+            async for event in stage.run_async(ctx):
+                yield event
+        async for event in self._run_pipelined(self.sub_agents[index - 1], self.sub_agents[index], ctx):
+            yield event
+        for stage in self.sub_agents[index + 1:]:
+            async for event in stage.run_async(ctx):
+                yield event
+
+    def _section_ctx(self, consumer: BaseAgent, ctx: InvocationContext, input_key: str, index: int, text: str):
+        session = ctx.session.model_copy(
+            update={"events": list(ctx.session.events), "state": {**ctx.session.state, input_key: text}}
+        )
+        suffix = f"{self.name}.{consumer.name}.section{index}"
+        branch = f"{ctx.branch}.{suffix}" if ctx.branch else suffix
+        return ctx.model_copy(update={"session": session, "branch": branch})
+
+    async def _run_pipelined(
+        self, producer: BaseAgent, consumer: BaseAgent, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        caller_streams = bool(ctx.run_config) and ctx.run_config.streaming_mode == StreamingMode.SSE
+        run_config = (ctx.run_config or RunConfig()).model_copy(update={"streaming_mode": StreamingMode.SSE})
+        stream_ctx = ctx.model_copy(update={"run_config": run_config})
+        splitter = SectionSplitter(self.section_pattern, self.min_section_chars)
+        queue: asyncio.Queue = asyncio.Queue()
+        section_tasks: List[asyncio.Task] = []
+
+        async def run_section(i: int, text: str):
+            try:
+                final = ""
+                async for event in consumer.run_async(self._section_ctx(consumer, stream_ctx, producer.output_key, i, text)):
+                    if event.partial:
+                        await queue.put(("partial", i, event))
+                    elif event_text(event):
+                        final = event_text(event)
+                await queue.put(("section", i, final))
+            except Exception as e:
+                await queue.put(("error", i, e))
+
+        def start_sections(sections: List[str]):
+            for text in sections:
+                section_tasks.append(asyncio.create_task(run_section(len(section_tasks), text)))
+
+        async def produce():
+            try:
+                streamed, final = "", None
+                async for event in producer.run_async(stream_ctx):
+                    if event.partial:
+                        streamed += event_text(event)
+                        start_sections(splitter.feed(streamed))
+                    else:
+                        final = event_text(event) or final
+                        await queue.put(("event", None, event))
+                start_sections(splitter.finish(final if final and final.startswith(streamed[:splitter.offset]) else streamed))
+                await queue.put(("produced", None, None))
+            except Exception as e:
+                await queue.put(("error", None, e))
+
+        producer_task = asyncio.create_task(produce())
+        buffered: Dict[int, List[Event]] = {}
+        finished: Dict[int, str] = {}
+        forwarded = set()  # sections with at least one partial sent to the caller
+        next_section, produced = 0, False
+
+        def forward(i: int, event: Event) -> Event:
+            # The first chunk of every section after the first carries the separator.
+            if i > 0 and i not in forwarded:
+                event = Event(invocation_id=ctx.invocation_id, author=consumer.name, branch=ctx.branch, partial=True,
+                              content=types.Content(role="model", parts=[
+                                  types.Part(text=self.section_separator + event_text(event))]))
+            forwarded.add(i)
+            return event
+
+        try:
+            while not (produced and next_section == len(section_tasks)):
+                kind, i, payload = await queue.get()
+                if kind == "error":
+                    raise payload
+                if kind == "event":
+                    yield payload
+                elif kind == "produced":
+                    produced = True
+                elif kind == "partial":
+                    if i == next_section and caller_streams:
+                        yield forward(i, payload)
+                    else:
+                        buffered.setdefault(i, []).append(payload)
+                elif kind == "section":
+                    finished[i] = payload
+                # Release sections in document order.
+                while next_section in finished:
+                    if caller_streams and next_section not in forwarded and finished[next_section]:
+                        yield forward(next_section, Event(
+                            invocation_id=ctx.invocation_id, author=consumer.name, branch=ctx.branch, partial=True,
+                            content=types.Content(role="model", parts=[types.Part(text=finished[next_section])]),
+                        ))
+                    next_section += 1
+                    if caller_streams:
+                        for event in buffered.pop(next_section, []):
+                            yield forward(next_section, event)
+            await producer_task
+        finally:
+            for task in [producer_task, *section_tasks]:
+                task.cancel()
+
+        joined = self.section_separator.join(finished[i].strip() for i in range(len(section_tasks)) if finished[i].strip())
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=consumer.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=joined)]),
+            actions=EventActions(state_delta={consumer.output_key: joined}),
+        )
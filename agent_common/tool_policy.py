@@ -0,0 +1,191 @@
+"""Declarative tool-argument policy usable as a `before_tool_callback`.
+
+Rules are (tool, argument, values/patterns) entries loaded from JSON and
+indexed as {tool: {argument: rules}}, so evaluating a call is a dict lookup
+per argument plus a small pattern set. Recent verdicts are kept in an LRU.
+A blocked call returns the same error dict the tools themselves use:
+``{"status": "error", "error_message": ...}``.
+
+Policy file format::
+
+    {
+      "rules": [
+        {"tool": "get_weather_real", "arg": "city", "deny": ["paris"],
+         "message": "Policy restriction: ... '{value}' ...",
+         "state_key": "guardrail_tool_block_triggered"},
+        {"tool": "*", "arg": "query", "deny_patterns": ["\\\\bpassword\\\\b"]},
+        {"tool": "get_weather_real", "arg": "units", "allow": ["metric", "imperial"], "allow_only": true}
+      ]
+    }
+
+Values are compared after stripping and case-folding; patterns use
+`re.search` with re.IGNORECASE. An allowed value (exact or pattern) is never
+denied, not even by a tool "*" rule when the allow is tool-specific; with
+"allow_only" every value that is not allowed is denied. Tool "*" applies to
+every tool. List-valued arguments are checked element by element.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from agent_common.cache import TTLCache
+
+DEFAULT_MESSAGE = "Policy restriction: '{value}' is not allowed for '{arg}' in tool '{tool}'."
+DEFAULT_STATE_KEY = "guardrail_tool_block_triggered"
+ANY_TOOL = "*"
+
+
+@dataclass(frozen=True)
+class PolicyViolation:
+    tool: str
+    arg: str
+    value: str
+    message: str
+    state_key: Optional[str] = DEFAULT_STATE_KEY
+
+    def as_error(self) -> Dict[str, str]:
+        return {"status": "error", "error_message": self.message}
+
+
+@dataclass
+class _ArgRules:
+    """All rules for one (tool, argument) pair."""
+    deny: Dict[str, Tuple[str, Optional[str]]] = field(default_factory=dict)  # value -> (message, state_key)
+    deny_patterns: List[Tuple[Pattern[str], str, Optional[str]]] = field(default_factory=list)
+    allow: set = field(default_factory=set)
+    allow_patterns: List[Pattern[str]] = field(default_factory=list)
+    allow_only: Optional[Tuple[str, Optional[str]]] = None  # (message, state_key) when allow-listed
+
+    def allows(self, value: str) -> bool:
+        """True if `value` (already normalized) is explicitly allowed."""
+        return value in self.allow or any(p.search(value) for p in self.allow_patterns)
+
+    def evaluate(self, value: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Returns (message template, state_key) if `value` (already normalized) is denied."""
+        if self.allows(value):
+            return None
+        if self.allow_only is not None:
+            return self.allow_only
+        denied = self.deny.get(value)
+        if denied is not None:
+            return denied
+        for pattern, message, state_key in self.deny_patterns:
+            if pattern.search(value):
+                return message, state_key
+        return None
+
+
+def _normalize(value: Any) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+class ToolPolicy:
+    """Indexed allow/deny table for tool arguments."""
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, cache_size: int = 4096):
+        self._index: Dict[str, Dict[str, _ArgRules]] = {}
+        self._verdicts = TTLCache(maxsize=cache_size, ttl=float("inf"))
+        self._governed: Dict[str, Tuple[str, ...]] = {}  # tool -> argument names with rules
+        self.rule_count = 0
+        for rule in rules or []:
+            self.add_rule(**rule)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ToolPolicy":
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get("rules", []), **kwargs)
+
+    def add_rule(
+        self,
+        tool: str,
+        arg: str,
+        deny: Optional[List[str]] = None,
+        deny_patterns: Optional[List[str]] = None,
+        allow: Optional[List[str]] = None,
+        allow_patterns: Optional[List[str]] = None,
+        allow_only: bool = False,
+        message: str = DEFAULT_MESSAGE,
+        state_key: Optional[str] = DEFAULT_STATE_KEY,
+    ) -> None:
+        entry = self._index.setdefault(tool, {}).setdefault(arg, _ArgRules())
+        for value in deny or []:
+            entry.deny[_normalize(value)] = (message, state_key)
+        for pattern in deny_patterns or []:
+            entry.deny_patterns.append((re.compile(pattern, re.IGNORECASE), message, state_key))
+        entry.allow.update(_normalize(value) for value in allow or [])
+        entry.allow_patterns.extend(re.compile(p, re.IGNORECASE) for p in allow_patterns or [])
+        if allow_only:
+            entry.allow_only = (message, state_key)
+        self.rule_count += 1
+        self._verdicts.clear()
+        self._governed.clear()
+
+    def _rules_for(self, tool_name: str, arg: str) -> List[_ArgRules]:
+        found = []
+        for key in (tool_name, ANY_TOOL):
+            entry = self._index.get(key, {}).get(arg)
+            if entry is not None:
+                found.append(entry)
+        return found
+
+    def check_value(self, tool_name: str, arg: str, value: Any) -> Optional[PolicyViolation]:
+        """Checks one argument value; returns the violation or None if allowed."""
+        if value is None or value == "":
+            return None
+        normalized = _normalize(value)
+        key = (tool_name, arg, normalized)
+        cached = self._verdicts.get(key, _UNSEEN)
+        if cached is _UNSEEN:
+            cached = None
+            for entry in self._rules_for(tool_name, arg):  # tool-specific rules first
+                if entry.allows(normalized):
+                    break
+                cached = entry.evaluate(normalized)
+                if cached is not None:
+                    break
+            self._verdicts.set(key, cached)
+        if cached is None:
+            return None
+        message, state_key = cached
+        display = str(value).strip()
+        return PolicyViolation(
+            tool=tool_name,
+            arg=arg,
+            value=display,
+            message=message.format(value=display.capitalize(), arg=arg, tool=tool_name),
+            state_key=state_key,
+        )
+
+    def check(self, tool_name: str, args: Dict[str, Any]) -> Optional[PolicyViolation]:
+        """Checks every governed argument of a tool call."""
+        governed = self._governed.get(tool_name)
+        if governed is None:
+            governed = tuple(self._index.get(tool_name, {}).keys() | self._index.get(ANY_TOOL, {}).keys())
+            self._governed[tool_name] = governed
+        for arg in governed:
+            value = args.get(arg)
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                violation = self.check_value(tool_name, arg, item)
+                if violation is not None:
+                    return violation
+        return None
+
+    def before_tool_callback(self, tool, args: Dict[str, Any], tool_context) -> Optional[Dict]:
+        """`before_tool_callback` entry point: returns the error dict for a denied call, else None."""
+        violation = self.check(tool.name, args)
+        if violation is None:
+            return None
+        if violation.state_key:
+            tool_context.state[violation.state_key] = True
+        return violation.as_error()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._verdicts.stats.as_dict()
+        stats["rules"] = self.rule_count
+        return stats
+
+
+_UNSEEN = object()
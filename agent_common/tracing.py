@@ -0,0 +1,413 @@
+"""Low-overhead structured tracing for any runner/App.
+
+`TracingPlugin` records a span for every run, agent, model call and tool call
+(and `traced_callback` does the same for agent callbacks such as guardrails).
+The hot path does no I/O and takes no locks:
+
+* each finished span updates a per-(kind, name) latency histogram (log-linear
+  buckets, within 25%) and, for model calls, per-agent token counters;
+* sampled spans are written to a fixed-size ring buffer (`SpanRing`): a
+  sequence number from `itertools.count` picks the slot, so concurrent writers
+  never wait; when the exporter falls behind, the oldest spans are overwritten
+  and counted as dropped;
+* a daemon thread drains the ring every `flush_interval` seconds and appends
+  the spans to a JSONL file.
+
+Sampling is decided once per invocation, so a sampled trace is complete.
+Histograms and token counters always cover every span, sampled or not.
+
+    plugin = TracingPlugin.from_env()        # TRACE_FILE, TRACE_SAMPLE, ...
+    app = App(name="my_app", root_agent=root_agent, plugins=[plugin])
+    ...
+    print(plugin.tracer.stats())             # p50/p90/p99 per agent/model/tool
+"""
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+logger = logging.getLogger(__name__)
+
+# (seq, kind, name, agent, invocation_id, start unix ns, duration ns, error, attrs)
+Span = Tuple[int, str, str, str, str, int, int, Optional[str], Optional[Dict[str, Any]]]
+
+
+# --- Latency histograms ---
+class LatencyHistogram:
+    """Log-linear histogram of durations: 4 buckets per power of two of nanoseconds.
+
+    The bucket comes from the integer's bit length and its next two bits, so
+    recording costs no floating point math.
+    """
+
+    __slots__ = ("counts", "count", "errors", "total_ns", "max_ns")
+
+    BUCKETS = 48 * 4  # up to 2**48 ns (~3 days)
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns: int, error: bool = False) -> None:
+        exp = duration_ns.bit_length() - 1
+        index = (exp << 2) | ((duration_ns >> (exp - 2)) & 3) if exp >= 2 else 0
+        self.counts[index if index < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        if error:
+            self.errors += 1
+
+    @staticmethod
+    def _upper_ns(index: int) -> int:
+        exp, sub = index >> 2, index & 3
+        return (5 + sub) << (exp - 2) if exp >= 2 else 4
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile, in milliseconds."""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self._upper_ns(index), self.max_ns) / 1e6
+        return self.max_ns / 1e6
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+# --- Ring buffer ---
+class SpanRing:
+    """Bounded multi-writer, single-reader span buffer without locks.
+
+    `put` claims a sequence number with `next()` on an `itertools.count`
+    (atomic under the GIL) and stores the span in slot `seq % capacity`.
+    `drain` walks forward from the last sequence it read: a slot holding a
+    newer sequence was overwritten (dropped), one holding an older sequence
+    has not been written yet, so draining stops there until the next call.
+    """
+
+    def __init__(self, capacity: int = 8192):
+        self.capacity = capacity
+        self._slots: List[Optional[Span]] = [None] * capacity
+        self._seq = itertools.count()
+        self._read = 0
+        self.dropped = 0
+
+    def put(self, kind: str, name: str, agent: str, invocation_id: str, start_ns: int, duration_ns: int,
+            error: Optional[str] = None, attrs: Optional[Dict[str, Any]] = None) -> None:
+        seq = next(self._seq)
+        self._slots[seq % self.capacity] = (seq, kind, name, agent, invocation_id, start_ns, duration_ns, error, attrs)
+
+    def drain(self) -> List[Span]:
+        out = []
+        while True:
+            span = self._slots[self._read % self.capacity]
+            if span is None or span[0] < self._read:
+                return out
+            if span[0] > self._read:
+                self.dropped += 1
+            else:
+                out.append(span)
+            self._read += 1
+
+
+# --- Tracer ---
+class Tracer:
+    """Histograms, token counters and the sampled span export shared by plugins and callbacks."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        sample_rate: float = 1.0,
+        buffer_size: int = 8192,
+        flush_interval: float = 0.5,
+    ):
+        self.path = path
+        # Without an export file nothing is buffered; histograms are still kept.
+        self.sample_rate = sample_rate if path else 0.0
+        self.flush_interval = flush_interval
+        self.ring = SpanRing(buffer_size)
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.exported = 0
+        self._sampled: Dict[str, bool] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "Tracer":
+        """Reads TRACE_FILE (JSONL export; unset = histograms only), TRACE_SAMPLE, TRACE_BUFFER and TRACE_FLUSH_INTERVAL."""
+        kwargs.setdefault("path", os.environ.get("TRACE_FILE") or None)
+        kwargs.setdefault("sample_rate", float(os.environ.get("TRACE_SAMPLE", "1.0")))
+        kwargs.setdefault("buffer_size", int(os.environ.get("TRACE_BUFFER", "8192")))
+        kwargs.setdefault("flush_interval", float(os.environ.get("TRACE_FLUSH_INTERVAL", "0.5")))
+        return cls(**kwargs)
+
+    # --- Hot path ---
+    def start_invocation(self, invocation_id: str) -> None:
+        if len(self._sampled) > 4096:  # invocations that raised never reach end_invocation
+            self._sampled.clear()
+        self._sampled[invocation_id] = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def end_invocation(self, invocation_id: str) -> None:
+        self._sampled.pop(invocation_id, None)
+
+    def record(self, kind: str, name: str, agent: str, invocation_id: str, start_ns: int, duration_ns: int,
+               error: Optional[str] = None, attrs: Optional[Dict[str, Any]] = None) -> None:
+        """Adds a finished span to its histogram and, if its invocation is sampled, to the ring."""
+        key = (kind, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(duration_ns, error is not None)
+        if self.sample_rate <= 0.0:
+            return
+        sampled = self._sampled.get(invocation_id)
+        if sampled is None:
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if sampled:
+            if self._flusher is None:
+                self._start_flusher()
+            self.ring.put(kind, name, agent, invocation_id, start_ns, duration_ns, error, attrs)
+
+    def add_tokens(self, agent: str, prompt: int, output: int, cached: int = 0) -> None:
+        counters = self.tokens.get(agent)
+        if counters is None:
+            counters = self.tokens[agent] = {"calls": 0, "prompt": 0, "output": 0, "cached": 0}
+        counters["calls"] += 1
+        counters["prompt"] += prompt
+        counters["output"] += output
+        counters["cached"] += cached
+
+    # --- Export (background thread) ---
+    def _start_flusher(self) -> None:
+        with self._start_lock:  # once per tracer, not per span
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="trace-flusher", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the buffered spans to the export file; returns how many were written."""
+        spans = self.ring.drain()
+        if not spans or not self.path:
+            return 0
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        lines = []
+        for seq, kind, name, agent, invocation_id, start_ns, duration_ns, error, attrs in spans:
+            record = {"kind": kind, "name": name, "agent": agent, "invocation_id": invocation_id,
+                      "start_ns": start_ns, "duration_ms": duration_ns / 1e6}
+            if error is not None:
+                record["error"] = error
+            if attrs:
+                record["attrs"] = attrs
+            lines.append(json.dumps(record, default=str))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        self.exported += len(spans)
+        return len(spans)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        spans: Dict[str, Dict[str, Any]] = {}
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            spans.setdefault(kind, {})[name] = histogram.as_dict()
+        return {
+            "spans": spans,
+            "tokens": {agent: dict(counters) for agent, counters in sorted(self.tokens.items())},
+            "export": {"path": self.path, "sample_rate": self.sample_rate, "exported": self.exported,
+                       "dropped": self.ring.dropped},
+        }
+
+
+_default_tracer: Optional[Tracer] = None
+_default_lock = threading.Lock()
+
+
+def default_tracer() -> Tracer:
+    """The process-wide tracer (configured from the environment on first use)."""
+    global _default_tracer
+    if _default_tracer is None:
+        with _default_lock:
+            if _default_tracer is None:
+                _default_tracer = Tracer.from_env()
+    return _default_tracer
+
+
+# --- Agent callbacks ---
+def _callback_scope(kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    context = kwargs.get("callback_context") or kwargs.get("tool_context")
+    if context is None:
+        return "", ""
+    return context.agent_name, context.invocation_id
+
+
+def traced_callback(func: Callable) -> Callable:
+    """Records a "callback" span (named after the function) each time an agent callback runs.
+
+    ADK passes callbacks their arguments by keyword, which is where the agent
+    name and invocation id are taken from. Works for sync and async callbacks.
+    """
+    name = func.__name__
+
+    def finish(tracer: Tracer, kwargs, start_ns: int, started: int, result: Any, error: Optional[str]) -> None:
+        agent, invocation_id = _callback_scope(kwargs)
+        attrs = {"short_circuit": True} if result is not None else None
+        tracer.record("callback", name, agent, invocation_id, start_ns, time.perf_counter_ns() - started, error, attrs)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            tracer, start_ns, started = default_tracer(), time.time_ns(), time.perf_counter_ns()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                finish(tracer, kwargs, start_ns, started, None, type(e).__name__)
+                raise
+            finish(tracer, kwargs, start_ns, started, result, None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracer, start_ns, started = default_tracer(), time.time_ns(), time.perf_counter_ns()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            finish(tracer, kwargs, start_ns, started, None, type(e).__name__)
+            raise
+        finish(tracer, kwargs, start_ns, started, result, None)
+        return result
+    return wrapper
+
+
+# --- Plugin ---
+class TracingPlugin(BasePlugin):
+    """Spans for runs, agents, model calls and tool calls; a quiet replacement for LoggingPlugin.
+
+    AgentTool passes the parent's plugins to its nested runner, so agents
+    called as tools are traced too (as their own invocations).
+    """
+
+    def __init__(self, name: str = "tracing", tracer: Optional[Tracer] = None):
+        super().__init__(name=name)
+        self.tracer = tracer or default_tracer()
+        # span key -> (unix ns, perf_counter ns) for spans that are still open
+        self._open: Dict[Tuple, Tuple[int, int]] = {}
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "TracingPlugin":
+        """Uses the process-wide tracer, configured from TRACE_* (see `Tracer.from_env`)."""
+        return cls(**kwargs)
+
+    def _start(self, key: Tuple) -> None:
+        self._open[key] = (time.time_ns(), time.perf_counter_ns())
+
+    def _end(self, key: Tuple, kind: str, name: str, agent: str, invocation_id: str,
+             error: Optional[str] = None, attrs: Optional[Dict[str, Any]] = None) -> None:
+        opened = self._open.pop(key, None)
+        if opened is not None:
+            start_ns, started = opened
+            self.tracer.record(kind, name, agent, invocation_id, start_ns, time.perf_counter_ns() - started,
+                               error, attrs)
+
+    @staticmethod
+    def _model_key(callback_context) -> Tuple:
+        ctx = callback_context._invocation_context
+        return ("model", ctx.invocation_id, ctx.branch, callback_context.agent_name)
+
+    async def before_run_callback(self, *, invocation_context) -> None:
+        self.tracer.start_invocation(invocation_context.invocation_id)
+        self._start(("run", invocation_context.invocation_id))
+
+    async def after_run_callback(self, *, invocation_context) -> None:
+        invocation_id = invocation_context.invocation_id
+        self._end(("run", invocation_id), "run", invocation_context.app_name, invocation_context.agent.name,
+                  invocation_id)
+        self.tracer.end_invocation(invocation_id)
+        # Model calls answered by an agent callback (e.g. a guardrail) never reach after_model_callback
+        for key in [k for k in self._open if k[1] == invocation_id]:
+            del self._open[key]
+
+    async def before_agent_callback(self, *, agent, callback_context) -> None:
+        ctx = callback_context._invocation_context
+        self._start(("agent", ctx.invocation_id, ctx.branch, agent.name))
+
+    async def after_agent_callback(self, *, agent, callback_context) -> None:
+        ctx = callback_context._invocation_context
+        self._end(("agent", ctx.invocation_id, ctx.branch, agent.name), "agent", agent.name, agent.name,
+                  ctx.invocation_id)
+
+    async def before_model_callback(self, *, callback_context, llm_request) -> None:
+        self._start(self._model_key(callback_context))
+
+    async def after_model_callback(self, *, callback_context, llm_response) -> None:
+        if llm_response.partial:
+            return None
+        agent = callback_context.agent_name
+        usage = llm_response.usage_metadata
+        attrs = None
+        if usage is not None:
+            prompt, output = usage.prompt_token_count or 0, usage.candidates_token_count or 0
+            cached = usage.cached_content_token_count or 0
+            self.tracer.add_tokens(agent, prompt, output, cached)
+            attrs = {"prompt_tokens": prompt, "output_tokens": output}
+        self._end(self._model_key(callback_context), "model", agent, agent, callback_context.invocation_id,
+                  attrs=attrs)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error) -> None:
+        agent = callback_context.agent_name
+        self._end(self._model_key(callback_context), "model", agent, agent, callback_context.invocation_id,
+                  error=type(error).__name__)
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> None:
+        self._start(("tool", tool_context.function_call_id))
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> None:
+        error = "error_result" if isinstance(result, dict) and result.get("status") == "error" else None
+        self._end(("tool", tool_context.function_call_id), "tool", tool.name, tool_context.agent_name,
+                  tool_context.invocation_id, error=error)
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error) -> None:
+        self._end(("tool", tool_context.function_call_id), "tool", tool.name, tool_context.agent_name,
+                  tool_context.invocation_id, error=type(error).__name__)
@@ -1,84 +1,153 @@
-import requests
+import asyncio
+import logging
 import os
+import re
+import requests
 from google.adk.agents import Agent
+from google.adk.apps import App
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
 from google.genai import types # For creating response content
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.tool_context import ToolContext
-from typing import Optional, Dict, Any # For type hints
+from typing import Optional, Dict, Any, List # For type hints
+
+from agent_common.guardrails import GuardrailEngine
+from agent_common.model_pool import PooledGemini
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
+from agent_common.tool_policy import ToolPolicy
+from agent_common.tracing import TracingPlugin, traced_callback
+from agent_team.intent import FAREWELL, GREETING, IntentClassifier
+from agent_team.weather_service import KNOWN_CITY_IDS, weather_service
+
+# Tool/callback progress goes to this logger (DEBUG), not stdout: it runs on every call.
+# Per-tool and per-callback latencies come from the TracingPlugin on `app`.
+logger = logging.getLogger(__name__)
 
 # Use one of the model constants defined earlier
 MODEL_GEMINI_2_0_FLASH = "gemini-2.0-flash"
 
 # @title Define the get_weather Tool
-API_KEY = os.environ.get("OPENWEATHERMAP_API_KEY", "OPENWEATHERMAP_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+def _format_weather_report(city: str, data: dict, units_param: str) -> str:
+    """Builds the one-line report for an OpenWeatherMap payload (raises KeyError if malformed)."""
+    temp_value = data['main']['temp']
+    condition = data['weather'][0]['description']
+
+    # Determine the display unit symbol
+    temp_unit = "°F" if units_param == "imperial" else "°C"
 
-def get_weather_real(city: str, tool_context: ToolContext) -> dict:
+    return (
+        f"The weather in {city.capitalize()} is **{condition.capitalize()}** "
+        f"with a temperature of **{temp_value:.1f}{temp_unit}**."
+    )
+
+async def get_weather_real(city: str, tool_context: ToolContext) -> dict:
     """Retrieves live weather, converts temp unit based on session state."""
-    print(f"--- Tool: get_weather_real called for {city} ---")
+    logger.debug("Tool: get_weather_real called for %s", city)
 
     # --- Read preference from state ---
     # Default to Fahrenheit if not set
     preferred_unit = tool_context.state.get("user_preference_temperature_unit", "Fahrenheit")
-    print(f"--- Tool: Reading state 'user_preference_temperature_unit': {preferred_unit} ---")
+    logger.debug("Tool: Reading state 'user_preference_temperature_unit': %s", preferred_unit)
 
     # OpenWeatherMap uses 'metric' (Celsius) or 'imperial' (Fahrenheit)
     units_param = "imperial" if preferred_unit == "Fahrenheit" else "metric"
 
-    params = {
-        'q': city,
-        'limit': 1,
-        'appid': API_KEY,
-        'units': units_param
-    }
-
     try:
-        # --- 1. Make the API Request ---
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-        data = response.json()
-        print(f"{data}")
-
-        # --- 2. Parse the Live Data ---
-        temp_value = data['main']['temp']
-        condition = data['weather'][0]['description']
-
-        # Determine the display unit symbol
-        temp_unit = "°F" if units_param == "imperial" else "°C"
-
-        # --- 3. Format Report and Update State ---
-        report = (
-            f"The weather in {city.capitalize()} is **{condition.capitalize()}** "
-            f"with a temperature of **{temp_value:.1f}{temp_unit}**."
-        )
-        result = {"status": "success", "report": report}
-        print(f"--- Tool: Generated report in {preferred_unit}. Result: {result} ---")
+        # --- 1. Get the data (cached, pooled connection) ---
+        # Runs off the event loop, so other sessions (and parallel calls for
+        # other cities in the same turn) keep making progress meanwhile.
+        data, cache_outcome = await weather_service.get_current_async(city, units_param)
+        logger.debug("Tool: Weather cache %s for %s", cache_outcome, city)
+        tool_context.state["weather_cache_stats"] = weather_service.stats()
+
+        # --- 2. Parse the Live Data and Format Report ---
+        result = {"status": "success", "report": _format_weather_report(city, data, units_param)}
+        logger.debug("Tool: Generated report in %s. Result: %s", preferred_unit, result)
 
         # Update state with the city that was successfully checked
         tool_context.state["last_city_checked_stateful"] = city
         return result
 
+    except asyncio.TimeoutError:
+        # The lookup took longer than WEATHER_TOOL_TIMEOUT
+        error_msg = f"Timed out while fetching weather for '{city}'. Please try again."
+        logger.warning("Tool Error: Timeout - %s", error_msg)
+        return {"status": "error", "error_message": error_msg}
+
     except requests.exceptions.HTTPError as e:
         # Handle specific API errors (e.g., 404 for city not found)
         error_msg = f"Weather API error for '{city}': {e}. Check the city name."
-        print(f"--- Tool Error: HTTP Error - {error_msg} ---")
+        logger.warning("Tool Error: HTTP Error - %s", error_msg)
         return {"status": "error", "error_message": error_msg}
 
     except requests.exceptions.RequestException as e:
         # Handle connection errors (network down, DNS failure, etc.)
         error_msg = f"A network error occurred while fetching weather: {e}"
-        print(f"--- Tool Error: Network Error - {error_msg} ---")
+        logger.warning("Tool Error: Network Error - %s", error_msg)
         return {"status": "error", "error_message": error_msg}
 
     except KeyError:
         # Handle unexpected JSON structure if the API response changes
         error_msg = f"Could not parse weather data for {city}. Response structure was unexpected."
-        print(f"--- Tool Error: Parsing Error - {error_msg} ---")
+        logger.warning("Tool Error: Parsing Error - %s", error_msg)
         return {"status": "error", "error_message": error_msg}
 
+async def get_weather_batch(cities: List[str], tool_context: ToolContext) -> dict:
+    """Retrieves live weather for several cities at once and returns one combined report.
+
+    Use this instead of calling 'get_weather_real' repeatedly when the user asks
+    about more than one city.
+
+    Args:
+        cities (list[str]): The city names to look up.
+
+    Returns:
+        dict: status, a combined 'report' and per-city 'results'.
+    """
+    logger.debug("Tool: get_weather_batch called for %s", cities)
+    preferred_unit = tool_context.state.get("user_preference_temperature_unit", "Fahrenheit")
+    units_param = "imperial" if preferred_unit == "Fahrenheit" else "metric"
+
+    # --- Policy check per city (same 'get_weather_real' city rules as block_paris_tool_guardrail) ---
+    allowed, results = [], {}
+    for city in cities:
+        violation = tool_policy.check_value("get_weather_real", "city", city)
+        if violation:
+            if violation.state_key:
+                tool_context.state[violation.state_key] = True
+            results[city] = violation.as_error()
+        else:
+            allowed.append(city)
+
+    # --- One bulk lookup for every allowed city ---
+    lookups = await weather_service.get_many_async(allowed, units_param)
+    for city in allowed:
+        data, outcome = lookups[city]
+        try:
+            if outcome == "error":
+                raise data
+            results[city] = {"status": "success", "report": _format_weather_report(city, data, units_param)}
+            tool_context.state["last_city_checked_stateful"] = city
+        except requests.exceptions.HTTPError as e:
+            results[city] = {"status": "error", "error_message": f"Weather API error for '{city}': {e}. Check the city name."}
+        except (requests.exceptions.RequestException, asyncio.TimeoutError) as e:
+            results[city] = {"status": "error", "error_message": f"A network error occurred while fetching weather for '{city}': {e}"}
+        except KeyError:
+            results[city] = {"status": "error", "error_message": f"Could not parse weather data for {city}. Response structure was unexpected."}
+        except Exception as e:
+            # Anything else (e.g. a malformed group response) fails this city only, not the whole batch
+            logger.warning("Tool Error: get_weather_batch failed for %s: %r", city, e)
+            results[city] = {"status": "error", "error_message": f"Could not get weather for '{city}': {e}"}
+    tool_context.state["weather_cache_stats"] = weather_service.stats()
+
+    ordered = [dict(city=city, **results[city]) for city in dict.fromkeys(cities)]
+    report = "\n".join(r.get("report") or r["error_message"] for r in ordered)
+    status = "success" if any(r["status"] == "success" for r in ordered) else "error"
+    logger.debug("Tool: get_weather_batch generated %d reports", len(ordered))
+    return {"status": status, "report": report, "results": ordered}
+
 def say_hello(name: Optional[str] = None) -> str:
     """Provides a simple greeting. If a name is provided, it will be used.
 
@@ -90,27 +159,35 @@ def say_hello(name: Optional[str] = None) -> str:
     """
     if name:
         greeting = f"Hello, {name}!"
-        print(f"--- Tool: say_hello called with name: {name} ---")
+        logger.debug("Tool: say_hello called with name: %s", name)
     else:
         greeting = "Hello there!" # Default greeting if name is None or not explicitly passed
-        print(f"--- Tool: say_hello called without a specific name (name_arg_value: {name}) ---")
+        logger.debug("Tool: say_hello called without a specific name (name_arg_value: %s)", name)
     return greeting
 
 def say_goodbye() -> str:
     """Provides a simple farewell message to conclude the conversation."""
-    print(f"--- Tool: say_goodbye called ---")
+    logger.debug("Tool: say_goodbye called")
     return "Goodbye! Have a great day."
 
 
+# Deny list for block_keyword_guardrail, compiled once and hot-reloaded when the file changes
+GUARDRAIL_RULES_FILE = os.environ.get(
+    "GUARDRAIL_RULES_FILE", os.path.join(os.path.dirname(__file__), "guardrail_rules.json")
+)
+keyword_guardrail_engine = GuardrailEngine.from_file(GUARDRAIL_RULES_FILE)
+
+@traced_callback
 def block_keyword_guardrail(
     callback_context: CallbackContext, llm_request: LlmRequest
 ) -> Optional[LlmResponse]:
     """
-    Inspects the latest user message for 'BLOCK'. If found, blocks the LLM call
+    Inspects the latest user message against the deny list in GUARDRAIL_RULES_FILE
+    (by default the keyword 'BLOCK'). If a rule matches, blocks the LLM call
     and returns a predefined LlmResponse. Otherwise, returns None to proceed.
     """
     agent_name = callback_context.agent_name # Get the name of the agent whose model call is being intercepted
-    print(f"--- Callback: block_keyword_guardrail running for agent: {agent_name} ---")
+    logger.debug("Callback: block_keyword_guardrail running for agent: %s", agent_name)
 
     # Extract the text from the latest user message in the request history
     last_user_message_text = ""
@@ -123,113 +200,172 @@ def block_keyword_guardrail(
                     last_user_message_text = content.parts[0].text
                     break # Found the last user message text
 
-    print(f"--- Callback: Inspecting last user message: '{last_user_message_text[:100]}...' ---") # Log first 100 chars
+    logger.debug("Callback: Inspecting last user message: '%.100s...'", last_user_message_text) # Log first 100 chars
 
     # --- Guardrail Logic ---
-    keyword_to_block = "BLOCK"
-    if keyword_to_block in last_user_message_text.upper(): # Case-insensitive check
-        print(f"--- Callback: Found '{keyword_to_block}'. Blocking LLM call! ---")
+    match = keyword_guardrail_engine.check(last_user_message_text) # Single case-insensitive pass, cached
+    if match:
+        keyword_to_block = match.term
+        logger.info("Callback: Found '%s'. Blocking LLM call for %s!", keyword_to_block, agent_name)
         # Optionally, set a flag in state to record the block event
         callback_context.state["guardrail_block_keyword_triggered"] = True
-        print(f"--- Callback: Set state 'guardrail_block_keyword_triggered': True ---")
 
         # Construct and return an LlmResponse to stop the flow and send this back instead
         return LlmResponse(
             content=types.Content(
                 role="model", # Mimic a response from the agent's perspective
-                parts=[types.Part(text=f"I cannot process this request because it contains the blocked keyword '{keyword_to_block}'.")],
+                parts=[types.Part(text=keyword_guardrail_engine.message.format(term=keyword_to_block))],
             )
             # Note: You could also set an error_message field here if needed
         )
     else:
         # Keyword not found, allow the request to proceed to the LLM
-        print(f"--- Callback: Keyword not found. Allowing LLM call for {agent_name}. ---")
+        logger.debug("Callback: Keyword not found. Allowing LLM call for %s.", agent_name)
         return None # Returning None signals ADK to continue normally
 
+# Tool-argument allow/deny rules for block_paris_tool_guardrail (and get_weather_batch)
+TOOL_POLICY_FILE = os.environ.get(
+    "TOOL_POLICY_FILE", os.path.join(os.path.dirname(__file__), "tool_policy.json")
+)
+tool_policy = ToolPolicy.from_file(TOOL_POLICY_FILE)
+
+@traced_callback
 def block_paris_tool_guardrail(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
 ) -> Optional[Dict]:
     """
-    Checks if 'get_weather_real' is called for 'Paris'.
-    If so, blocks the tool execution and returns a specific error dictionary.
+    Checks the tool call against the rules in TOOL_POLICY_FILE (by default:
+    'get_weather_real' may not be called for 'Paris').
+    If a rule denies it, blocks the tool execution and returns a specific error dictionary.
     Otherwise, allows the tool call to proceed by returning None.
     """
-    tool_name = tool.name
-    agent_name = tool_context.agent_name # Agent attempting the tool call
-    print(f"--- Callback: block_paris_tool_guardrail running for tool '{tool_name}' in agent '{agent_name}' ---")
-    print(f"--- Callback: Inspecting args: {args} ---")
-
     # --- Guardrail Logic ---
-    target_tool_name = "get_weather_real" # Match the function name used by FunctionTool
-    blocked_city = "paris"
-
-    # Check if it's the correct tool and the city argument matches the blocked city
-    if tool_name == target_tool_name:
-        city_argument = args.get("city", "") # Safely get the 'city' argument
-        if city_argument and city_argument.lower() == blocked_city:
-            print(f"--- Callback: Detected blocked city '{city_argument}'. Blocking tool execution! ---")
-            # Optionally update state
-            tool_context.state["guardrail_tool_block_triggered"] = True
-            print(f"--- Callback: Set state 'guardrail_tool_block_triggered': True ---")
-
-            # Return a dictionary matching the tool's expected output format for errors
-            # This dictionary becomes the tool's result, skipping the actual tool run.
-            return {
-                "status": "error",
-                "error_message": f"Policy restriction: Weather checks for '{city_argument.capitalize()}' are currently disabled by a tool guardrail."
-            }
-        else:
-             print(f"--- Callback: City '{city_argument}' is allowed for tool '{tool_name}'. ---")
-    else:
-        print(f"--- Callback: Tool '{tool_name}' is not the target tool. Allowing. ---")
+    # Indexed lookup by tool name and argument; sets the rule's state flag
+    # (e.g. 'guardrail_tool_block_triggered') when it blocks.
+    # (get_weather_batch applies the city rule to each city itself)
+    error = tool_policy.before_tool_callback(tool, args, tool_context)
+    if error:
+        # Return a dictionary matching the tool's expected output format for errors
+        # This dictionary becomes the tool's result, skipping the actual tool run.
+        logger.info("Callback: Blocked tool '%s' in agent '%s': %s", tool.name, tool_context.agent_name, error['error_message'])
+        return error
 
-
-    # If the checks above didn't return a dictionary, allow the tool to execute
-    print(f"--- Callback: Allowing tool '{tool_name}' to proceed. ---")
     return None # Returning None allows the actual tool function to run
 
-# --- Redefine Sub-Agents (Ensures they exist in this context) ---
-greeting_agent = None
-try:
-    # Use a defined model constant
-    greeting_agent = Agent(
-        model=MODEL_GEMINI_2_0_FLASH,
-        name="greeting_agent", # Keep original name for consistency
-        instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly greeting using the 'say_hello' tool. Do nothing else.",
-        description="Handles simple greetings and hellos using the 'say_hello' tool.",
-        tools=[say_hello],
+# --- Zero-LLM fast path for greetings and farewells ---
+INTENT_FAST_PATH_ENABLED = os.environ.get("INTENT_FAST_PATH", "1") != "0"
+INTENT_FAST_PATH_THRESHOLD = float(os.environ.get("INTENT_FAST_PATH_THRESHOLD", "0.97"))
+# The model path only handles short messages; longer ones always go to the LLM
+INTENT_FAST_PATH_MAX_WORDS = int(os.environ.get("INTENT_FAST_PATH_MAX_WORDS", "6"))
+
+intent_classifier = IntentClassifier()
+# "Hello Paris", "Good night, London?": a question or a city means the user may want weather
+_WEATHER_HINT = re.compile(r"\?|\b(?:" + "|".join(re.escape(city) for city in KNOWN_CITY_IDS) + r")\b", re.IGNORECASE)
+# The fast-path reply is root's final text, which output_key would store as the weather report;
+# the report it replaced is kept here and put back after the turn (keep_weather_report).
+INTENT_KEPT_REPORT_KEY = "intent_fast_path_kept_report"
+# Process-wide counters: "checked", "greeting", "farewell", "fallthrough"
+intent_fast_path_stats: Dict[str, int] = {"checked": 0, "greeting": 0, "farewell": 0, "fallthrough": 0}
+
+@traced_callback
+def intent_fast_path(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """
+    Answers plain greetings and farewells locally instead of paying for a
+    delegation decision plus a sub-agent model call. Only fires on a fresh
+    user turn when the local classifier is confident; otherwise returns None
+    so the LLM handles the message as before.
+    """
+    if not INTENT_FAST_PATH_ENABLED or not llm_request.contents:
+        return None
+    latest = llm_request.contents[-1]
+    # Only a new user message, never a function response within the turn
+    if latest.role != 'user' or not latest.parts or not latest.parts[0].text:
+        return None
+    text = latest.parts[0].text
+
+    intent_fast_path_stats["checked"] += 1
+    if _WEATHER_HINT.search(text):
+        intent_fast_path_stats["fallthrough"] += 1
+        return None
+    prediction = intent_classifier.classify(text)
+    confident = prediction.confidence >= INTENT_FAST_PATH_THRESHOLD and (
+        prediction.source == "rule" or len(text.split()) <= INTENT_FAST_PATH_MAX_WORDS
     )
-    print(f"✅ Sub-Agent '{greeting_agent.name}' redefined.")
-except Exception as e:
-    print(f"❌ Could not redefine Greeting agent. Check Model/API Key ({greeting_agent.model}). Error: {e}")
-
-farewell_agent = None
-try:
-    # Use a defined model constant
-    farewell_agent = Agent(
-        model=MODEL_GEMINI_2_0_FLASH,
-        name="farewell_agent", # Keep original name
-        instruction="You are the Farewell Agent. Your ONLY task is to provide a polite goodbye message using the 'say_goodbye' tool. Do not perform any other actions.",
-        description="Handles simple farewells and goodbyes using the 'say_goodbye' tool.",
-        tools=[say_goodbye],
+    if not confident or prediction.label not in (GREETING, FAREWELL):
+        intent_fast_path_stats["fallthrough"] += 1
+        return None
+
+    reply = say_hello(prediction.name) if prediction.label == GREETING else say_goodbye()
+    intent_fast_path_stats[prediction.label] += 1
+    state = callback_context.state
+    state["intent_fast_path_hits"] = state.get("intent_fast_path_hits", 0) + 1
+    state[INTENT_KEPT_REPORT_KEY] = {"invocation_id": callback_context.invocation_id,
+                                     "report": state.get("last_weather_report")}
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=reply)])
     )
-    print(f"✅ Sub-Agent '{farewell_agent.name}' redefined.")
-except Exception as e:
-    print(f"❌ Could not redefine Farewell agent. Check Model/API Key ({farewell_agent.model}). Error: {e}")
+
+
+def keep_weather_report(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Restores last_weather_report after a turn answered by intent_fast_path (its reply is no report)."""
+    kept = callback_context.state.get(INTENT_KEPT_REPORT_KEY)
+    if kept and kept["invocation_id"] == callback_context.invocation_id:
+        callback_context.state["last_weather_report"] = kept["report"]
+    return None
+
+# --- Sub-Agents ---
+# Built on import of this module, without printing; a bad model name or
+# config raises here instead of leaving a None sub-agent behind.
+greeting_agent = Agent(
+    model=PooledGemini(model=MODEL_GEMINI_2_0_FLASH),
+    name="greeting_agent", # Keep original name for consistency
+    instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly greeting using the 'say_hello' tool. Do nothing else.",
+    description="Handles simple greetings and hellos using the 'say_hello' tool.",
+    tools=[say_hello],
+)
+
+farewell_agent = Agent(
+    model=PooledGemini(model=MODEL_GEMINI_2_0_FLASH),
+    name="farewell_agent", # Keep original name
+    instruction="You are the Farewell Agent. Your ONLY task is to provide a polite goodbye message using the 'say_goodbye' tool. Do not perform any other actions.",
+    description="Handles simple farewells and goodbyes using the 'say_goodbye' tool.",
+    tools=[say_goodbye],
+)
 
 
 root_agent = Agent(
         name="weather_agent_v6_tool_guardrail", # New version name
-        model=MODEL_GEMINI_2_0_FLASH,
+        model=PooledGemini(model=MODEL_GEMINI_2_0_FLASH),
         description="Main agent: Handles weather, delegates, includes input AND tool guardrails.",
         instruction="You are the main Weather Agent. Provide weather using 'get_weather_real'. "
+                    "When the user asks about more than one city, call 'get_weather_batch' once with all of them. "
                     "Delegate greetings to 'greeting_agent' and farewells to 'farewell_agent'. "
                     "Handle only weather, greetings, and farewells.",
-        tools=[get_weather_real],
+        tools=[get_weather_real, get_weather_batch],
         sub_agents=[greeting_agent, farewell_agent],
         output_key="last_weather_report",
-        before_model_callback=block_keyword_guardrail, # Keep model guardrail
-        before_tool_callback=block_paris_tool_guardrail # <<< Add tool guardrail
+        # Keep model guardrail first, then answer plain greetings/farewells without an LLM call
+        before_model_callback=[block_keyword_guardrail, intent_fast_path],
+        before_tool_callback=block_paris_tool_guardrail, # <<< Add tool guardrail
+        after_agent_callback=keep_weather_report,
+)
+
+# --- App Setup ---
+# Delegation, weather lookups and greetings are all short turns: cheap model, small answers.
+model_router = ModelRouterPlugin.from_env({
+    "weather_agent_v6_tool_guardrail": RoutePolicy("router", max_output_tokens=512),
+    "greeting_agent": RoutePolicy("router", max_output_tokens=128),
+    "farewell_agent": RoutePolicy("router", max_output_tokens=128),
+})
+
+# TracingPlugin records per-agent/model/tool latency histograms and token counts without
+# printing; set TRACE_FILE to also export sampled spans (TRACE_SAMPLE) as JSONL.
+app = App(
+    name="agent_team",
+    root_agent=root_agent,
+    plugins=[TracingPlugin.from_env(), model_router],
 )
 
 # Sample queries to test the agent:
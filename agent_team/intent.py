@@ -0,0 +1,127 @@
+"""Local greeting/farewell intent classifier for the zero-LLM fast path.
+
+Combines anchored rules (whole-message greetings and farewells) with a tiny
+multinomial naive Bayes model over word and character-trigram features,
+trained at import time on the examples below. Runs in microseconds on CPU.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+GREETING = "greeting"
+FAREWELL = "farewell"
+OTHER = "other"
+
+# Whole-message rules: the message is *only* a greeting / farewell (plus an optional name)
+_NAME = r"(?:\s*,?\s*(?:this is|i am|i'm|my name is)\s+[a-z][\w'-]*)?"
+GREETING_RULE = re.compile(
+    rf"^(?:hi|hello|hey|hiya|howdy|greetings|good (?:morning|afternoon|evening))(?: there)?{_NAME}\s*[!.]*$",
+    re.IGNORECASE,
+)
+FAREWELL_RULE = re.compile(
+    r"^(?:(?:ok(?:ay)?|thanks|thank you)\s*,?\s*)?"
+    r"(?:bye|goodbye|bye[- ]bye|bye for now|see you(?: later| soon)?|see ya|take care|farewell|good night|"
+    r"talk to you later|catch you later)\s*[!.]*$",
+    re.IGNORECASE,
+)
+NAME_PATTERN = re.compile(r"\b(?:this is|i am|i'm|my name is)\s+([a-z][\w'-]*)", re.IGNORECASE)
+# Words after "I'm" / "this is" that are not a name ("Hi, I'm in Tokyo", "Hello, I am cold")
+NOT_NAMES = frozenset(
+    "a an the in at on from here there back home out off not just so very still also new fine good great ok okay "
+    "cold hot warm freezing tired bored sick sorry glad happy curious wondering looking going trying leaving "
+    "visiting traveling travelling planning heading done".split()
+)
+
+TRAINING_EXAMPLES: Dict[str, List[str]] = {
+    GREETING: [
+        "hi", "hello", "hey", "hi there", "hello there", "hey there", "hiya", "howdy",
+        "good morning", "good afternoon", "good evening", "greetings",
+        "hello, this is alice", "hi, i'm bob", "hey, my name is carol", "hello again",
+    ],
+    FAREWELL: [
+        "bye", "goodbye", "bye bye", "see you later", "see you soon", "thanks, bye",
+        "bye for now", "take care", "good night", "farewell", "catch you later",
+        "talk to you later", "ok bye", "thank you, goodbye", "see ya",
+    ],
+    OTHER: [
+        "what's the weather in tokyo?", "what is the weather like in london?",
+        "tell me the weather in new york", "how about paris?", "is it raining in berlin",
+        "what's the temperature in sydney", "will it snow tomorrow", "how hot is it in mumbai",
+        "hi, what's the weather in tokyo?", "hello, how is the weather in london today?",
+        "thanks, and what about chicago?", "can you check the weather for me",
+        "what can you do", "weather in tokyo, london and new york?", "by the way, is it windy in chicago",
+        "i prefer celsius", "show me the forecast", "hey, is it sunny in los angeles?",
+        "thanks", "thank you", "great, thanks", "ok", "yes please",
+        "hello, it's cold today", "hi, i'm in tokyo", "hey, it's raining here", "hi, i'm looking for the forecast",
+    ],
+}
+
+
+@dataclass(frozen=True)
+class IntentPrediction:
+    label: str
+    confidence: float
+    source: str  # "rule" or "model"
+    name: Optional[str] = None
+
+
+def _features(text: str) -> List[str]:
+    words = re.findall(r"[a-z']+", text.lower())
+    feats = [f"w:{w}" for w in words]
+    for word in words:
+        padded = f"^{word}$"
+        feats.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    feats.append(f"len:{min(len(words), 6)}")
+    return feats
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes with Laplace smoothing."""
+
+    def __init__(self, examples: Dict[str, List[str]], alpha: float = 0.5):
+        self.alpha = alpha
+        self.labels = list(examples)
+        total = sum(len(texts) for texts in examples.values())
+        self._log_prior = {label: math.log(len(texts) / total) for label, texts in examples.items()}
+        self._counts = {label: Counter(f for text in texts for f in _features(text)) for label, texts in examples.items()}
+        self._totals = {label: sum(counts.values()) for label, counts in self._counts.items()}
+        self._vocab_size = len({f for counts in self._counts.values() for f in counts})
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        feats = _features(text)
+        scores = {}
+        for label in self.labels:
+            counts, denom = self._counts[label], self._totals[label] + self.alpha * self._vocab_size
+            scores[label] = self._log_prior[label] + sum(
+                math.log((counts.get(f, 0) + self.alpha) / denom) for f in feats
+            )
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        norm = sum(exp.values())
+        return {label: value / norm for label, value in exp.items()}
+
+
+class IntentClassifier:
+    """Rules first, naive Bayes second."""
+
+    def __init__(self, examples: Dict[str, List[str]] = TRAINING_EXAMPLES):
+        self.model = NaiveBayesIntentModel(examples)
+
+    def classify(self, text: str) -> IntentPrediction:
+        text = text.strip()
+        match = NAME_PATTERN.search(text)
+        name = match.group(1) if match else None
+        # A name is a capitalized word as typed ("Hi, I'm Bob"), not "Hi, I'm cold"
+        named = name is not None and name[0].isupper() and name.casefold() not in NOT_NAMES
+        if match and not named:
+            # "I'm <something>" says more than hello: leave it to the LLM
+            return IntentPrediction(OTHER, 1.0, "rule")
+        if GREETING_RULE.match(text):
+            return IntentPrediction(GREETING, 1.0, "rule", name)
+        if FAREWELL_RULE.match(text):
+            return IntentPrediction(FAREWELL, 1.0, "rule", name)
+        proba = self.model.predict_proba(text)
+        label = max(proba, key=proba.get)
+        return IntentPrediction(label, proba[label], "model", name)
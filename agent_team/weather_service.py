@@ -0,0 +1,301 @@
+"""Weather data layer used by the weather tools.
+
+Keeps a pooled keep-alive `requests.Session` for OpenWeatherMap and a bounded
+TTL cache keyed on (normalized city, units). Stale entries are served while a
+background refresh runs, and concurrent lookups for the same city share one
+upstream request.
+"""
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agent_common.cache import FRESH, STALE, SingleFlight, TTLCache
+
+API_KEY = os.environ.get("OPENWEATHERMAP_API_KEY", "OPENWEATHERMAP_API_KEY")
+BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+# Bulk endpoint: current weather for up to GROUP_LIMIT city IDs in one request
+GROUP_URL = "https://api.openweathermap.org/data/2.5/group"
+GROUP_LIMIT = 20
+
+# Tunables (seconds / counts), overridable from the environment
+CACHE_TTL = float(os.environ.get("WEATHER_CACHE_TTL", "600"))
+CACHE_STALE_TTL = float(os.environ.get("WEATHER_CACHE_STALE_TTL", "1800"))
+CACHE_MAXSIZE = int(os.environ.get("WEATHER_CACHE_MAXSIZE", "1024"))
+POOL_SIZE = int(os.environ.get("WEATHER_HTTP_POOL_SIZE", "10"))
+REQUEST_TIMEOUT = float(os.environ.get("WEATHER_HTTP_TIMEOUT", "10"))
+# Upper bound for one tool call, including time spent waiting for a worker thread
+TOOL_TIMEOUT = float(os.environ.get("WEATHER_TOOL_TIMEOUT", "15"))
+# Optional OpenWeatherMap city.list.json (or {"name": id} map) to extend the city index
+CITY_INDEX_FILE = os.environ.get("WEATHER_CITY_INDEX_FILE")
+
+# OpenWeatherMap city IDs for commonly asked cities; others are learned from responses
+KNOWN_CITY_IDS = {
+    "tokyo": 1850147,
+    "london": 2643743,
+    "new york": 5128581,
+    "paris": 2988507,
+    "berlin": 2950159,
+    "sydney": 2147714,
+    "mumbai": 1275339,
+    "san francisco": 5391959,
+    "los angeles": 5368361,
+    "chicago": 4887398,
+}
+
+
+def normalize_city(city: str) -> str:
+    """Canonical cache key form of a city name ("  New  York " -> "new york")."""
+    return " ".join(city.split()).casefold()
+
+
+class CityIndex:
+    """Local city-name -> OpenWeatherMap city ID index."""
+
+    def __init__(self, ids: Optional[Dict[str, int]] = None):
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        for name, city_id in (ids or {}).items():
+            self.learn(name, city_id)
+
+    @classmethod
+    def from_file(cls, path: str, seed: Optional[Dict[str, int]] = None) -> "CityIndex":
+        """Loads OpenWeatherMap's city.list.json format or a plain {"name": id} map."""
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        ids = dict(seed or {})
+        if isinstance(raw, dict):
+            ids.update(raw)
+        else:
+            for entry in raw:
+                # Keep the first ID for ambiguous names, like the API's own name lookup
+                ids.setdefault(entry["name"], entry["id"])
+        return cls(ids)
+
+    def get(self, city: str) -> Optional[int]:
+        return self._ids.get(normalize_city(city))
+
+    def learn(self, city: str, city_id: Optional[int]) -> None:
+        if city_id:
+            with self._lock:
+                self._ids.setdefault(normalize_city(city), int(city_id))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def _default_city_index() -> CityIndex:
+    if CITY_INDEX_FILE:
+        return CityIndex.from_file(CITY_INDEX_FILE, seed=KNOWN_CITY_IDS)
+    return CityIndex(KNOWN_CITY_IDS)
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class WeatherService:
+    """Cached, connection-pooled client for the OpenWeatherMap current weather API."""
+
+    def __init__(
+        self,
+        api_key: str = API_KEY,
+        base_url: str = BASE_URL,
+        group_url: str = GROUP_URL,
+        cache_ttl: float = CACHE_TTL,
+        stale_ttl: float = CACHE_STALE_TTL,
+        cache_maxsize: int = CACHE_MAXSIZE,
+        pool_size: int = POOL_SIZE,
+        timeout: float = REQUEST_TIMEOUT,
+        session: Optional[requests.Session] = None,
+        city_index: Optional[CityIndex] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.group_url = group_url
+        self.city_index = city_index if city_index is not None else _default_city_index()
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl, stale_ttl=stale_ttl)
+        self._flight = SingleFlight()
+        self._session = session or self._make_session(pool_size)
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+        # Blocking lookups run here so they never stall the event loop
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="weather-io")
+        self._lock = threading.Lock()
+        self.upstream_requests = 0
+        self.group_requests = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def _make_session(pool_size: int) -> requests.Session:
+        # Keep-alive connections are reused across calls, so repeated lookups
+        # skip the TCP/TLS handshake.
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.upstream_requests += 1
+        response = self._session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
+        return response.json()
+
+    def _request(self, city: str, units: str) -> Dict[str, Any]:
+        params = {
+            'q': city,
+            'limit': 1,
+            'appid': self.api_key,
+            'units': units
+        }
+        return self._get(self.base_url, params)
+
+    def _fetch_and_store(self, key: Tuple[str, str], city: str, units: str) -> Dict[str, Any]:
+        data = self._request(city, units)
+        self.cache.set(key, data)
+        self.city_index.learn(city, data.get("id"))
+        return data
+
+    def _fetch_group(self, city_ids: List[int], units: str) -> Dict[int, Dict[str, Any]]:
+        """One bulk request for up to GROUP_LIMIT city IDs; returns payloads by ID."""
+        params = {
+            'id': ",".join(str(city_id) for city_id in city_ids),
+            'appid': self.api_key,
+            'units': units
+        }
+        with self._lock:
+            self.group_requests += 1
+        payload = self._get(self.group_url, params)
+        return {item["id"]: item for item in payload.get("list", []) if "id" in item}
+
+    def _refresh(self, key: Tuple[str, str], city: str, units: str) -> None:
+        try:
+            self._flight.do(key, lambda: self._fetch_and_store(key, city, units))
+        except Exception:
+            # Keep serving the stale value; the next miss will surface the error.
+            with self._lock:
+                self.refresh_errors += 1
+
+    def get_current(self, city: str, units: str) -> Tuple[Dict[str, Any], str]:
+        """Returns (raw API payload, cache outcome) for `city` in `units`.
+
+        The outcome is "hit", "stale" or "miss". Raises the `requests`
+        exceptions of the underlying call on a miss.
+        """
+        key = (normalize_city(city), units)
+        data, freshness = self.cache.lookup(key)
+        if freshness == FRESH:
+            return data, "hit"
+        if freshness == STALE:
+            # Stale-while-revalidate: answer now, refresh once in the background.
+            if not self._flight.in_flight(key):
+                self._refresher.submit(self._refresh, key, city, units)
+            return data, "stale"
+        data = self._flight.do(key, lambda: self._fetch_and_store(key, city, units))
+        return data, "miss"
+
+    async def get_current_async(
+        self, city: str, units: str, timeout: Optional[float] = TOOL_TIMEOUT
+    ) -> Tuple[Dict[str, Any], str]:
+        """Non-blocking `get_current` for use from the event loop.
+
+        Cache hits are answered inline; misses run on a worker thread. Raises
+        `asyncio.TimeoutError` if the lookup takes longer than `timeout`.
+        """
+        key = (normalize_city(city), units)
+        data, freshness = self.cache.lookup(key)
+        if freshness == FRESH:
+            return data, "hit"
+        if freshness == STALE:
+            if not self._flight.in_flight(key):
+                self._refresher.submit(self._refresh, key, city, units)
+            return data, "stale"
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor,
+            lambda: self._flight.do(key, lambda: self._fetch_and_store(key, city, units)),
+        )
+        # A timed-out request keeps running on its thread and still fills the cache.
+        data = await asyncio.wait_for(future, timeout)
+        return data, "miss"
+
+    async def get_many_async(
+        self, cities: List[str], units: str, timeout: Optional[float] = TOOL_TIMEOUT
+    ) -> Dict[str, Tuple[Any, str]]:
+        """Looks up several cities with as few upstream requests as possible.
+
+        Cached cities are answered from the cache, cities with a known ID are
+        fetched in bulk through the group endpoint, and the rest fall back to
+        concurrent single-city lookups. Returns {city: (payload, outcome)};
+        a failed city has the raised exception as payload and outcome "error".
+        """
+        results: Dict[str, Tuple[Any, str]] = {}
+        by_id: Dict[int, List[str]] = {}
+        by_name: List[str] = []
+        for city in dict.fromkeys(cities):  # de-duplicate, keep order
+            key = (normalize_city(city), units)
+            data, freshness = self.cache.lookup(key)
+            if freshness == FRESH:
+                results[city] = (data, "hit")
+            elif freshness == STALE:
+                if not self._flight.in_flight(key):
+                    self._refresher.submit(self._refresh, key, city, units)
+                results[city] = (data, "stale")
+            elif self.city_index.get(city):
+                by_id.setdefault(self.city_index.get(city), []).append(city)
+            else:
+                by_name.append(city)
+
+        loop = asyncio.get_running_loop()
+        for chunk in _chunks(list(by_id), GROUP_LIMIT):
+            try:
+                future = loop.run_in_executor(self._executor, self._fetch_group, chunk, units)
+                payloads = await asyncio.wait_for(future, timeout)
+            except (requests.exceptions.RequestException, ValueError, asyncio.TimeoutError):
+                # Let the single-city path retry (and report) these cities
+                payloads = {}
+            for city_id in chunk:
+                names = by_id.pop(city_id)
+                if city_id not in payloads:
+                    by_name.extend(names)
+                    continue
+                for city in names:
+                    self.cache.set((normalize_city(city), units), payloads[city_id])
+                    results[city] = (payloads[city_id], "miss")
+
+        lookups = await asyncio.gather(
+            *(self.get_current_async(city, units, timeout) for city in by_name),
+            return_exceptions=True,
+        )
+        for city, outcome in zip(by_name, lookups):
+            results[city] = (outcome, "error") if isinstance(outcome, BaseException) else outcome
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats.as_dict()
+        stats.update(
+            size=len(self.cache),
+            upstream_requests=self.upstream_requests,
+            group_requests=self.group_requests,
+            known_city_ids=len(self.city_index),
+            deduplicated=self._flight.shared,
+            refresh_errors=self.refresh_errors,
+        )
+        return stats
+
+    def close(self) -> None:
+        self._refresher.shutdown(wait=False)
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+
+# Process-wide instance shared by every session
+weather_service = WeatherService()
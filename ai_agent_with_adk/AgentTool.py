@@ -1,26 +1,28 @@
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools import google_search
+from agent_common.state_injection import KeyBudget, StateInjector
+from agent_common.model_pool import PooledGemini
+
+# Caps how much of the research findings is pasted into the summarizer's prompt
+# (extractive summary beyond the budget). STATE_BUDGETS=0 injects them whole.
+state_injector = StateInjector.from_env({"research_findings": KeyBudget(800, "extract")})
 
 # Research Agent: Its job is to use the google_search tool and present findings.
 research_agent = Agent(
     name="ResearchAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""You are a specialized research agent. Your only job is to use the
     google_search tool to find 2-3 pieces of relevant information on the given topic and present the findings with citations.""",
     tools=[google_search],
     output_key="research_findings",  # The result of this agent will be stored in the session state with this key.
 )
 
-print("✅ research_agent created.")
-
 # Summarizer Agent: Its job is to summarize the text it receives.
 summarizer_agent = Agent(
     name="SummarizerAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # The instruction is modified to request a bulleted list for a clear output format.
-    instruction="""Read the provided research findings: {research_findings}
-Create a concise summary as a bulleted list with 3-5 key points.""",
+    instruction=state_injector.instruction("""Read the provided research findings: {research_findings}
+Create a concise summary as a bulleted list with 3-5 key points."""),
     output_key="final_summary",
 )
-
-print("✅ summarizer_agent created.")
\ No newline at end of file
@@ -1,10 +1,18 @@
-from ai_agent_with_adk.AgentTool import *
+import os
+
+from google.adk.agents.llm_agent import Agent
+from ai_agent_with_adk.AgentTool import research_agent, summarizer_agent
 from google.adk.tools import AgentTool
+from google.adk.apps import App
+from agent_common.coordinator import compile_coordinator
+from agent_common.search_cache import SearchCachePlugin
+from agent_common.model_pool import PooledGemini
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
 
 # Root Coordinator: Orchestrates the workflow by calling the sub-agents as tools.
 root_agent = Agent(
     name="ResearchCoordinator",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # This instruction tells the root agent HOW to use its tools (which are the other agents).
     instruction="""You are a research coordinator. Your goal is to answer the user's query by orchestrating a workflow.
 1. First, you MUST call the `ResearchAgent` tool to find relevant information on the topic provided by the user.
@@ -17,4 +25,23 @@ root_agent = Agent(
     ]
 )
 
-print("✅ root_agent created.")
\ No newline at end of file
+# --- Coordinator Compilation ---
+# The coordinator's order is fixed (ResearchAgent, then SummarizerAgent), so by default it is compiled
+# into a direct pipeline: no coordinator model turns, results passed via output_key state.
+# COMPILE_COORDINATOR=0 keeps the LLM coordinator.
+llm_coordinator = root_agent
+if os.environ.get("COMPILE_COORDINATOR", "1") != "0":
+    root_agent = compile_coordinator(llm_coordinator)
+
+# Collapse identical/near-identical concurrent searches and reuse recent results.
+search_cache = SearchCachePlugin()
+
+# Cheap model for delegation and search turns; the summary may go to the stronger one when the findings are long.
+model_router = ModelRouterPlugin.from_env({
+    "ResearchCoordinator": RoutePolicy("router"),
+    "ResearchAgent": RoutePolicy("tool"),
+    "SummarizerAgent": RoutePolicy("synthesis", max_output_tokens=1024),
+})
+
+# `adk run`/`adk web` pick up `app` (with its plugins) before `root_agent`.
+app = App(name="ai_agent_with_adk", root_agent=root_agent, plugins=[model_router, search_cache])
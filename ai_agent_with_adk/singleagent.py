@@ -1,12 +1,21 @@
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools import google_search
+from google.adk.apps import App
+from agent_common.search_cache import SearchCachePlugin
+from agent_common.model_pool import PooledGemini
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
 
 root_agent = Agent(
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     name="helpful_assistant",
     description="A simple agent that can answer general questions.",
     instruction="You are a helpful assistant. Use Google Search for current info or if unsure.",
     tools=[google_search],
 )
 
-print("✅ root_agent created.")
\ No newline at end of file
+# Search turns on the cheap model; long answers over the search results may use the stronger one.
+model_router = ModelRouterPlugin.from_env({"helpful_assistant": RoutePolicy("tool", max_output_tokens=1024)})
+
+# Collapse identical/near-identical concurrent searches and reuse recent results.
+# Its own app name, so its sessions are kept apart from agent.py's in a shared session store.
+app = App(name="ai_agent_with_adk_singleagent", root_agent=root_agent, plugins=[model_router, SearchCachePlugin()])
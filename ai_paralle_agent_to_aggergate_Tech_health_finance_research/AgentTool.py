@@ -1,49 +1,53 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
+from agent_common.state_injection import KeyBudget, StateInjector
+from agent_common.model_pool import PooledGemini
+
+# Token caps for the three reports injected into the aggregator's prompt. The researchers are asked
+# for ~100 words, so this only bites when one runs long (extractive summary). STATE_BUDGETS=0 disables.
+state_injector = StateInjector.from_env({
+    "tech_research": KeyBudget(400, "extract"),
+    "health_research": KeyBudget(400, "extract"),
+    "finance_research": KeyBudget(400, "extract"),
+})
 
 # Tech Researcher: Focuses on AI and ML trends.
 tech_researcher = Agent(
     name="TechResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research the latest AI/ML trends. Include 3 key developments,
 the main companies involved, and the potential impact. Keep the report very concise (100 words).""",
     tools=[google_search],
     output_key="tech_research", # The result of this agent will be stored in the session state with this key.
 )
 
-print("✅ tech_researcher created.")
-
 
 # Health Researcher: Focuses on medical breakthroughs.
 health_researcher = Agent(
     name="HealthResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research recent medical breakthroughs. Include 3 significant advances,
 their practical applications, and estimated timelines. Keep the report concise (100 words).""",
     tools=[google_search],
     output_key="health_research", # The result will be stored with this key.
 )
 
-print("✅ health_researcher created.")
-
 # Finance Researcher: Focuses on fintech trends.
 finance_researcher = Agent(
     name="FinanceResearcher",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Research current fintech trends. Include 3 key trends,
 their market implications, and the future outlook. Keep the report concise (100 words).""",
     tools=[google_search],
     output_key="finance_research", # The result will be stored with this key.
 )
 
-print("✅ finance_researcher created.")
-
 # The AggregatorAgent runs *after* the parallel step to synthesize the results.
 aggregator_agent = Agent(
     name="AggregatorAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # It uses placeholders to inject the outputs from the parallel agents, which are now in the session state.
-    instruction="""Combine these three research findings into a single executive summary:
+    instruction=state_injector.instruction("""Combine these three research findings into a single executive summary:
 
     **Technology Trends:**
     {tech_research}
@@ -54,10 +58,6 @@ aggregator_agent = Agent(
     **Finance Innovations:**
     {finance_research}
 
-    Your summary should highlight common themes, surprising connections, and the most important key takeaways from all three reports. The final summary should be around 200 words.""",
+    Your summary should highlight common themes, surprising connections, and the most important key takeaways from all three reports. The final summary should be around 200 words."""),
     output_key="executive_summary",  # This will be the final output of the entire system.
 )
-
-print("✅ aggregator_agent created.")
-
-
@@ -1,11 +1,38 @@
+import os
+
 from google.adk.agents.llm_agent import Agent
-from google.adk.agents import SequentialAgent, ParallelAgent
-from ai_paralle_agent_to_aggergate_Tech_health_finance_research.AgentTool import *
+from google.adk.agents import SequentialAgent
+from google.adk.apps import App
+from agent_common.deadline_parallel import DeadlineParallelAgent
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
+from agent_common.response_cache import ResponseCachePlugin
+from agent_common.search_cache import SearchCachePlugin
+from ai_paralle_agent_to_aggergate_Tech_health_finance_research.AgentTool import (
+    aggregator_agent,
+    finance_researcher,
+    health_researcher,
+    tech_researcher,
+)
 
-# The ParallelAgent runs all its sub-agents simultaneously.
-parallel_research_team = ParallelAgent(
+# --- Straggler Settings ---
+# Overall budget (seconds) for the three researchers; a branch still running at the deadline is
+# cancelled and its report replaced by a placeholder. 0 disables the deadline.
+RESEARCH_DEADLINE_S = float(os.environ.get("RESEARCH_DEADLINE_S", "45"))
+# Re-issue a branch once it runs past this percentile of its recent latencies (0 disables hedging),
+# or after RESEARCH_HEDGE_AFTER_S while there is no history yet.
+RESEARCH_HEDGE_PERCENTILE = float(os.environ.get("RESEARCH_HEDGE_PERCENTILE", "90"))
+RESEARCH_HEDGE_AFTER_S = float(os.environ.get("RESEARCH_HEDGE_AFTER_S", "15"))
+
+# The ParallelAgent runs all its sub-agents simultaneously. This one also hedges slow
+# branches and stops waiting at the deadline, so one slow search can't hold up the aggregator.
+parallel_research_team = DeadlineParallelAgent(
     name="ParallelResearchTeam",
     sub_agents=[tech_researcher, health_researcher, finance_researcher],
+    deadline_s=RESEARCH_DEADLINE_S or None,
+    hedge_percentile=RESEARCH_HEDGE_PERCENTILE or None,
+    hedge_after_s=RESEARCH_HEDGE_AFTER_S or None,
+    placeholder="(No {agent} report: {reason} after {elapsed:.0f}s. Summarize the other findings.)",
+    timings_state_key="research_timings",  # per-branch elapsed_s and outcome (primary/hedge/timeout/error)
 )
 
 # This SequentialAgent defines the high-level workflow: run the parallel team first, then run the aggregator.
@@ -14,4 +41,32 @@ root_agent = SequentialAgent(
     sub_agents=[parallel_research_team, aggregator_agent],
 )
 
-print("✅ Parallel and Sequential Agents created.")
\ No newline at end of file
+# Cache model answers for the fixed-instruction researchers (and the aggregator,
+# whose prompt is identical whenever the three reports are). TTLs in seconds.
+response_cache = ResponseCachePlugin.from_env(
+    agent_ttls={
+        "TechResearcher": 6 * 3600,
+        "HealthResearcher": 6 * 3600,
+        "FinanceResearcher": 6 * 3600,
+        "AggregatorAgent": 6 * 3600,
+    }
+)
+
+# Researchers run search turns on the cheap model with ~100-word reports; the aggregator's history
+# (the researchers' replies, which its instruction already carries via state) is capped, and it may
+# use the stronger model when the reports are long. Listed first so cache keys include the routed model.
+model_router = ModelRouterPlugin.from_env({
+    "TechResearcher": RoutePolicy("tool", max_output_tokens=400),
+    "HealthResearcher": RoutePolicy("tool", max_output_tokens=400),
+    "FinanceResearcher": RoutePolicy("tool", max_output_tokens=400),
+    "AggregatorAgent": RoutePolicy("synthesis", max_output_tokens=800, max_prompt_tokens=3000),
+})
+
+# `adk run`/`adk web` pick up `app` (with its plugins) before `root_agent`.
+app = App(
+    name="ai_paralle_agent_to_aggergate_Tech_health_finance_research",
+    root_agent=root_agent,
+    # The search cache also collapses identical research running concurrently in other sessions.
+    # A branch waits on another session's search for at most half its deadline, then searches itself.
+    plugins=[model_router, response_cache, SearchCachePlugin(wait_timeout=(RESEARCH_DEADLINE_S or 120) / 2)],
+)
@@ -0,0 +1,82 @@
+import os
+
+from google.adk.agents import SequentialAgent
+from google.adk.agents.llm_agent import Agent
+from google.adk.apps import App
+from google.adk.tools import google_search
+from agent_common.map_reduce import MapReduceAgent
+from agent_common.model_pool import PooledGemini
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
+from agent_common.search_cache import SearchCachePlugin
+
+# --- Fan-out Settings ---
+# Upper bound on subtopics per request, and on researcher/aggregator runs in flight at once.
+RESEARCH_MAX_SUBTOPICS = int(os.environ.get("RESEARCH_MAX_SUBTOPICS", "200"))
+RESEARCH_MAX_CONCURRENCY = int(os.environ.get("RESEARCH_MAX_CONCURRENCY", "8"))
+# Each aggregator run combines at most RESEARCH_BRANCHING reports of at most RESEARCH_REDUCE_TOKENS in total.
+RESEARCH_BRANCHING = int(os.environ.get("RESEARCH_BRANCHING", "8"))
+RESEARCH_REDUCE_TOKENS = int(os.environ.get("RESEARCH_REDUCE_TOKENS", "3000"))
+
+# Topic Planner: splits the request into the subtopics researched below, one per line.
+topic_planner = Agent(
+    name="TopicPlanner",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
+    instruction=f"""Split the user's research request into distinct, non-overlapping subtopics
+(as many as the request asks for, at most {RESEARCH_MAX_SUBTOPICS}). Output one subtopic per line and nothing else.""",
+    output_key="topics",
+)
+
+# Subtopic Researcher: runs once per subtopic; {topic} is set for each run.
+subtopic_researcher = Agent(
+    name="SubtopicResearcher",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
+    instruction="""Research this subtopic: {topic}
+Report the 2-3 most important recent findings with their sources. Keep the report concise (100 words).""",
+    tools=[google_search],
+    include_contents="none",  # the subtopic is all it needs, not the whole topic list
+)
+
+# Section Aggregator: combines a group of reports ({reports}) into one summary, level by level.
+section_aggregator = Agent(
+    name="SectionAggregator",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
+    instruction="""Combine these research reports into one summary:
+
+{reports}
+
+This is a {reduce_scope} summary. A partial summary feeds a later summary of other parts: keep every
+important finding and its source, grouped by theme, in about 200 words. A final summary is the answer
+to the user: highlight common themes, surprising connections and the key takeaways in about 400 words.""",
+    include_contents="none",
+)
+
+# The MapReduceAgent researches every subtopic (bounded concurrency) and aggregates the reports
+# in a tree, so no aggregator prompt grows with the number of subtopics.
+subtopic_team = MapReduceAgent(
+    name="SubtopicResearchTeam",
+    sub_agents=[subtopic_researcher, section_aggregator],
+    max_topics=RESEARCH_MAX_SUBTOPICS,
+    max_concurrency=RESEARCH_MAX_CONCURRENCY,
+    branching_factor=RESEARCH_BRANCHING,
+    max_reduce_tokens=RESEARCH_REDUCE_TOKENS,
+    output_key="research_report",
+)
+
+root_agent = SequentialAgent(
+    name="SubtopicResearchSystem",
+    sub_agents=[topic_planner, subtopic_team],
+)
+
+# Researchers on the cheap model with short reports; aggregators may use the stronger one for long groups.
+model_router = ModelRouterPlugin.from_env({
+    "TopicPlanner": RoutePolicy("general", max_output_tokens=4096),
+    "SubtopicResearcher": RoutePolicy("tool", max_output_tokens=400),
+    "SectionAggregator": RoutePolicy("synthesis", max_output_tokens=1024),
+})
+
+# `adk run`/`adk web` pick up `app` (with its plugins) before `root_agent`.
+app = App(
+    name="subtopic_research",
+    root_agent=root_agent,
+    plugins=[model_router, SearchCachePlugin()],
+)
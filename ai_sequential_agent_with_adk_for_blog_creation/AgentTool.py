@@ -1,10 +1,20 @@
 from google.adk.agents import Agent
+from agent_common.state_injection import KeyBudget, StateInjector
+from agent_common.model_pool import PooledGemini
+
+# Per-key token caps for state injected into the writer/editor prompts. The outline is summarized
+# extractively past its budget; the draft is only ever truncated (the editor must see real text),
+# and its cap sits well above a 300-word post. STATE_BUDGETS=0 injects values whole.
+state_injector = StateInjector.from_env({
+    "blog_outline": KeyBudget(600, "extract"),
+    "blog_draft": KeyBudget(1500, "truncate"),
+})
 
 
 # Outline Agent: Creates the initial blog post outline.
 outline_agent = Agent(
     name="OutlineAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     instruction="""Create a blog outline for the given topic with:
     1. A catchy headline
     2. An introduction hook
@@ -13,29 +23,23 @@ outline_agent = Agent(
     output_key="blog_outline", # The result of this agent will be stored in the session state with this key.
 )
 
-print("✅ outline_agent created.")
-
 
 # Writer Agent: Writes the full blog post based on the outline from the previous agent.
 writer_agent = Agent(
     name="WriterAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # The `{blog_outline}` placeholder automatically injects the state value from the previous agent's output.
-    instruction="""Following this outline strictly: {blog_outline}
-    Write a brief, 200 to 300-word blog post with an engaging and informative tone.""",
+    instruction=state_injector.instruction("""Following this outline strictly: {blog_outline}
+    Write a brief, 200 to 300-word blog post with an engaging and informative tone."""),
     output_key="blog_draft", # The result of this agent will be stored with this key.
 )
 
-print("✅ writer_agent created.")
-
 # Editor Agent: Edits and polishes the draft from the writer agent.
 editor_agent = Agent(
     name="EditorAgent",
-    model="gemini-2.5-flash-lite",
+    model=PooledGemini(model="gemini-2.5-flash-lite"),
     # This agent receives the `{blog_draft}` from the writer agent's output.
-    instruction="""Edit this draft: {blog_draft}
-    Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity.""",
+    instruction=state_injector.instruction("""Edit this draft: {blog_draft}
+    Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity."""),
     output_key="final_blog", # This is the final output of the entire pipeline.
 )
-
-print("✅ editor_agent created.")
\ No newline at end of file
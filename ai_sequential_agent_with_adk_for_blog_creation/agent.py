@@ -1,9 +1,44 @@
+import os
+
 from google.adk.agents import SequentialAgent
-from ai_sequential_agent_with_adk_for_blog_creation.AgentTool import *
-from google.adk.tools import AgentTool
+from ai_sequential_agent_with_adk_for_blog_creation.AgentTool import editor_agent, outline_agent, writer_agent
+from google.adk.apps import App
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
+from agent_common.response_cache import ResponseCachePlugin
+from agent_common.streaming_pipeline import StreamingSequentialAgent
+
+# BLOG_STREAMING=1 (default): the editor starts on each section of the draft while the writer is
+# still streaming, and the edited blog streams out section by section.
+# BLOG_STREAMING=0: the classic pipeline, each stage waits for the previous one to finish.
+BLOG_STREAMING = os.environ.get("BLOG_STREAMING", "1") != "0"
 
-root_agent = SequentialAgent(
+pipeline_class = StreamingSequentialAgent if BLOG_STREAMING else SequentialAgent
+root_agent = pipeline_class(
     name="BlogPipeline",
     sub_agents=[outline_agent, writer_agent, editor_agent]
 )
-print("✅ Sequential Agent created.")
+
+# Cache each stage's answer: the same topic gives the same outline, and the
+# same outline/draft gives the same writer/editor prompt. TTLs in seconds.
+response_cache = ResponseCachePlugin.from_env(
+    agent_ttls={
+        "OutlineAgent": 24 * 3600,
+        "WriterAgent": 24 * 3600,
+        "EditorAgent": 24 * 3600,
+    }
+)
+
+# Writing and editing may go to the stronger model as the outline/draft grows; output caps per stage.
+# Listed before the response cache, so cached answers are keyed by the routed model.
+model_router = ModelRouterPlugin.from_env({
+    "OutlineAgent": RoutePolicy("general", max_output_tokens=800),
+    "WriterAgent": RoutePolicy("synthesis", max_output_tokens=2400),
+    "EditorAgent": RoutePolicy("synthesis", max_output_tokens=2400),
+})
+
+# `adk run`/`adk web` pick up `app` (with its plugins) before `root_agent`.
+app = App(
+    name="ai_sequential_agent_with_adk_for_blog_creation",
+    root_agent=root_agent,
+    plugins=[model_router, response_cache],
+)
@@ -0,0 +1 @@
+"""Offline benchmarks for the agent packages. Run as `python -m benchmarks.<name>`."""
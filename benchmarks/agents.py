@@ -0,0 +1,346 @@
+"""Offline benchmark of every agent package against a deterministic fake Gemini.
+
+Each package's `root_agent` (with the plugins of its `app`/runner) is driven
+through a real ADK Runner, but every LLM agent talks to `FakeLlm`, google_search
+is replaced by the stub backend and OpenWeatherMap by a fake session, so runs
+are repeatable and need no API keys. Each iteration uses a fresh session and a
+distinct query so response/search caches don't turn later iterations into hits.
+
+Reported per target: wall time, framework overhead (wall time not covered by
+any model or tool interval), simulated model time, per-agent/per-tool timings,
+event counts, model calls/tokens and peak traced memory (one extra traced
+iteration, so tracemalloc doesn't skew the timings).
+
+    python -m benchmarks.agents --iterations 20 --out bench.json
+    python -m benchmarks.agents --compare bench.json   # exits 1 on regressions
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.plugins.logging_plugin import LoggingPlugin
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.fakes import FakeLlm, FakeWeatherSession, ScriptStep, install_fakes
+from agent_common.paper_corpus import PaperCorpus
+from agent_common.registry import load_agent_module
+from agent_common.search_cache import StubSearchBackend
+from agent_common.tracing import TracingPlugin
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The research agent's paper corpus stays in memory, so runs are repeatable and leave no corpus.db behind
+os.environ.setdefault("RESEARCH_CORPUS_DB", "")
+
+SEARCH_THEN_ANSWER = [ScriptStep(call="google_search", args={"query": "{query}"})]
+
+# Function-call scripts per agent name; agents without one answer with text.
+SCRIPTS: Dict[str, List[ScriptStep]] = {
+    "ResearchCoordinator": [
+        ScriptStep(call="ResearchAgent", args={"request": "{query}"}),
+        ScriptStep(call="SummarizerAgent", args={"request": "Summarize the findings on {query}"}),
+    ],
+    "ResearchAgent": SEARCH_THEN_ANSWER,
+    "helpful_assistant": SEARCH_THEN_ANSWER,
+    "TechResearcher": SEARCH_THEN_ANSWER,
+    "HealthResearcher": SEARCH_THEN_ANSWER,
+    "FinanceResearcher": SEARCH_THEN_ANSWER,
+    "google_search_agent": SEARCH_THEN_ANSWER,
+    "TopicPlanner": [ScriptStep(text="\n".join(f"{{query}}: aspect {n}" for n in range(1, 13)))],
+    "SubtopicResearcher": SEARCH_THEN_ANSWER,
+    "research_paper_finder_agent": [
+        ScriptStep(call="google_search_agent", args={"request": "{query}"}),
+        ScriptStep(call="count_papers", args={"papers": ["Paper A", "Paper B", "Paper C"]}),
+    ],
+    "weather_agent_v6_tool_guardrail": [
+        ScriptStep(call="get_weather_real", args={"city": "London"}),
+    ],
+}
+
+# target name -> (module, query template)
+TARGETS: Dict[str, Tuple[str, str]] = {
+    "ai_agent_with_adk": ("ai_agent_with_adk.agent", "Research quantum computing trends #{i}"),
+    "ai_agent_with_adk.singleagent": ("ai_agent_with_adk.singleagent", "What is new in battery tech #{i}"),
+    "ai_sequential_agent_with_adk_for_blog_creation": (
+        "ai_sequential_agent_with_adk_for_blog_creation.agent", "Write a blog post about remote work #{i}"),
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research": (
+        "ai_paralle_agent_to_aggergate_Tech_health_finance_research.agent", "Run the daily research brief #{i}"),
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research.subtopics": (
+        "ai_paralle_agent_to_aggergate_Tech_health_finance_research.subtopics", "Survey grid storage #{i}"),
+    "research-agent": ("research-agent.agent", "Find recent papers on LLM safety #{i}"),
+    "agent_team": ("agent_team.agent", "What is the weather in London? (run {i})"),
+}
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _union_seconds(intervals: List[Tuple[float, float]]) -> float:
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+class BenchmarkPlugin(BasePlugin):
+    """Records agent, model and tool intervals for one benchmark run.
+
+    AgentTool passes the parent's plugins to its nested runner, so calls made
+    inside agent-tools are recorded too.
+    """
+
+    def __init__(self):
+        super().__init__(name="benchmark")
+        self.reset()
+
+    def reset(self):
+        self._open: Dict[Any, float] = {}
+        self.agent_intervals: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        self.model_intervals: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        self.tool_intervals: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+
+    @staticmethod
+    def _ctx_key(kind, callback_context, name):
+        ctx = callback_context._invocation_context
+        return (kind, ctx.invocation_id, ctx.branch, name)
+
+    def _close(self, key, bucket, name):
+        start = self._open.pop(key, None)
+        if start is not None:
+            bucket[name].append((start, time.perf_counter()))
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        self._open[self._ctx_key("agent", callback_context, agent.name)] = time.perf_counter()
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        self._close(self._ctx_key("agent", callback_context, agent.name), self.agent_intervals, agent.name)
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        # Registered last, so a cache plugin answering first skips this (and the
+        # after callback); only real model calls are timed.
+        key = self._ctx_key("model", callback_context, callback_context.agent_name)
+        self._open[key] = time.perf_counter()
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        key = self._ctx_key("model", callback_context, callback_context.agent_name)
+        self._close(key, self.model_intervals, callback_context.agent_name)
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        key = self._ctx_key("model", callback_context, callback_context.agent_name)
+        self._close(key, self.model_intervals, callback_context.agent_name)
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        self._open[("tool", tool_context.function_call_id)] = time.perf_counter()
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._close(("tool", tool_context.function_call_id), self.tool_intervals, tool.name)
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._close(("tool", tool_context.function_call_id), self.tool_intervals, tool.name)
+
+
+def load_target(module_name: str):
+    """Imports a package's agent module; returns (module, root_agent, plugins)."""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    loaded = load_agent_module(module_name)
+    # Observability plugins are measured separately (benchmarks/tracing_overhead.py).
+    return loaded.module, loaded.root_agent, [p for p in loaded.plugins
+                                              if not isinstance(p, (LoggingPlugin, TracingPlugin))]
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def _interval_stats(intervals: Dict[str, List[Tuple[float, float]]]) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {"calls": len(spans), "total_ms": sum(e - s for s, e in spans) * 1000,
+               "mean_ms": statistics.fmean(e - s for s, e in spans) * 1000}
+        for name, spans in sorted(intervals.items()) if spans
+    }
+
+
+async def _run_once(runner: Runner, plugin: BenchmarkPlugin, query: str, event_counts: Dict[str, int]):
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    plugin.reset()
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    start = time.perf_counter()
+    async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        event_counts["total"] += 1
+        event_counts[f"author:{event.author}"] += 1
+        if event.partial:
+            event_counts["partial"] += 1
+        if event.get_function_calls():
+            event_counts["function_calls"] += len(event.get_function_calls())
+    wall = time.perf_counter() - start
+    await runner.session_service.delete_session(app_name=runner.app_name, user_id="bench", session_id=session.id)
+
+    model_spans = [s for spans in plugin.model_intervals.values() for s in spans]
+    tool_spans = [s for spans in plugin.tool_intervals.values() for s in spans]
+    covered = _union_seconds(model_spans + tool_spans)
+    return wall, max(0.0, wall - covered), _union_seconds(model_spans)
+
+
+def reset_corpus(module) -> None:
+    """Gives research-agent an empty paper corpus.
+
+    Runs that repeat a query would otherwise be answered from the corpus
+    (corpus_fast_path) after the first, without any search or model call.
+    """
+    if hasattr(module, "_corpus"):
+        if module._corpus is not None:
+            module._corpus.close()
+        module._corpus = PaperCorpus(":memory:")
+
+
+def install_offline(name: str, module, root_agent, args) -> FakeLlm:
+    """Points a target at FakeLlm, the stub search backend and (agent_team) the fake weather API."""
+    llm = FakeLlm(latency_s=args.model_latency, output_tokens=args.output_tokens,
+                  tokens_per_s=args.tokens_per_s, scripts=SCRIPTS)
+    install_fakes(root_agent, llm, StubSearchBackend(latency=args.tool_latency))
+    if name == "agent_team":
+        from agent_team.weather_service import WeatherService
+        module.weather_service = WeatherService(session=FakeWeatherSession(args.tool_latency), cache_ttl=0, stale_ttl=0)
+    return llm
+
+
+async def bench_target(name: str, args) -> Dict[str, Any]:
+    module_name, query_template = TARGETS[name]
+    module, root_agent, plugins = load_target(module_name)
+    llm = install_offline(name, module, root_agent, args)
+
+    plugin = BenchmarkPlugin()
+    runner = Runner(app_name="benchmark", agent=root_agent, plugins=plugins + [plugin],
+                    session_service=InMemorySessionService())
+    walls, overheads, model_times = [], [], []
+    agents, tools, models = defaultdict(list), defaultdict(list), defaultdict(list)
+    event_counts: Dict[str, int] = defaultdict(int)
+    with contextlib.redirect_stdout(io.StringIO()):  # agent modules print progress
+        for i in range(args.warmup + args.iterations):
+            wall, overhead, model_time = await _run_once(runner, plugin, query_template.format(i=i), event_counts)
+            if i < args.warmup:
+                event_counts.clear()
+                continue
+            walls.append(wall)
+            overheads.append(overhead)
+            model_times.append(model_time)
+            for bucket, source in ((agents, plugin.agent_intervals), (tools, plugin.tool_intervals),
+                                   (models, plugin.model_intervals)):
+                for key, spans in source.items():
+                    bucket[key].extend(spans)
+
+        calls_before = llm.stats.calls
+        tracemalloc.start()
+        await _run_once(runner, plugin, query_template.format(i="traced"), defaultdict(int))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    await runner.close()
+
+    iterations = args.iterations
+    return {
+        "iterations": iterations,
+        "wall": _summarize(walls),
+        "framework_overhead": _summarize(overheads),
+        "model_time": _summarize(model_times),
+        "overhead_share": statistics.fmean(o / w for o, w in zip(overheads, walls)),
+        "agents": _interval_stats(agents),
+        "models": _interval_stats(models),
+        "tools": _interval_stats(tools),
+        "events_per_run": {k: v / iterations for k, v in sorted(event_counts.items())},
+        "model_calls_per_run": calls_before / (iterations + args.warmup),
+        "prompt_tokens": llm.stats.prompt_tokens,
+        "output_tokens": llm.stats.output_tokens,
+        "peak_traced_kib": peak / 1024,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lines describing p50 changes; those beyond `tolerance` are marked REGRESSION."""
+    lines = []
+    for name, result in current["targets"].items():
+        base = baseline.get("targets", {}).get(name)
+        if not base:
+            continue
+        for metric in ("wall", "framework_overhead"):
+            now, before = result[metric]["p50_ms"], base[metric]["p50_ms"]
+            change = (now - before) / before if before else 0.0
+            flag = "REGRESSION" if change > tolerance else ""
+            lines.append(f"{name:<62} {metric:<19} {before:>8.2f} -> {now:>8.2f} ms ({change:+.0%}) {flag}")
+    return lines
+
+
+async def run(args) -> Dict[str, Any]:
+    results = {}
+    for name in args.targets:
+        results[name] = await bench_target(name, args)
+    return {
+        "config": {k: getattr(args, k) for k in
+                   ("iterations", "warmup", "model_latency", "tool_latency", "output_tokens", "tokens_per_s")},
+        "python": sys.version.split()[0],
+        "targets": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--model-latency", type=float, default=0.02, help="fake model time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.005, help="stub search/weather latency (s)")
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="fake generation speed; 0 = instant")
+    parser.add_argument("--out", help="write the JSON results here")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --out run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(f"{'target':<62} {'wall p50':>9} {'ovh p50':>8} {'ovh %':>6} {'model':>6} {'events':>7} {'peak KiB':>9}")
+    for name, r in report["targets"].items():
+        print(f"{name:<62} {r['wall']['p50_ms']:>9.1f} {r['framework_overhead']['p50_ms']:>8.2f} "
+              f"{r['overhead_share']:>6.1%} {r['model_calls_per_run']:>6.1f} "
+              f"{r['events_per_run'].get('total', 0):>7.1f} {r['peak_traced_kib']:>9.0f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            lines = compare(report, json.load(f), args.tolerance)
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Time-to-first-token and total latency: sequential vs streaming BlogPipeline.
+
+Runs the blog pipeline's three agents (cloned) as a plain SequentialAgent and
+as a StreamingSequentialAgent against FakeLlm, which streams at a fixed token
+rate after a fixed time to first token. The fake writer produces a headline
+and N sections; the fake editor echoes what it was asked to edit, so editing
+a section costs proportionally fewer tokens than editing the whole draft.
+TTFT is the time until the caller sees the first EditorAgent token.
+
+    python -m benchmarks.blog_streaming --ttft 0.4 --tokens-per-s 80 --sections 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from google.adk.agents import SequentialAgent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.fakes import FakeLlm
+from agent_common.streaming_pipeline import StreamingSequentialAgent
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from ai_sequential_agent_with_adk_for_blog_creation.AgentTool import editor_agent, outline_agent, writer_agent
+
+
+class BlogFakeLlm(FakeLlm):
+    """Writer emits a sectioned draft; editor returns the text it was given."""
+
+    sections: int = 4
+    words_per_section: int = 60
+
+    def _next_part(self, llm_request, agent_name, query):
+        if agent_name == "WriterAgent":
+            body = " ".join(f"word{i}" for i in range(self.words_per_section))
+            draft = "# A Catchy Headline\n\nAn introduction hook.\n\n" + "\n\n".join(
+                f"## Section {n}\n\n{body}" for n in range(1, self.sections + 1))
+            return types.Part(text=draft)
+        if agent_name == "EditorAgent":
+            instruction = str(llm_request.config.system_instruction)
+            draft = instruction.split("Edit this draft:", 1)[-1].split("Your task is", 1)[0].strip()
+            return types.Part(text=draft)
+        return super()._next_part(llm_request, agent_name, query)
+
+
+def build(streaming: bool):
+    agents = [agent.clone() for agent in (outline_agent, writer_agent, editor_agent)]
+    cls = StreamingSequentialAgent if streaming else SequentialAgent
+    return cls(name="BlogPipeline", sub_agents=agents)
+
+
+async def run_once(runner: Runner, query: str):
+    session = await runner.session_service.create_session(app_name="bench", user_id="bench")
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    config = RunConfig(streaming_mode=StreamingMode.SSE)
+    start = time.perf_counter()
+    ttft, final = None, None
+    async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message, run_config=config):
+        if event.author == "EditorAgent" and event.content and event.content.parts and event.content.parts[0].text:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            if not event.partial:
+                final = event.content.parts[0].text
+    total = time.perf_counter() - start
+    session = await runner.session_service.get_session(app_name="bench", user_id="bench", session_id=session.id)
+    return ttft, total, len(final or ""), session.state.get("final_blog") == final
+
+
+async def bench(streaming: bool, args):
+    llm = BlogFakeLlm(latency_s=args.ttft, tokens_per_s=args.tokens_per_s, chunk_tokens=4,
+                      sections=args.sections, output_tokens=40)
+    pipeline = build(streaming)
+    for agent in pipeline.sub_agents:
+        agent.model = llm
+    runner = Runner(app_name="bench", agent=pipeline, session_service=InMemorySessionService())
+    rows = [await run_once(runner, f"Remote work #{i}") for i in range(args.iterations)]
+    await runner.close()
+    return {
+        "ttft_s": statistics.median(r[0] for r in rows),
+        "total_s": statistics.median(r[1] for r in rows),
+        "chars": rows[0][2],
+        "state_ok": all(r[3] for r in rows),
+        "model_calls": llm.stats.calls / args.iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ttft", type=float, default=0.4, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=80)
+    parser.add_argument("--sections", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<11} {'TTFT s':>7} {'total s':>8} {'model calls':>12} {'chars':>6} {'state ok':>9}")
+    for streaming in (False, True):
+        r = asyncio.run(bench(streaming, args))
+        print(f"{'streaming' if streaming else 'sequential':<11} {r['ttft_s']:>7.2f} {r['total_s']:>8.2f} "
+              f"{r['model_calls']:>12.1f} {r['chars']:>6} {str(r['state_ok']):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Model calls and tokens per query: LLM coordinator vs compiled pipeline.
+
+Runs ai_agent_with_adk's ResearchCoordinator both ways against FakeLlm (with
+the scripted tool calls from benchmarks.agents) and the stub search backend,
+and reports model calls, prompt tokens and output tokens per query, in total
+and per agent. FakeLlm counts prompt tokens from everything sent to the
+model (instruction plus contents), so re-tokenized sub-agent output shows up.
+
+    python -m benchmarks.coordinator_compile --queries 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.coordinator import compile_coordinator
+from agent_common.fakes import FakeLlm, install_fakes
+from benchmarks.agents import SCRIPTS
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from ai_agent_with_adk import agent as coordinator_module
+
+
+async def measure(root_agent, queries: int):
+    llm = FakeLlm(latency_s=0.0, scripts=SCRIPTS)
+    install_fakes(root_agent, llm)
+    runner = Runner(app_name="bench", agent=root_agent, session_service=InMemorySessionService())
+    finals = []
+    for i in range(queries):
+        session = await runner.session_service.create_session(app_name="bench", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text=f"Research quantum computing trends #{i}")])
+        final = None
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            if event.is_final_response() and event.content and event.content.parts:
+                final = event.content.parts[0].text
+        finals.append(final)
+    await runner.close()
+    return llm.stats, finals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=5)
+    args = parser.parse_args()
+
+    llm_coordinator = coordinator_module.llm_coordinator
+    modes = {"llm coordinator": llm_coordinator, "compiled": compile_coordinator(llm_coordinator)}
+    print(f"{'mode':<16} {'calls/q':>8} {'prompt tok/q':>13} {'output tok/q':>13}  per-agent calls/q")
+    for mode, root_agent in modes.items():
+        stats, finals = asyncio.run(measure(root_agent, args.queries))
+        per_agent = ", ".join(f"{name} {calls / args.queries:.0f}" for name, calls in sorted(stats.calls_by_agent.items()))
+        print(f"{mode:<16} {stats.calls / args.queries:>8.1f} {stats.prompt_tokens / args.queries:>13.0f} "
+              f"{stats.output_tokens / args.queries:>13.0f}  {per_agent}")
+        print(f"{'':<16} final answer from: {finals[-1].split(':', 1)[0]}")
+
+
+if __name__ == "__main__":
+    main()
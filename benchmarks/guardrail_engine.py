@@ -0,0 +1,78 @@
+"""Microbenchmark: compiled GuardrailEngine vs the original per-keyword scan.
+
+The baseline generalizes the original block_keyword_guardrail to N rules:
+upper-case the message, then test each keyword as a substring. The engine is
+measured both uncached (every message new) and cached (repeated message, as
+happens across model calls within one invocation).
+
+    python -m benchmarks.guardrail_engine --rules 10 1000 10000
+"""
+import argparse
+import random
+import string
+import timeit
+
+from agent_common.guardrails import GuardrailEngine
+
+MESSAGES = [
+    "What's the weather in Tokyo?",
+    "What is the weather like in London? I am flying there tomorrow and want to pack properly.",
+    "Tell me the weather in New York, and also whether I need an umbrella this afternoon.",
+    "Hello, this is alice. " * 10,
+]
+
+
+def _random_terms(count, seed=7):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_uppercase, k=rng.randint(6, 12))) for _ in range(count)]
+
+
+def naive_check(terms, text):
+    upper = text.upper()
+    for term in terms:
+        if term in upper:
+            return term
+    return None
+
+
+def _time_per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'naive us':>10} {'engine us':>10} {'cached us':>10} {'speedup':>8}")
+    for count in args.rules:
+        terms = _random_terms(count) + ["BLOCK"]
+        engine = GuardrailEngine(keywords=terms, cache_size=1)  # cache_size=1: effectively uncached
+        cached = GuardrailEngine(keywords=terms)
+        counter = iter(range(10 ** 9))
+
+        def run_naive():
+            for text in MESSAGES:
+                naive_check(terms, text)
+
+        def run_engine():
+            # Unique suffix per call so no verdict is ever reused
+            suffix = str(next(counter))
+            for text in MESSAGES:
+                engine.check(text + suffix)
+
+        def run_cached():
+            for text in MESSAGES:
+                cached.check(text)
+
+        for fn in (run_naive, run_engine, run_cached):
+            assert fn() is None
+        naive = _time_per_call(run_naive, args.number) / len(MESSAGES) * 1e6
+        fresh = _time_per_call(run_engine, args.number) / len(MESSAGES) * 1e6
+        hit = _time_per_call(run_cached, args.number) / len(MESSAGES) * 1e6
+        print(f"{count:>6} {naive:>10.1f} {fresh:>10.1f} {hit:>10.1f} {naive / fresh:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark the greeting/farewell fast path on agent_team's sample queries.
+
+Reads the sample queries from the comment block at the bottom of
+agent_team/agent.py, runs each through `intent_fast_path` (guardrail first,
+as wired on the root agent) and reports which ones were answered locally,
+the per-call classification cost, and the model calls avoided. A delegated
+greeting costs 3 model calls (root transfer decision, sub-agent tool call,
+sub-agent reply).
+
+    python -m benchmarks.intent_fast_path
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import timeit
+from types import SimpleNamespace
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from agent_team import agent
+
+MODEL_CALLS_PER_DELEGATION = 3
+
+
+def sample_queries():
+    """The '# # <query>' lines after '# Sample queries' in agent_team/agent.py."""
+    with open(os.path.join(os.path.dirname(agent.__file__), "agent.py"), encoding="utf-8") as f:
+        source = f.read()
+    block = source[source.index("# Sample queries"):]
+    queries = []
+    for line in block.splitlines():
+        match = re.match(r"^#+ # (.+)$", line.strip())
+        if match and not match.group(1).startswith("Agent will"):
+            queries.append(match.group(1).strip())
+    return queries
+
+
+def _request(text):
+    return LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text=text)])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    queries = sample_queries()
+    callback_context = SimpleNamespace(state={}, agent_name=agent.root_agent.name, invocation_id="benchmark")
+    hits = 0
+    print(f"{'query':<40} {'intent':<9} {'conf':>5} {'source':<6} fast path")
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = []
+        for query in queries:
+            request = _request(query)
+            blocked = agent.block_keyword_guardrail(callback_context, request)
+            prediction = agent.intent_classifier.classify(query)
+            answered = None if blocked else agent.intent_fast_path(callback_context, request)
+            rows.append((query, prediction, "blocked" if blocked else (answered.content.parts[0].text if answered else "-")))
+    for query, prediction, outcome in rows:
+        hits += outcome not in ("-", "blocked")
+        print(f"{query:<40} {prediction.label:<9} {prediction.confidence:>5.2f} {prediction.source:<6} {outcome}")
+
+    per_call = min(timeit.repeat(
+        lambda: [agent.intent_classifier.classify(q) for q in queries], number=args.number // 10 or 1, repeat=3
+    )) / (args.number // 10 or 1) / len(queries) * 1e6
+    print(f"\nqueries: {len(queries)}  answered locally: {hits}  "
+          f"model calls avoided: ~{hits * MODEL_CALLS_PER_DELEGATION}")
+    print(f"classification cost: {per_call:.1f} us/query")
+    print(f"fast path counters: {agent.intent_fast_path_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Throughput of MapReduceAgent vs the number of topics, flat vs tree reduce.
+
+For each N in `--topics`, seeds a session with N subtopics and runs a
+MapReduceAgent (a researcher that searches then answers, and an aggregator)
+through a real ADK Runner against FakeLlm and the stub search backend:
+
+  flat  one aggregator run over all N reports, uncompacted (what
+        ParallelResearchTeam's single AggregatorAgent does with N branches)
+  tree  groups of `--branching` reports, each aggregator prompt capped at
+        `--reduce-tokens`
+
+FakeLlm's time to first token grows with the prompt (`--prefill-tokens-per-s`)
+so a large aggregator prompt costs what it would on a real model. Both modes
+run at most `--concurrency` model-driven runs at a time. Reported: wall time,
+topics/s, time to the first leaf report and the first summary, model calls,
+reductions, and the largest aggregator input (flagged when it exceeds
+`--context-limit`).
+
+    python -m benchmarks.map_reduce
+    python -m benchmarks.map_reduce --topics 20 200 --concurrency 16 --branching 10
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from google.adk.agents.llm_agent import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import google_search
+from google.genai import types
+
+from agent_common.fakes import FakeLlm, ScriptStep, estimate_tokens, install_fakes
+from agent_common.map_reduce import MapReduceAgent
+from agent_common.search_cache import StubSearchBackend
+
+
+class PrefillFakeLlm(FakeLlm):
+    """FakeLlm whose time to first token also grows with the prompt size."""
+
+    prefill_tokens_per_s: float = 0.0
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        if self.prefill_tokens_per_s > 0:
+            prompt = str(llm_request.config.system_instruction or "") + str(llm_request.contents)
+            await asyncio.sleep(estimate_tokens(prompt) / self.prefill_tokens_per_s)
+        async for response in super().generate_content_async(llm_request, stream):
+            yield response
+
+
+def build(mode: str, n: int, args) -> MapReduceAgent:
+    researcher = Agent(name="SubtopicResearcher", model="fake-gemini", tools=[google_search], include_contents="none",
+                       instruction="Research this subtopic: {topic}. Keep the report concise (100 words).")
+    aggregator = Agent(name="SectionAggregator", model="fake-gemini", include_contents="none",
+                       instruction="Combine these research reports into one {reduce_scope} summary:\n\n{reports}")
+    tree = mode == "tree"
+    return MapReduceAgent(
+        name="SubtopicResearchTeam",
+        sub_agents=[researcher, aggregator],
+        max_topics=n,
+        max_concurrency=args.concurrency,
+        branching_factor=args.branching if tree else n,
+        max_reduce_tokens=args.reduce_tokens if tree else 10 ** 9,
+        output_key="research_report",
+    )
+
+
+async def run_case(mode: str, n: int, args) -> Dict[str, Any]:
+    llm = PrefillFakeLlm(latency_s=args.model_latency, output_tokens=args.output_tokens,
+                         prefill_tokens_per_s=args.prefill_tokens_per_s,
+                         scripts={"SubtopicResearcher": [ScriptStep(call="google_search", args={"query": "{query}"})]})
+    agent = build(mode, n, args)
+    install_fakes(agent, llm, StubSearchBackend(latency=args.tool_latency))
+    runner = Runner(app_name="benchmark", agent=agent, session_service=InMemorySessionService())
+    topics = [f"grid storage subtopic {i}" for i in range(n)]
+    session = await runner.session_service.create_session(app_name="benchmark", user_id="bench", state={"topics": topics})
+    message = types.Content(role="user", parts=[types.Part(text="Survey grid-scale energy storage")])
+    started = time.perf_counter()
+    async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        pass
+    wall = time.perf_counter() - started
+    session = await runner.session_service.get_session(app_name="benchmark", user_id="bench", session_id=session.id)
+    await runner.close()
+    progress = session.state["map_reduce_progress"]
+    stats = agent.stats()
+    return {
+        "wall_s": wall,
+        "topics_per_s": n / wall,
+        "first_leaf_s": progress["first_leaf_s"],
+        "first_summary_s": progress["first_summary_s"],
+        "model_calls": llm.stats.calls,
+        "reductions": stats["reductions"],
+        "levels": progress["levels"],
+        "max_reduce_input_tokens": stats["max_reduce_input_tokens"],
+    }
+
+
+async def main_async(args) -> None:
+    print(f"{'mode':<5} {'N':>4} {'wall s':>7} {'topics/s':>9} {'1st leaf':>9} {'1st sum':>8} {'calls':>6} "
+          f"{'reduces':>8} {'levels':>7} {'max agg in':>11}")
+    for n in args.topics:
+        for mode in args.modes:
+            r = await run_case(mode, n, args)
+            over = "  > context limit" if r["max_reduce_input_tokens"] > args.context_limit else ""
+            print(f"{mode:<5} {n:>4} {r['wall_s']:>7.2f} {r['topics_per_s']:>9.1f} {r['first_leaf_s']:>9.2f} "
+                  f"{r['first_summary_s'] or 0:>8.2f} {r['model_calls']:>6} {r['reductions']:>8} {r['levels']:>7} "
+                  f"{r['max_reduce_input_tokens']:>11}{over}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", nargs="+", type=int, default=[20, 50, 100, 200])
+    parser.add_argument("--modes", nargs="+", choices=["flat", "tree"], default=["flat", "tree"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--branching", type=int, default=8)
+    parser.add_argument("--reduce-tokens", type=int, default=3000)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake time to first token (s)")
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=20000.0, help="0 = prompt size costs nothing")
+    parser.add_argument("--output-tokens", type=int, default=130, help="words per fake answer (~100-word reports)")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="stub search latency (s)")
+    parser.add_argument("--context-limit", type=int, default=32000, help="aggregator input size to flag")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Tier mix, truncation and cost of ModelRouterPlugin decisions, from its JSONL log.
+
+Summarizes a decision log (MODEL_ROUTER_LOG) per agent: calls, share routed to
+the strong tier, main routing reasons, history trimmed, capped answers that
+stopped on MAX_TOKENS, and estimated cost against two baselines: every call on
+the agent's own model, and every call on the strong tier.
+
+Without `--log`, first drives the agent packages through benchmarks.agents
+(FakeLlm, stub tools) with routing on and summarizes that run. FakeLlm answers
+with a fixed number of tokens, so this checks the routing decisions and
+overhead, not answer quality (and "own $" is 0: the fake model has no price).
+
+    python -m benchmarks.model_router --iterations 5
+    python -m benchmarks.model_router --log router.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List
+
+from agent_common.model_router import DEFAULT_TIERS, STRONG, estimate_cost
+
+
+def read_log(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records: Iterable[Dict[str, Any]], strong_model: str = DEFAULT_TIERS[STRONG]) -> Dict[str, Dict[str, Any]]:
+    agents: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "calls": 0, "strong": 0, "errors": 0, "capped": 0, "hit_cap": 0, "trimmed_tokens": 0,
+        "prompt_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "baseline_cost_usd": 0.0,
+        "all_strong_cost_usd": 0.0, "reasons": Counter(),
+    })
+    for r in records:
+        for name in (r["agent"], "(all)"):
+            a = agents[name]
+            a["calls"] += 1
+            a["strong"] += r["tier"] == STRONG
+            a["errors"] += r.get("error") is not None
+            a["capped"] += r.get("max_output_tokens") is not None
+            a["hit_cap"] += r.get("finish_reason") == "MAX_TOKENS"
+            a["trimmed_tokens"] += r.get("trimmed_tokens", 0)
+            prompt, output = r.get("prompt_tokens") or 0, r.get("output_tokens") or 0
+            a["prompt_tokens"] += prompt
+            a["output_tokens"] += output
+            a["cost_usd"] += r.get("cost_usd") or 0.0
+            a["baseline_cost_usd"] += r.get("baseline_cost_usd") or 0.0
+            a["all_strong_cost_usd"] += estimate_cost(strong_model, prompt, output)
+            a["reasons"][r.get("reason", "?")] += 1
+    return dict(agents)
+
+
+def report(summary: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'agent':<34} {'calls':>6} {'strong':>7} {'capped':>7} {'hit cap':>8} {'trimmed':>8} "
+          f"{'cost $':>10} {'own $':>10} {'strong $':>10}  top reasons")
+    for name in sorted(summary, key=lambda n: (n == "(all)", n)):
+        a = summary[name]
+        reasons = ", ".join(f"{k} {v}" for k, v in a["reasons"].most_common(2))
+        print(f"{name:<34} {a['calls']:>6} {a['strong'] / a['calls']:>7.0%} {a['capped']:>7} {a['hit_cap']:>8} "
+              f"{a['trimmed_tokens']:>8} {a['cost_usd']:>10.5f} {a['baseline_cost_usd']:>10.5f} "
+              f"{a['all_strong_cost_usd']:>10.5f}  {reasons}")
+
+
+def generate_log(args, path: str) -> None:
+    # The router reads MODEL_ROUTER_LOG when a package's app is built, which load_target does lazily
+    os.environ["MODEL_ROUTER_LOG"] = path
+    os.environ.setdefault("MODEL_ROUTER", "1")
+    from benchmarks import agents
+
+    bench_args = argparse.Namespace(iterations=args.iterations, warmup=0, model_latency=0.0, tool_latency=0.0,
+                                    output_tokens=args.output_tokens, tokens_per_s=0.0)
+    for name in args.targets:
+        result = asyncio.run(agents.bench_target(name, bench_args))
+        print(f"ran {name}: {result['model_calls_per_run']:.1f} model calls/run, wall p50 {result['wall']['p50_ms']:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="existing decision log; omit to generate one with FakeLlm")
+    parser.add_argument("--targets", nargs="+", default=None, help="benchmarks.agents targets (default: all)")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    args = parser.parse_args()
+    path = args.log
+    if path is None:
+        from benchmarks.agents import TARGETS
+
+        args.targets = args.targets or list(TARGETS)
+        path = os.path.join(tempfile.mkdtemp(prefix="model_router_"), "decisions.jsonl")
+        generate_log(args, path)  # each run flushes the log when it ends
+    report(summarize(read_log(path)))
+
+
+if __name__ == "__main__":
+    main()
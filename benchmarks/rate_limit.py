@@ -0,0 +1,138 @@
+"""Model calls under throttling: uncoordinated client retries vs the shared rate limiter.
+
+Starts a local FakeGeminiServer with a quota (`--server-rpm`, `--server-concurrency`,
+optional random 503s) and sends a mixed workload through the real genai client
+stack. A batch burst (`--batch` requests, all submitted at once, like batch.py)
+competes with a steady stream of interactive requests (`--interactive` at
+`--interactive-rps`).
+
+  uncoordinated  plain Gemini per request, HTTP-level retries with research-agent's
+                 old retry_config (5 attempts, exp_base=7, 1s initial delay)
+  shared         PooledGemini: per-model token bucket + AIMD window, interactive first,
+                 jittered capped backoff (5 attempts, exp_base=2, 20s cap)
+
+Delays in both policies are multiplied by `--delay-scale` so a run stays short.
+Reported per mode and priority: completed/failed requests and latency
+percentiles, plus the 429s/503s the server sent.
+
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --batch 400 --server-rpm 600 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.genai import Client, types
+
+from agent_common.fakes import FakeGeminiServer
+from agent_common.model_pool import PooledGemini, model_pool
+from agent_common.rate_limit import BATCH, INTERACTIVE, PRIORITY_NAMES, priority, rate_limiter, request_priority
+
+MODEL = "gemini-2.5-flash-lite"
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def make_uncoordinated_model(url: str, scale: float) -> Gemini:
+    retry = types.HttpRetryOptions(attempts=5, exp_base=7, initial_delay=1 * scale,
+                                   http_status_codes=[429, 500, 503, 504])
+    client = Client(api_key="fake", http_options=types.HttpOptions(base_url=url, retry_options=retry))
+
+    class _DirectGemini(Gemini):
+        @property
+        def api_client(self) -> Client:  # type: ignore[override]
+            return client
+
+    return _DirectGemini(model=MODEL)
+
+
+def make_shared_model(url: str, scale: float, server_rpm: float) -> PooledGemini:
+    model_pool.base_url, model_pool.api_key = url, "fake"
+    # The client-side rate matches the known quota; the window has to find the concurrency limit.
+    rate_limiter.configure(rpm={MODEL: server_rpm}, enabled=True)
+    retry = types.HttpRetryOptions(attempts=5, exp_base=2, initial_delay=1 * scale, max_delay=20 * scale,
+                                   http_status_codes=[429, 500, 503, 504])
+    return PooledGemini(model=MODEL, retry_options=retry)
+
+
+async def call(model, i: int, results: Dict[str, Dict[str, List]]) -> None:
+    name = PRIORITY_NAMES[request_priority.get()]
+    request = LlmRequest(model=MODEL, contents=[types.Content(role="user", parts=[types.Part(text=f"request {i}")])],
+                         config=types.GenerateContentConfig())
+    started = time.perf_counter()
+    try:
+        async for _ in model.generate_content_async(request):
+            pass
+        results[name]["latency"].append(time.perf_counter() - started)
+    except Exception as e:  # noqa: BLE001 - counted per type
+        results[name]["errors"].append(getattr(e, "code", type(e).__name__))
+
+
+async def run_mode(mode: str, args) -> Dict[str, Any]:
+    async with FakeGeminiServer(rpm=args.server_rpm, max_concurrency=args.server_concurrency,
+                                error_rate=args.error_rate, latency_s=args.latency) as server:
+        if mode == "shared":
+            model = make_shared_model(server.url, args.delay_scale, args.server_rpm)
+        else:
+            model = make_uncoordinated_model(server.url, args.delay_scale)
+        results = {name: {"latency": [], "errors": []} for name in PRIORITY_NAMES.values()}
+        started = time.perf_counter()
+        with priority(BATCH):
+            batch = [asyncio.create_task(call(model, i, results)) for i in range(args.batch)]
+        interactive = []
+        with priority(INTERACTIVE):
+            for i in range(args.interactive):
+                interactive.append(asyncio.create_task(call(model, i, results)))
+                await asyncio.sleep(1 / args.interactive_rps)
+        await asyncio.gather(*batch, *interactive)
+        elapsed = time.perf_counter() - started
+        limiter = rate_limiter.stats().get(MODEL) if mode == "shared" else None
+        if mode == "shared":
+            await model_pool.shutdown()
+        return {"elapsed": elapsed, "results": results, "server": vars(server.stats).copy(), "limiter": limiter}
+
+
+def report(mode: str, outcome: Dict[str, Any]) -> None:
+    server = outcome["server"]
+    print(f"\n[{mode}] {outcome['elapsed']:.1f}s; server saw {server['requests']} requests: {server['ok']} ok, "
+          f"{server['throttled']} x 429, {server['unavailable']} x 503, peak concurrency {server['peak_in_flight']}")
+    for name, r in outcome["results"].items():
+        lat = r["latency"]
+        print(f"  {name:<12} ok {len(lat):>4}  failed {len(r['errors']):>4}  "
+              f"p50 {_percentile(lat, 50) * 1000:8.0f}ms  p95 {_percentile(lat, 95) * 1000:8.0f}ms  "
+              f"max {max(lat, default=0) * 1000:8.0f}ms")
+    if outcome["limiter"]:
+        limiter = outcome["limiter"]
+        print(f"  limiter: window {limiter['window']}, {limiter['window_cuts']} cuts, {limiter['throttled']} throttled, "
+              f"avg wait {limiter['wait_ms_avg']}")
+
+
+async def main_async(args) -> None:
+    for mode in args.modes:
+        report(mode, await run_mode(mode, args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["uncoordinated", "shared"], default=["uncoordinated", "shared"])
+    parser.add_argument("--batch", type=int, default=200, help="batch requests submitted at once")
+    parser.add_argument("--interactive", type=int, default=40)
+    parser.add_argument("--interactive-rps", type=float, default=4.0)
+    parser.add_argument("--server-rpm", type=float, default=1200.0)
+    parser.add_argument("--server-concurrency", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency (s)")
+    parser.add_argument("--delay-scale", type=float, default=0.1, help="multiplier for every retry delay")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
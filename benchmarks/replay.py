@@ -0,0 +1,203 @@
+"""Load test from a record/replay cassette: recorded sessions at N times their traffic.
+
+Replays every recorded session of each target `--multiplier` times through a
+real ADK Runner (with the target's plugins and callbacks). Model and tool calls are
+served from the cassette (agent_common/cassette.py) after their recorded
+latency times `--latency-scale`. Each copy starts at its session's recorded
+start time (times `--time-scale`), so `--multiplier 100` is 100x the
+recorded arrival rate. Copies of a session send identical requests, which
+the response and search caches would answer after the first, so those
+plugins are left out unless `--keep-caches`.
+
+Reported per target: sessions and turns run, failed sessions, turns/s, turn
+wall time, and orchestration overhead: the part of a turn's wall time not
+spent waiting on replayed model or tool calls. Also how the replayed calls
+matched the cassette (exact fingerprint / same turn position / miss).
+`--out` and `--compare` work as in benchmarks.agents, so two versions of the
+code can be compared on the same cassette.
+
+Without `--cassette`, first records one: `--sessions` sessions per target,
+driven through FakeLlm and the stub tools (see benchmarks.agents) with a
+CassetteRecorder. To replay real traffic, record it with
+`python -m agent_common.serving --record traffic.jsonl` (or a
+CassetteRecorder in an App's plugins) and pass that file.
+
+    python -m benchmarks.replay --multiplier 100
+    python -m benchmarks.replay --cassette traffic.jsonl --multiplier 100 --out v1.json
+    python -m benchmarks.replay --cassette traffic.jsonl --multiplier 100 --compare v1.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.cassette import Cassette, CassetteRecorder, install_replay, replay_spans
+from agent_common.response_cache import ResponseCachePlugin
+from agent_common.search_cache import SearchCachePlugin
+from benchmarks.agents import TARGETS, _summarize, _union_seconds, compare, install_offline, load_target, reset_corpus
+
+DEFAULT_TARGETS = [
+    "ai_sequential_agent_with_adk_for_blog_creation",  # BlogPipeline
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research",  # ResearchSystem
+    "agent_team",  # weather_agent_v6_tool_guardrail
+]
+
+
+async def record(path: str, args) -> int:
+    """Records `args.sessions` one-turn sessions per target against FakeLlm and the stub tools."""
+    recorder = CassetteRecorder(path)
+    for name in args.targets:
+        module_name, query_template = TARGETS[name]
+        module, root_agent, plugins = load_target(module_name)
+        install_offline(name, module, root_agent, args)
+        runner = Runner(app_name=name, agent=root_agent, plugins=plugins + [recorder],
+                        session_service=InMemorySessionService())
+        for i in range(args.sessions):
+            session = await runner.session_service.create_session(app_name=name, user_id="recorded")
+            message = types.Content(role="user", parts=[types.Part(text=query_template.format(i=i))])
+            async for _ in runner.run_async(user_id="recorded", session_id=session.id, new_message=message):
+                pass
+        await runner.close()
+    recorder.writer.close()
+    return recorder.writer.records
+
+
+async def replay_target(name: str, cassette: Cassette, args) -> Optional[Dict[str, Any]]:
+    module, root_agent, plugins = load_target(TARGETS[name][0])
+    if not args.keep_caches:
+        plugins = [p for p in plugins if not isinstance(p, (ResponseCachePlugin, SearchCachePlugin))]
+    sessions = cassette.sessions(root_agent.name)
+    if not sessions:
+        print(f"{name}: no recorded sessions for {root_agent.name}")
+        return None
+    install_replay(root_agent, cassette, latency_scale=args.latency_scale)
+    # Forget papers saved while recording; replayed count_papers calls don't add any
+    reset_corpus(module)
+    runner = Runner(app_name=name, agent=root_agent, plugins=plugins, session_service=InMemorySessionService())
+    limit = asyncio.Semaphore(args.max_concurrency) if args.max_concurrency else contextlib.nullcontext()
+    first_ts = sessions[0][0]["ts"]
+    turns: List[Tuple[float, float]] = []  # (wall, overhead) per turn
+    errors: Counter = Counter()
+
+    async def run_copy(user_turns: List[Dict[str, Any]], copy_index: int) -> None:
+        await asyncio.sleep((user_turns[0]["ts"] - first_ts) * args.time_scale)
+        async with limit:
+            session = await runner.session_service.create_session(app_name=name, user_id=f"replay{copy_index}")
+            previous_ts, previous_end = user_turns[0]["ts"], time.perf_counter()
+            for turn in user_turns:
+                # Later turns keep the recorded think time between messages
+                await asyncio.sleep(max(0.0, (turn["ts"] - previous_ts) * args.time_scale
+                                        - (time.perf_counter() - previous_end)))
+                spans: List[Tuple[float, float]] = []
+                replay_spans.set(spans)
+                message = types.Content.model_validate(turn["content"])
+                started = time.perf_counter()
+                try:
+                    async for _ in runner.run_async(user_id=session.user_id, session_id=session.id,
+                                                    new_message=message):
+                        pass
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                    return
+                previous_ts, previous_end = turn["ts"], time.perf_counter()
+                wall = previous_end - started
+                turns.append((wall, max(0.0, wall - _union_seconds(spans))))
+
+    before = Counter(cassette.stats())
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # agent modules print progress
+        await asyncio.gather(*(run_copy(user_turns, k * len(sessions) + i)
+                               for k in range(args.multiplier) for i, user_turns in enumerate(sessions)))
+    elapsed = time.perf_counter() - started
+    await runner.close()
+    if not turns:
+        print(f"{name}: every session failed: {dict(errors)}")
+        return None
+
+    walls, overheads = [w for w, _ in turns], [o for _, o in turns]
+    return {
+        "sessions": len(sessions) * args.multiplier,
+        "turns": len(turns),
+        "failed_sessions": dict(errors),
+        "elapsed_s": elapsed,
+        "turns_per_s": len(turns) / elapsed,
+        "wall": _summarize(walls),
+        "framework_overhead": _summarize(overheads),
+        "overhead_share": statistics.fmean(o / w for w, o in turns if w),
+        "replay": dict(Counter(cassette.stats()) - before),
+    }
+
+
+async def run(cassette: Cassette, args) -> Dict[str, Any]:
+    results = {}
+    for name in args.targets:
+        result = await replay_target(name, cassette, args)
+        if result is not None:
+            results[name] = result
+    return {
+        "config": {k: getattr(args, k) for k in ("cassette", "multiplier", "latency_scale", "time_scale",
+                                                 "max_concurrency", "keep_caches")},
+        "python": sys.version.split()[0],
+        "targets": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", help="recorded traffic; omit to record one with FakeLlm first")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=DEFAULT_TARGETS)
+    parser.add_argument("--multiplier", type=int, default=100, help="copies of every recorded session")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="times recorded latency; 0 = none")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="times recorded arrival offsets; 0 = all at once")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="sessions in flight; 0 = unbounded")
+    parser.add_argument("--keep-caches", action="store_true", help="keep response/search cache plugins")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per target when recording")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake model latency when recording (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="stub tool latency when recording (s)")
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--out", help="write the JSON results here")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --out run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    if args.cassette is None:
+        args.cassette = os.path.join(tempfile.mkdtemp(prefix="cassette_"), "traffic.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):  # agent modules print progress
+            records = asyncio.run(record(args.cassette, args))
+        print(f"Recorded {args.sessions} sessions per target ({records} records) to {args.cassette}")
+    report = asyncio.run(run(Cassette.load(args.cassette), args))
+
+    print(f"{'target':<62} {'sessions':>8} {'failed':>6} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'ovh p50':>8} {'ovh p95':>8} {'ovh %':>6}  replay")
+    for name, r in report["targets"].items():
+        print(f"{name:<62} {r['sessions']:>8} {sum(r['failed_sessions'].values()):>6} {r['turns_per_s']:>8.1f} "
+              f"{r['wall']['p50_ms']:>8.1f} {r['wall']['p95_ms']:>8.1f} {r['framework_overhead']['p50_ms']:>8.2f} "
+              f"{r['framework_overhead']['p95_ms']:>8.2f} {r['overhead_share']:>6.1%}  "
+              + ", ".join(f"{k} {v}" for k, v in sorted(r["replay"].items())))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            lines = compare(report, json.load(f), args.tolerance)
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Load test for the multi-worker agent server (agent_common/serving.py).
+
+Starts the server with `--fake` (FakeLlm, stub search, fake weather API; no
+API keys), waits for it to warm up, then runs `--clients` concurrent clients
+for `--duration` seconds, each posting runs round-robin over the agents and
+reading the NDJSON stream to the end. Reports throughput, 429/503 rejections,
+errors, latency and time-to-first-event percentiles (overall and per agent),
+then stops the server with SIGTERM and reports how long the drain took.
+
+    python -m benchmarks.serving_load --workers 4 --clients 64 --duration 20
+    python -m benchmarks.serving_load --url http://127.0.0.1:8080   # an already running server
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One query per agent in agent_common.registry.AGENT_MODULES; --agents chooses from (and defaults to) these.
+QUERIES = {
+    "ai_agent_with_adk": "Research quantum computing trends #{i}",
+    "ai_sequential_agent_with_adk_for_blog_creation": "Write a blog post about remote work #{i}",
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research": "Run the daily research brief #{i}",
+    "subtopic_research": "Survey grid storage #{i}",
+    "research-agent": "Find recent papers on LLM safety #{i}",
+    "agent_team": "What is the weather in London? (run {i})",
+}
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def start_server(args) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "agent_common.serving", "--fake", "--quiet", "--port", str(args.port),
+        "--workers", str(args.workers), "--worker-concurrency", str(args.worker_concurrency),
+        "--queue-size", str(args.queue_size), "--queue-timeout", str(args.queue_timeout),
+        "--fake-latency", str(args.model_latency), "--fake-tokens-per-s", str(args.tokens_per_s),
+        "--agents", *args.agents,
+    ]
+    if args.agent_limits:
+        command += ["--agent-limits", args.agent_limits]
+    # Own process group, so a failed run can kill the workers too (they hold the stderr pipe open).
+    return subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                            start_new_session=True)
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}/healthz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"server at {url} not ready after {timeout:.0f}s")
+
+
+async def one_run(client: httpx.AsyncClient, url: str, agent: str, query: str, results: Dict) -> None:
+    started = time.perf_counter()
+    first_event = None
+    async with client.stream("POST", f"{url}/agents/{agent}/run", json={"message": query}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            results["status"][response.status_code] += 1
+            return
+        outcome = "error"
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["type"] == "event" and first_event is None:
+                first_event = time.perf_counter() - started
+            elif message["type"] in ("done", "cancelled", "error"):
+                outcome = message["type"]
+    elapsed = time.perf_counter() - started
+    results["status"][200 if outcome == "done" else f"stream {outcome}"] += 1
+    if outcome == "done":
+        results["latency"][agent].append(elapsed)
+        results["ttfe"][agent].append(first_event or elapsed)
+
+
+async def run_load(args, url: str) -> Dict:
+    results = {"status": defaultdict(int), "latency": defaultdict(list), "ttfe": defaultdict(list)}
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(120.0), limits=limits) as client:
+        await wait_ready(client, url, args.startup_timeout)
+        deadline = time.monotonic() + args.duration
+
+        async def client_loop():
+            while time.monotonic() < deadline:
+                i = next(counter)
+                agent = args.agents[i % len(args.agents)]
+                try:
+                    await one_run(client, url, agent, QUERIES[agent].format(i=i), results)
+                except httpx.HTTPError as e:
+                    results["status"][type(e).__name__] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.clients)))
+        results["elapsed"] = time.perf_counter() - started
+        results["server_stats"] = (await client.get(f"{url}/stats")).json()
+    return results
+
+
+def report(results: Dict) -> None:
+    latencies = [s for samples in results["latency"].values() for s in samples]
+    ttfe = [s for samples in results["ttfe"].values() for s in samples]
+    print(f"completed {len(latencies)} runs in {results['elapsed']:.1f}s: "
+          f"{len(latencies) / results['elapsed']:.1f} runs/s")
+    print("responses: " + ", ".join(f"{status}: {n}" for status, n in sorted(results["status"].items(), key=str)))
+    print(f"latency  p50 {_percentile(latencies, 50) * 1000:8.1f}ms  p95 {_percentile(latencies, 95) * 1000:8.1f}ms"
+          f"  p99 {_percentile(latencies, 99) * 1000:8.1f}ms")
+    print(f"1st evt  p50 {_percentile(ttfe, 50) * 1000:8.1f}ms  p95 {_percentile(ttfe, 95) * 1000:8.1f}ms"
+          f"  p99 {_percentile(ttfe, 99) * 1000:8.1f}ms")
+    print(f"{'agent':<62} {'runs':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for agent, samples in sorted(results["latency"].items()):
+        print(f"{agent:<62} {len(samples):>6} {_percentile(samples, 50) * 1000:>8.1f} {_percentile(samples, 99) * 1000:>8.1f}")
+    workers = results["server_stats"]["workers"]
+    print("workers: " + ", ".join(f"#{w['index']} pid {w['pid']}" for w in workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--worker-concurrency", type=int, default=16)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=10.0)
+    parser.add_argument("--agent-limits", help='passed to the server, e.g. "research-agent=4"')
+    parser.add_argument("--agents", nargs="+", choices=list(QUERIES), default=list(QUERIES))
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of load")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="fake generation speed; 0 = instant")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    server = None if args.url else start_server(args)
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        results = asyncio.run(run_load(args, url))
+    except BaseException:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGKILL)
+            print(server.stderr.read()[-4000:], file=sys.stderr)
+        raise
+    report(results)
+    if server is not None:
+        started = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=120)
+        # uvicorn re-raises the signal once shut down, so a clean drain exits with -SIGTERM.
+        print(f"server drained and exited ({server.returncode}) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Append throughput and session-load latency of the session services.
+
+Compares InMemorySessionService, ADK's SqliteSessionService (aiosqlite, when
+installed) and agent_common.session_store.SqliteSessionService, committing
+every event (flush_interval=0) and batched (the default 50ms window):
+
+* append: events/sec for `--sessions` concurrent sessions appending
+  `--events` events each (every third event carries a state delta).
+* load: get_session p50/p99 against a store seeded with N sessions of a few
+  events each, cold (first read, from disk) and warm (cached, validated).
+
+Databases live in a temporary directory and are removed afterwards.
+
+    python -m benchmarks.session_store --seed 1000 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.session_store import SCHEMA, SqliteSessionService
+
+APP, USER = "bench_app", "bench_user"
+
+
+def make_event(i: int) -> Event:
+    actions = EventActions(state_delta={"last_step": i, "notes": f"step {i} " * 8}) if i % 3 == 0 else EventActions()
+    return Event(
+        invocation_id=f"inv-{i // 4}",
+        author="user" if i % 4 == 0 else "agent",
+        content=types.Content(role="model", parts=[types.Part(text=f"message {i} " + "lorem ipsum " * 20)]),
+        actions=actions,
+    )
+
+
+def services(tmp: str):
+    """(label, factory) pairs; each factory returns a fresh service."""
+    found = [("in-memory", InMemorySessionService)]
+    try:
+        import aiosqlite  # noqa: F401
+        from google.adk.sessions.sqlite_session_service import SqliteSessionService as AdkSqliteSessionService
+        found.append(("adk sqlite", lambda: AdkSqliteSessionService(os.path.join(tmp, f"adk-{uuid.uuid4().hex}.db"))))
+    except ImportError:
+        print("(aiosqlite not installed: skipping ADK's SqliteSessionService)")
+    found.append(("wal sqlite, commit per event",
+                  lambda: SqliteSessionService(os.path.join(tmp, f"wal-{uuid.uuid4().hex}.db"), flush_interval=0)))
+    found.append(("wal sqlite, batched",
+                  lambda: SqliteSessionService(os.path.join(tmp, f"wal-{uuid.uuid4().hex}.db"))))
+    return found
+
+
+async def close(service) -> None:
+    if hasattr(service, "close"):
+        await service.close()
+
+
+async def bench_append(factory, sessions: int, events: int) -> float:
+    service = factory()
+    created = [await service.create_session(app_name=APP, user_id=USER) for _ in range(sessions)]
+
+    async def writer(session):
+        for i in range(events):
+            await service.append_event(session, make_event(i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(s) for s in created))
+    if hasattr(service, "flush"):
+        await service.flush()  # count the time to make the last batch durable
+    elapsed = time.perf_counter() - started
+    await close(service)
+    return sessions * events / elapsed
+
+
+def seed(path: str, count: int, events_per_session: int) -> list:
+    """Bulk-loads `count` sessions straight into a store file; returns their ids."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    now = time.time()
+    ids = [uuid.uuid4().hex for _ in range(count)]
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time, event_count)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(APP, USER, sid, json.dumps({"last_step": events_per_session}), now, now, events_per_session) for sid in ids],
+    )
+    payloads = [make_event(i) for i in range(events_per_session)]
+    conn.executemany(
+        "INSERT INTO events (app_name, user_id, session_id, id, invocation_id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(APP, USER, sid, e.id or f"{sid}-{i}", e.invocation_id, now, e.model_dump_json(exclude_none=True))
+         for sid in ids for i, e in enumerate(payloads)],
+    )
+    conn.execute("COMMIT")
+    conn.close()
+    return ids
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples) * 1000:7.3f}ms  p99 {p99 * 1000:7.3f}ms"
+
+
+async def bench_load(path: str, ids: list, reads: int) -> None:
+    service = SqliteSessionService(path)
+    sample = random.Random(0).sample(ids, min(reads, len(ids)))
+    for label in ("cold", "warm"):
+        timings = []
+        for sid in sample:
+            started = time.perf_counter()
+            session = await service.get_session(app_name=APP, user_id=USER, session_id=sid)
+            timings.append(time.perf_counter() - started)
+            assert session is not None and session.events
+        print(f"    {label:<5} {percentiles(timings)}")
+    print(f"    cache: {service.stats.cache_hits} hits / {service.stats.cache_misses} misses")
+    await close(service)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent sessions in the append test")
+    parser.add_argument("--events", type=int, default=40, help="events appended per session")
+    parser.add_argument("--seed", type=int, nargs="+", default=[1000, 100000], help="store sizes for the load test")
+    parser.add_argument("--events-per-session", type=int, default=4)
+    parser.add_argument("--reads", type=int, default=500, help="sessions read per load test")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"append: {args.sessions} sessions x {args.events} events")
+        for label, factory in services(tmp):
+            try:
+                print(f"  {label:<30} {await bench_append(factory, args.sessions, args.events):10,.0f} events/s")
+            except Exception as e:  # e.g. "database is locked" from concurrent writers
+                print(f"  {label:<30} failed: {type(e).__name__}: {e}")
+
+        for count in args.seed:
+            path = os.path.join(tmp, f"seeded-{count}.db")
+            started = time.perf_counter()
+            ids = seed(path, count, args.events_per_session)
+            print(f"load: {count:,} sessions x {args.events_per_session} events (seeded in {time.perf_counter() - started:.1f}s)")
+            await bench_load(path, ids, args.reads)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""Import-time and memory budget per agent package.
+
+Each package is measured in a fresh interpreter (`python -X importtime`), in
+two steps: importing the package, which must stay cheap and side-effect free
+(no google.adk/google.genai, nothing printed), then building its root agent
+through agent_common.registry. Reported per package: import and build time,
+peak RSS, whether heavy modules or stdout output appeared on import, and the
+slowest modules by self time. Each measurement is the best of `--repeat`
+runs. Exits 1 when a package is over its budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --build-budget-ms 2000 --rss-budget-mb 150 --top 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from agent_common.registry import AGENT_MODULES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a package import must not pull in: they're what building an agent costs.
+HEAVY_MODULES = ("google.adk", "google.genai", "dotenv", "fastapi")
+
+# Per-package budgets. Building an agent imports google.adk/google.genai, which is most of
+# the time and memory; the budgets leave headroom over that on a single slow core.
+DEFAULT_BUDGET = {"import_ms": 25.0, "build_ms": 5000.0, "rss_mb": 160.0}
+BUDGETS: Dict[str, Dict[str, float]] = {name: dict(DEFAULT_BUDGET) for name in AGENT_MODULES}
+
+PROBE = """
+import contextlib, importlib, io, json, resource, sys, time
+started = time.perf_counter()
+printed = io.StringIO()
+with contextlib.redirect_stdout(printed):
+    importlib.import_module({package!r})
+    imported = time.perf_counter()
+    heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+    import_printed = printed.getvalue()
+    from agent_common.registry import registry
+    registry.load({name!r})
+    built = time.perf_counter()
+scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "build_ms": (built - imported) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+    "heavy_on_import": heavy,
+    "printed_on_import": import_printed,
+    "printed_on_build": printed.getvalue()[len(import_printed):],
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """(module, self_us, cumulative_us) rows from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return rows
+
+
+def measure(name: str, repeat: int) -> Dict[str, Any]:
+    package = AGENT_MODULES[name].rsplit(".", 1)[0]
+    code = PROBE.format(package=package, name=name, heavy=HEAVY_MODULES)
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name}: probe failed\n{proc.stderr[-2000:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["imports"] = parse_importtime(proc.stderr)
+        if best is None or result["import_ms"] + result["build_ms"] < best["import_ms"] + best["build_ms"]:
+            best = result
+    return best
+
+
+def check(name: str, result: Dict[str, Any], budget: Dict[str, float]) -> List[str]:
+    """Budget violations for one package."""
+    problems = [f"{metric} {result[metric]:.0f} > {limit:.0f}" for metric, limit in budget.items()
+                if result[metric] > limit]
+    if result["heavy_on_import"]:
+        problems.append(f"package import loads {', '.join(result['heavy_on_import'])}")
+    if result["printed_on_import"] or result["printed_on_build"]:
+        problems.append("prints to stdout while importing/building")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packages", nargs="+", choices=list(AGENT_MODULES), default=list(AGENT_MODULES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per package; the fastest is reported")
+    parser.add_argument("--top", type=int, default=5, help="slowest modules (self time) to list per package")
+    parser.add_argument("--import-budget-ms", type=float)
+    parser.add_argument("--build-budget-ms", type=float)
+    parser.add_argument("--rss-budget-mb", type=float)
+    parser.add_argument("--out", help="write the JSON results here")
+    args = parser.parse_args()
+
+    overrides = {"import_ms": args.import_budget_ms, "build_ms": args.build_budget_ms, "rss_mb": args.rss_budget_mb}
+    report, failures = {}, {}
+    print(f"{'package':<62} {'import ms':>9} {'build ms':>9} {'RSS MB':>7} {'modules':>8}")
+    for name in args.packages:
+        result = measure(name, args.repeat)
+        budget = {**BUDGETS[name], **{k: v for k, v in overrides.items() if v is not None}}
+        problems = check(name, result, budget)
+        print(f"{name:<62} {result['import_ms']:>9.1f} {result['build_ms']:>9.0f} {result['rss_mb']:>7.0f} "
+              f"{result['modules']:>8} {'OVER BUDGET: ' + '; '.join(problems) if problems else ''}")
+        for row in sorted(result["imports"], key=lambda r: r["self_us"], reverse=True)[:args.top]:
+            print(f"    {row['self_us'] / 1000:>8.1f} ms self {row['cumulative_us'] / 1000:>8.1f} ms cum  {row['module']}")
+        report[name] = {k: v for k, v in result.items() if k != "imports"}
+        report[name]["budget"] = budget
+        if problems:
+            failures[name] = problems
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Prompt-token savings from budgeted state injection, per agent.
+
+Runs the three packages whose instructions inject state (ai_agent_with_adk,
+the blog pipeline and the parallel research system) against a FakeLlm that
+writes prose of a configurable length, once with budgets (STATE_BUDGETS=1)
+and once injecting values whole, and reports per agent the injected-state
+tokens before/after compaction, the total prompt tokens sent to the model,
+and the compaction cost per render.
+
+    python -m benchmarks.state_injection --output-words 150 600 2000
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+from google.genai import types
+
+from agent_common.fakes import FakeLlm
+from benchmarks import agents as agent_bench
+
+TARGETS = [
+    "ai_agent_with_adk",
+    "ai_sequential_agent_with_adk_for_blog_creation",
+    "ai_paralle_agent_to_aggergate_Tech_health_finance_research",
+]
+VOCABULARY = ("model agents research market growth patients clinical trial adoption platform data risk "
+              "regulation capital payments security diagnosis therapy network training inference cost").split()
+
+
+class ProseFakeLlm(FakeLlm):
+    """FakeLlm whose answers are sentences and paragraphs rather than a word salad."""
+
+    def _answer_text(self, agent_name: str, query: str) -> str:
+        seed = hashlib.sha256(f"{agent_name}|{query}".encode("utf-8")).digest()
+        words, lines = [], []
+        for i in range(self.output_tokens):
+            words.append(VOCABULARY[(seed[i % len(seed)] + i * 7) % len(VOCABULARY)])
+            if len(words) == 12:
+                lines.append(" ".join(words).capitalize() + ".")
+                words = []
+        paragraphs = [" ".join(lines[i:i + 4]) for i in range(0, len(lines), 4)]
+        return "\n\n".join(paragraphs) or agent_name
+
+
+def injectors(module):
+    found = []
+    for name in dir(module):
+        value = getattr(module, name)
+        if type(value).__name__ == "StateInjector":
+            found.append(value)
+    return found
+
+
+async def measure(target: str, output_words: int, budgets: bool, iterations: int):
+    module_name, query_template = agent_bench.TARGETS[target]
+    module, root_agent, _ = agent_bench.load_target(module_name)
+    tool_module = __import__(module_name.rsplit(".", 1)[0] + ".AgentTool", fromlist=["AgentTool"])
+    injector = injectors(tool_module)[0]
+    injector.enabled = budgets
+    injector._stats.clear()
+    llm = ProseFakeLlm(latency_s=0.0, output_tokens=output_words, scripts=agent_bench.SCRIPTS)
+    agent_bench.install_fakes(root_agent, llm)
+    runner = agent_bench.Runner(app_name="bench", agent=root_agent, session_service=agent_bench.InMemorySessionService())
+    started = time.perf_counter()
+    for i in range(iterations):
+        session = await runner.session_service.create_session(app_name="bench", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text=query_template.format(i=i))])
+        async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            pass
+    elapsed = time.perf_counter() - started
+    await runner.close()
+    return injector.stats(), llm.stats.prompt_tokens / iterations, elapsed / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-words", type=int, nargs="+", default=[150, 600, 2000])
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'words':>6} {'agent':<18} {'state tok':>10} {'injected':>9} {'saved':>6} {'hits':>5} "
+          f"{'prompt tok/q raw':>17} {'budgeted':>9} {'ms/q raw':>9} {'budgeted':>9}")
+    for words in args.output_words:
+        for target in TARGETS:
+            _, raw_prompt, raw_s = asyncio.run(measure(target, words, False, args.iterations))
+            stats, prompt, budget_s = asyncio.run(measure(target, words, True, args.iterations))
+            for agent_name, s in stats.items():
+                print(f"{words:>6} {agent_name:<18} {s['original_tokens'] / s['renders']:>10.0f} "
+                      f"{s['injected_tokens'] / s['renders']:>9.0f} {s['savings']:>6.0%} {s['cache_hits']:>5} "
+                      f"{raw_prompt:>17.0f} {prompt:>9.0f} {raw_s * 1000:>9.1f} {budget_s * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
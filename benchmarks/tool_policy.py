@@ -0,0 +1,108 @@
+"""Microbenchmark: per-call overhead of the indexed ToolPolicy.
+
+Compares, for N rules spread over several tools and arguments:
+  * linear  - walk every rule for each call (what N hand-written checks do)
+  * indexed - ToolPolicy.check with the verdict LRU disabled
+  * cached  - ToolPolicy.check with the verdict LRU (repeated argument values)
+and the original print-heavy block_paris_tool_guardrail as a reference.
+
+    python -m benchmarks.tool_policy --rules 10 100 1000
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import string
+import timeit
+from types import SimpleNamespace
+
+from agent_common.tool_policy import ToolPolicy
+
+TOOLS = ["get_weather_real", "get_weather_batch", "count_papers", "say_hello", "say_goodbye"]
+ARGS = ["city", "cities", "papers", "name", "query"]
+CALLS = [
+    ("get_weather_real", {"city": "Tokyo"}),
+    ("get_weather_real", {"city": "London"}),
+    ("say_hello", {"name": "alice"}),
+    ("count_papers", {"papers": ["Attention Is All You Need"]}),
+]
+
+
+def _make_rules(count, seed=11):
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        word = "".join(rng.choices(string.ascii_lowercase, k=8))
+        rule = {"tool": rng.choice(TOOLS), "arg": rng.choice(ARGS)}
+        if i % 10 == 0:
+            rule["deny_patterns"] = [rf"\b{word}\b"]
+        else:
+            rule["deny"] = [word]
+        rules.append(rule)
+    rules.append({"tool": "get_weather_real", "arg": "city", "deny": ["paris"]})
+    return rules
+
+
+def linear_check(rules, tool_name, args):
+    for rule in rules:
+        if rule["tool"] != tool_name or rule["arg"] not in args:
+            continue
+        value = args[rule["arg"]]
+        for item in value if isinstance(value, list) else [value]:
+            item = str(item).strip().casefold()
+            if item in rule.get("deny", ()):
+                return rule
+            if any(re.search(p, item, re.IGNORECASE) for p in rule.get("deny_patterns", ())):
+                return rule
+    return None
+
+
+def _per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number / len(CALLS) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'linear us':>10} {'indexed us':>11} {'cached us':>10}")
+    for count in args.rules:
+        rules = _make_rules(count)
+        uncached = ToolPolicy(rules, cache_size=1)
+        cached = ToolPolicy(rules)
+        counter = iter(range(10 ** 9))
+
+        def run_linear():
+            for tool_name, call_args in CALLS:
+                linear_check(rules, tool_name, call_args)
+
+        def run_indexed():
+            n = next(counter)  # new values every round so the LRU never helps
+            for tool_name, call_args in CALLS:
+                uncached.check(tool_name, {k: f"{v}{n}" if isinstance(v, str) else v for k, v in call_args.items()})
+
+        def run_cached():
+            for tool_name, call_args in CALLS:
+                cached.check(tool_name, call_args)
+
+        linear = _per_call_us(run_linear, args.number)
+        indexed = _per_call_us(run_indexed, args.number)
+        hit = _per_call_us(run_cached, args.number)
+        print(f"{count:>6} {linear:>10.2f} {indexed:>11.2f} {hit:>10.2f}")
+
+    # Reference: the callback as wired into weather_agent_v6_tool_guardrail
+    from agent_team import agent
+    tool = SimpleNamespace(name="get_weather_real")
+    tool_context = SimpleNamespace(state={}, agent_name="bench")
+    with contextlib.redirect_stdout(io.StringIO()):
+        per_call = min(timeit.repeat(
+            lambda: agent.block_paris_tool_guardrail(tool, {"city": "Tokyo"}, tool_context),
+            number=args.number, repeat=3)) / args.number * 1e6
+    print(f"block_paris_tool_guardrail (policy-backed): {per_call:.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Overhead of TracingPlugin compared with LoggingPlugin and with no observability plugin.
+
+Drives each target through a real ADK Runner against FakeLlm (no model latency
+by default, so plugin cost isn't hidden behind it), once per configuration:
+
+  none             the target's other plugins only
+  logging          + LoggingPlugin, stdout to a line-buffered file (like a pipe)
+  tracing          + TracingPlugin, histograms and token counters only
+  tracing-export   + TracingPlugin exporting every span to a JSONL file
+  tracing-sampled  + TracingPlugin exporting 10% of invocations
+
+Configurations take turns each iteration so drift affects them equally.
+Reports p50/p95 wall time per run and the p50 added over "none", plus the raw
+cost of `Tracer.record` per span.
+
+    python -m benchmarks.tracing_overhead --iterations 200
+    python -m benchmarks.tracing_overhead --targets agent_team --model-latency 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from google.adk.plugins.logging_plugin import LoggingPlugin
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_common.fakes import FakeLlm, FakeWeatherSession, install_fakes
+from agent_common.search_cache import StubSearchBackend
+from agent_common.tracing import Tracer, TracingPlugin
+from benchmarks.agents import SCRIPTS, TARGETS, _percentile, load_target, reset_corpus
+
+CONFIGS = ("none", "logging", "tracing", "tracing-export", "tracing-sampled")
+
+
+def make_plugins(config: str, workdir: str) -> List[Any]:
+    if config == "logging":
+        return [LoggingPlugin()]
+    if config == "tracing":
+        return [TracingPlugin(tracer=Tracer())]
+    if config == "tracing-export":
+        return [TracingPlugin(tracer=Tracer(path=os.path.join(workdir, "trace-all.jsonl")))]
+    if config == "tracing-sampled":
+        return [TracingPlugin(tracer=Tracer(path=os.path.join(workdir, "trace-sampled.jsonl"), sample_rate=0.1))]
+    return []
+
+
+async def run_once(runner: Runner, query: str) -> float:
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    started = time.perf_counter()
+    async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        pass
+    elapsed = time.perf_counter() - started
+    await runner.session_service.delete_session(app_name=runner.app_name, user_id="bench", session_id=session.id)
+    return elapsed
+
+
+async def bench_target(name: str, args, workdir: str) -> Dict[str, Any]:
+    module_name, query_template = TARGETS[name]
+    module, root_agent, plugins = load_target(module_name)
+    llm = FakeLlm(latency_s=args.model_latency, output_tokens=args.output_tokens, scripts=SCRIPTS)
+    install_fakes(root_agent, llm, StubSearchBackend(latency=args.tool_latency))
+    if name == "agent_team":
+        from agent_team.weather_service import WeatherService
+        module.weather_service = WeatherService(session=FakeWeatherSession(args.tool_latency), cache_ttl=0, stale_ttl=0)
+
+    runners = {config: Runner(app_name="benchmark", agent=root_agent, plugins=plugins + make_plugins(config, workdir),
+                              session_service=InMemorySessionService())
+               for config in args.configs}
+    walls: Dict[str, List[float]] = {config: [] for config in args.configs}
+    log_path = os.path.join(workdir, f"{name}.log")
+    with open(log_path, "w", encoding="utf-8", buffering=1) as log, contextlib.redirect_stdout(log):
+        for i in range(args.warmup + args.iterations):
+            for config, runner in runners.items():
+                reset_corpus(module)  # the configurations send the same queries
+                wall = await run_once(runner, query_template.format(i=i))
+                if i >= args.warmup:
+                    walls[config].append(wall)
+    result = {"configs": {}, "log_bytes": os.path.getsize(log_path)}
+    baseline = statistics.median(walls["none"]) if "none" in walls else None
+    for config, runner in runners.items():
+        p50 = statistics.median(walls[config])
+        entry = {"p50_ms": p50 * 1000, "p95_ms": _percentile(walls[config], 95) * 1000,
+                 "added_ms": (p50 - baseline) * 1000 if baseline is not None else None}
+        tracing = [p for p in runner.plugin_manager.plugins if isinstance(p, TracingPlugin)]
+        if tracing:
+            tracing[0].tracer.close()
+            stats = tracing[0].tracer.stats()
+            entry["spans"] = sum(h["count"] for spans in stats["spans"].values() for h in spans.values())
+            entry["exported"] = stats["export"]["exported"]
+            entry["dropped"] = stats["export"]["dropped"]
+        result["configs"][config] = entry
+        await runner.close()
+    return result
+
+
+def record_cost(n: int = 200_000) -> Dict[str, float]:
+    """Nanoseconds per `Tracer.record` call, without and with the ring buffer."""
+    costs = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, tracer in (("histogram only", Tracer()),
+                              ("histogram + ring", Tracer(path=os.path.join(workdir, "spans.jsonl")))):
+            started = time.perf_counter_ns()
+            for i in range(n):
+                tracer.record("tool", "get_weather_real", "weather_agent", "inv", 0, 1000 + i % 5000)
+            costs[label] = (time.perf_counter_ns() - started) / n
+            tracer.close()
+    return costs
+
+
+async def run(args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as workdir:
+        return {name: await bench_target(name, args, workdir) for name in args.targets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=["agent_team", "research-agent"])
+    parser.add_argument("--configs", nargs="+", choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--model-latency", type=float, default=0.0, help="fake model time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="stub search/weather latency (s)")
+    parser.add_argument("--output-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'target':<16} {'config':<16} {'p50 ms':>8} {'p95 ms':>8} {'added ms':>9} {'spans':>7} {'exported':>9} {'dropped':>8}")
+    for name, result in results.items():
+        for config, r in result["configs"].items():
+            added = f"{r['added_ms']:+9.3f}" if r["added_ms"] is not None else f"{'':>9}"
+            print(f"{name:<16} {config:<16} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {added} "
+                  f"{r.get('spans', ''):>7} {r.get('exported', ''):>9} {r.get('dropped', ''):>8}")
+        print(f"{name:<16} stdout written by the run: {result['log_bytes'] / 1024:.0f} KiB")
+    for label, ns in record_cost().items():
+        print(f"Tracer.record ({label}): {ns:.0f} ns/span")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
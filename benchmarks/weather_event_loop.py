@@ -0,0 +1,103 @@
+"""Load test: does a slow weather API stall unrelated sessions on the event loop?
+
+Runs "unrelated" session tasks that each do a tiny amount of async work and
+records their latency while weather lookups hammer a fake OpenWeatherMap
+endpoint with a configurable latency. Compares the old blocking call
+(`get_current` on the loop) with the thread-offloaded `get_weather_real`.
+
+    python -m benchmarks.weather_event_loop --latencies 0.05 0.1 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from types import SimpleNamespace
+
+from agent_common.fakes import FakeWeatherSession
+from agent_team import agent
+from agent_team.weather_service import WeatherService
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _unrelated_session(samples, stop):
+    # One "request" of another session: a few awaits and a little CPU.
+    while not stop.is_set():
+        start = time.perf_counter()
+        for _ in range(3):
+            await asyncio.sleep(0.001)
+        sum(range(200))
+        samples.append(time.perf_counter() - start)
+
+
+async def _weather_worker(mode, cities, stop):
+    tool_context = SimpleNamespace(state={}, agent_name="bench")
+    while not stop.is_set():
+        city = next(cities)
+        if mode == "blocking":
+            agent.weather_service.get_current(city, "metric")
+        else:
+            await agent.get_weather_real(city, tool_context)
+        await asyncio.sleep(0)
+
+
+async def _run_scenario(mode, latency, duration, sessions, weather_workers):
+    # A fresh service with caching effectively disabled: every call goes upstream.
+    agent.weather_service = WeatherService(session=FakeWeatherSession(latency), cache_ttl=0, stale_ttl=0)
+    cities = (f"city-{i}" for i in itertools.count())
+    samples, stop = [], asyncio.Event()
+    tasks = [asyncio.create_task(_unrelated_session(samples, stop)) for _ in range(sessions)]
+    tasks += [asyncio.create_task(_weather_worker(mode, cities, stop)) for _ in range(weather_workers)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    upstream = agent.weather_service.upstream_requests
+    agent.weather_service.close()
+    return {
+        "mode": mode,
+        "api_latency_ms": latency * 1000,
+        "requests": len(samples),
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        "weather_calls": upstream,
+    }
+
+
+async def _multi_city_turn(latency):
+    # Three weather calls emitted in one model turn; ADK gathers them.
+    agent.weather_service = WeatherService(session=FakeWeatherSession(latency), cache_ttl=0, stale_ttl=0)
+    tool_context = SimpleNamespace(state={}, agent_name="bench")
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.get_weather_real(c, tool_context) for c in ("Tokyo", "London", "New York")))
+    elapsed = time.perf_counter() - start
+    agent.weather_service.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.05, 0.1, 0.2, 0.4])
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--weather-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'api ms':>7} {'reqs':>7} {'p50 ms':>8} {'p99 ms':>8} {'weather':>8}")
+    for latency in args.latencies:
+        for mode in ("blocking", "async"):
+            row = asyncio.run(_run_scenario(mode, latency, args.duration, args.sessions, args.weather_workers))
+            print(f"{row['mode']:<9} {row['api_latency_ms']:>7.0f} {row['requests']:>7} "
+                  f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['weather_calls']:>8}")
+
+    for latency in args.latencies:
+        elapsed = asyncio.run(_multi_city_turn(latency))
+        print(f"3-city turn at {latency * 1000:.0f} ms API latency: {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,8 @@
-from . import agent
+"""Research paper finder and counter.
+
+Importing the package builds nothing: `root_agent`, `app` and `agent` load the
+agent module on first access (see agent_common/registry.py).
+"""
+from agent_common.registry import lazy_agent_attributes
+
+__getattr__, __dir__ = lazy_agent_attributes(__name__)
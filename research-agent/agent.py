@@ -1,61 +1,141 @@
 import os
-from dotenv import load_dotenv
 import sys
-import warnings
+import uuid
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
+from google.adk.apps import App
 from google.adk.tools.agent_tool import AgentTool
 from google.adk.tools.google_search_tool import google_search
-from google.adk.runners import InMemoryRunner
+from google.adk.runners import Runner
 from google.adk.plugins.logging_plugin import (
     LoggingPlugin,
-)  # <---- 1. Import the Plugin
+)  # <---- 1. Import the Plugin (verbose mode only, see App Setup)
 from google.genai import types
 import asyncio
 
 from google.genai import types
-from typing import List
+from typing import Any, Dict, List, Optional
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.tool_context import ToolContext
 
-# --- Load environment variables from .env file ---
-# This line finds the .env file and loads its contents into os.environ
-load_dotenv()
+# When run as a script (`python agent.py ...`), make the repo root importable
+# so the shared agent_common package resolves.
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# The Google ADK/GenAI client will automatically look for this key.
-# However, you can verify it loaded or access it manually:
-api_key_value = os.getenv("GOOGLE_API_KEY")
+from agent_common.model_pool import PooledGemini, model_pool
+from agent_common.model_router import ModelRouterPlugin, RoutePolicy
+from agent_common.paper_corpus import FRESH, STALE, PaperCorpus
+from agent_common.search_cache import SearchCachePlugin
+from agent_common.tracing import TracingPlugin, traced_callback
 
-if not api_key_value:
-    print("FATAL ERROR: GOOGLE_API_KEY environment variable not found.")
-    # You might want to exit or raise an error here
-    exit()
 
-# Suppress aiohttp warnings about unclosed sessions
-warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed client session")
-warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed connector")
+def check_environment():
+    """Loads .env and exits if GOOGLE_API_KEY is missing. Called by the command-line entry points, not on import."""
+    from dotenv import load_dotenv
 
+    # --- Load environment variables from .env file ---
+    # This line finds the .env file and loads its contents into os.environ
+    load_dotenv()
+
+    # The Google ADK/GenAI client will automatically look for this key.
+    # However, you can verify it loaded or access it manually:
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("FATAL ERROR: GOOGLE_API_KEY environment variable not found.")
+        sys.exit(1)
+
+# PooledGemini retries through the process-wide rate limiter (agent_common/rate_limit.py), which
+# also halves its concurrency window on 429/503, so retries stay short: ~1s, 2s, 4s, 8s, jittered.
 retry_config = types.HttpRetryOptions(
-    attempts=5,  # Maximum retry attempts
-    exp_base=7,  # Delay multiplier
+    attempts=5,  # Maximum attempts, including the first
+    exp_base=2,  # Delay multiplier
     initial_delay=1,
+    max_delay=20,  # Cap on any single wait
+    jitter=0.5,  # Randomized fraction of each wait, so agents don't retry in lockstep
     http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
 )
 
 
-def count_papers(papers: List[str]):
+# --- Paper Corpus ---
+# Every paper found is kept in a local SQLite corpus, deduplicated by arXiv ID, DOI and (fuzzy) title,
+# along with which topics found it and when. RESEARCH_CORPUS_DB="" keeps the corpus in memory;
+# CORPUS_FRESH_S is how long a topic's last search is reused without searching again (default 24h).
+CORPUS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.db")
+CORPUS_MAX_LISTED = 50  # known papers listed in the prompt when a topic is searched again
+# State key holding the known-papers context for every model call of the turn that searches again
+CORPUS_CONTEXT_KEY = "corpus_context"
+
+_corpus: Optional[PaperCorpus] = None
+
+
+def get_corpus() -> PaperCorpus:
+    """The paper corpus, opened on first use rather than on import."""
+    global _corpus
+    if _corpus is None:
+        _corpus = PaperCorpus.from_env(CORPUS_DB)
+    return _corpus
+
+
+def count_papers(papers: List[str], tool_context: ToolContext) -> Dict[str, Any]:
     """
-    This function counts the number of papers in a list of strings.
+    This function counts the distinct research papers in a list and saves them to the local corpus.
+    The same paper written two ways (other title casing, with/without arXiv ID or DOI) counts once.
     Args:
-      papers: A list of strings, where each string is a research paper.
+      papers: A list of strings, where each string is a research paper (title, and any authors, year, arXiv ID, DOI or link).
     Returns:
-      The number of papers in the list.
+      count: the number of distinct papers in the list.
+      duplicates: entries that repeat an earlier paper.
+      topic_total: all papers known for the user's topic, including ones found by earlier searches.
     """
-    return len(papers)
+    topic = " ".join(p.text for p in tool_context.user_content.parts if p.text) if tool_context.user_content else None
+    result = get_corpus().add_many(papers, topic=topic)
+    return {"count": result["count"], "new_to_corpus": result["new"], "duplicates": result["duplicates"],
+            "topic_total": result["topic_total"]}
+
+
+@traced_callback
+def corpus_fast_path(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Answers a topic searched within CORPUS_FRESH_S straight from the corpus, with no search or
+    model call. For a topic searched before that, lists the known papers and asks the model to
+    search only for newer ones (on every model call of that turn, up to the final answer).
+    New topics fall through.
+    """
+    if not llm_request.contents:
+        return None
+    latest = llm_request.contents[-1]
+    if latest.role != "user" or not latest.parts or not latest.parts[0].text:
+        # Later call of the turn (the latest content is a tool result): keep the known papers in view
+        context = callback_context.state.get(CORPUS_CONTEXT_KEY)
+        if context and context["invocation_id"] == callback_context.invocation_id:
+            llm_request.append_instructions([context["text"]])
+        return None
+    hit = get_corpus().topic(latest.parts[0].text)
+    if not hit.papers:
+        return None
+    if hit.status == FRESH:
+        listed = "\n".join(f"{i}. {paper.cite()}" for i, paper in enumerate(hit.papers, 1))
+        callback_context.state["corpus_fast_path_hits"] = callback_context.state.get("corpus_fast_path_hits", 0) + 1
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(
+            text=f"Research papers (from the local corpus, searched {hit.since}):\n{listed}\n\n"
+                 f"Total number of papers: {len(hit.papers)}")]))
+    if hit.status == STALE:
+        known = "\n".join(f"- {paper.cite()}" for paper in hit.papers[:CORPUS_MAX_LISTED])
+        text = (
+            f"The local corpus already has {len(hit.papers)} papers on this topic, last searched on {hit.since}:\n{known}\n"
+            f"Ask 'google_search_agent' only for papers published after {hit.since}. Pass just the new papers to "
+            f"'count_papers'; its topic_total includes the known ones. Return the known and the new papers and topic_total."
+        )
+        llm_request.append_instructions([text])
+        callback_context.state[CORPUS_CONTEXT_KEY] = {"invocation_id": callback_context.invocation_id, "text": text}
+    return None
 
 
 # Google search agent
 google_search_agent = LlmAgent(
     name="google_search_agent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     description="Searches for information using Google search",
     instruction="Use the google_search tool to find information on the given topic. Return the raw search results.",
     tools=[google_search],
@@ -64,84 +144,132 @@ google_search_agent = LlmAgent(
 # Root agent
 root_agent = LlmAgent(
     name="research_paper_finder_agent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=PooledGemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     instruction="""Your task is to find research papers and count them. 
 
    You must follow these steps:
    1) Find research papers on the user provided topic using the 'google_search_agent'. 
-   2) Then, pass the papers to 'count_papers' tool to count the number of papers returned.
+   2) Then, pass the papers to 'count_papers' tool to count the number of papers returned. It drops duplicates.
    3) Return both the list of research papers and the total number of papers.
    """,
     tools=[AgentTool(agent=google_search_agent), count_papers],
+    before_model_callback=corpus_fast_path,  # repeated topics: cached answer, or search only for newer papers
 )
 
-print("✅ Agent created")
+# --- App Setup ---
+# Plugins are passed with the App (and so to every Runner for it), not to the Agent.
+# `adk run`/`adk web` pick up `app` (with its plugins) before `root_agent`.
+# TracingPlugin covers ALL agents without printing: latency histograms and token counts in
+# memory, sampled spans to TRACE_FILE. RESEARCH_VERBOSE_LOGGING=1 adds the LoggingPlugin,
+# which prints every callback (synchronous stdout writes; for debugging, not under load).
+VERBOSE_LOGGING = os.getenv("RESEARCH_VERBOSE_LOGGING", "0") == "1"
+tracing_plugin = TracingPlugin.from_env()
+# Search turns stay on the cheap model; the final list may use the stronger one when results are long.
+# MODEL_ROUTER_SESSION_BUDGET caps the tokens one session may spend.
+model_router = ModelRouterPlugin.from_env({
+    "google_search_agent": RoutePolicy("tool"),
+    "research_paper_finder_agent": RoutePolicy("general", max_output_tokens=2048),
+})
 
-# --- Runner Setup ---
-# The LoggingPlugin is correctly passed to the Runner, not the Agent.
-runner = InMemoryRunner(
-    agent=root_agent,
+app = App(
+    name="research_agent",
+    root_agent=root_agent,
     plugins=[
-        LoggingPlugin()
-    ],  # <---- 2. Add the plugin. Handles standard Observability logging across ALL agents
+        *([LoggingPlugin()] if VERBOSE_LOGGING else []),  # <---- 2. Add the plugin (opt-in)
+        tracing_plugin,
+        model_router,
+        SearchCachePlugin(),  # Dedupes/caches google_search_agent's grounded searches
+    ],
 )
 
-print("✅ Runner configured")
+# --- Session Store ---
+# Sessions and state are kept in SQLite (WAL) so they survive restarts and can be shared by
+# several worker processes. RESEARCH_SESSION_DB="" falls back to in-memory sessions.
+SESSION_DB = os.getenv("RESEARCH_SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+
+_runner: Optional[Runner] = None
+
+
+def get_runner() -> Runner:
+    """The command-line runner, created (with its session store) on first use rather than on import."""
+    global _runner
+    if _runner is None:
+        if SESSION_DB:
+            from agent_common.session_store import SqliteSessionService
+            session_service = SqliteSessionService(SESSION_DB)
+        else:
+            from google.adk.sessions import InMemorySessionService
+            session_service = InMemorySessionService()
+        _runner = Runner(app=app, session_service=session_service)
+        print("✅ Runner configured")
+    return _runner
+
+
+def final_response_text(events) -> str:
+    """Returns the text of the final response among `events`."""
+    # Iterate through the list of events to find the final response
+    for event in events:
+        # Check if the event is the final response intended for the user
+        if event.is_final_response():
+            # The final response event is a Content object, so we extract the text
+            if event.content and event.content.parts:
+                return event.content.parts[0].text
+    return "No final response found."
+
+
+async def start_clients():
+    """Creates the shared model client up front so the first query doesn't pay for it."""
+    await model_pool.startup(((root_agent.model.model, None),))  # pooled clients don't retry themselves
+
+
+async def close_clients():
+    """Closes the shared model clients, the runner and the session store."""
+    try:
+        # Both agents share one pooled client (same model and retry config);
+        # shutdown closes it and its connections explicitly.
+        await model_pool.shutdown()
+    finally:
+        if _runner is not None:
+            # Ensure the Runner itself is closed (plugins, services)
+            await _runner.close()
+            from agent_common.session_store import SqliteSessionService
+            if isinstance(_runner.session_service, SqliteSessionService):
+                # Writes queued in the last flush interval go to disk here
+                await _runner.session_service.close()
+        if _corpus is not None:
+            _corpus.close()
 
 
 async def main(query: str):
     """Runs the agent with the provided query and prints the final result."""
-    print("🚀 Running agent with LoggingPlugin...")
-    print("📊 Watch the comprehensive logging output below:\n")
+    print("🚀 Running agent" + (" with LoggingPlugin..." if VERBOSE_LOGGING else "..."))
     print(f"User Query: {query}")
+    await start_clients()
     try:
         # runner.run_debug() returns a list of events.
         # We rename the variable to 'events' for clarity.
-        events = await runner.run_debug(query)
-
-        final_response_text = "No final response found."
-
-        # Iterate through the list of events to find the final response
-        for event in events:
-            # Check if the event is the final response intended for the user
-            if event.is_final_response():
-                # The final response event is a Content object, so we extract the text
-                if event.content and event.content.parts:
-                    final_response_text = event.content.parts[0].text
-                    break  # Found the final answer, so stop iterating
-        # --- Client Cleanup ---
-
-        # 1. Close the root agent's client
-        root_client = root_agent.model.api_client
-        if root_client is not None:
-            try:
-                await root_client.close()
-            except Exception:
-                # Added a try/except just in case the client object is valid but failed to close
-                pass
-
-        # 2. Close the sub-agent's client
-        sub_agent_client = google_search_agent.model.api_client
-        if sub_agent_client is not None:
-            try:
-                await sub_agent_client.close()
-            except Exception:
-                pass
-
+        # A new session per CLI run: run_debug's default id would keep appending to one stored session.
+        events = await get_runner().run_debug(query, session_id=f"cli-{uuid.uuid4().hex}")
+        final_text = final_response_text(events)
     finally:
-        # 3. Ensure the Runner itself is closed (if it has a close method)
-        # Note: Check ADK documentation, but many async runners/services require cleanup.
-        if hasattr(runner, 'close'):
-            await runner.close()
+        # --- Client Cleanup ---
+        await close_clients()
 
     print("\n--- Final Agent Response ---")
     # Print the extracted text
-    print(final_response_text)
+    print(final_text)
     print("----------------------------")
+    if _corpus is not None:
+        print(f"Corpus: {_corpus.summary()}")
+    print("\n--- Trace Summary (ms) ---")
+    for kind, spans in tracing_plugin.tracer.stats()["spans"].items():
+        for name, h in spans.items():
+            print(f"{kind:<8} {name:<40} n={h['count']:<3} p50={h['p50_ms']:.1f} max={h['max_ms']:.1f}")
 
 
 # --- Command Line Entry Point ---
 if __name__ == "__main__":
+    check_environment()
     if len(sys.argv) < 2:
         # If no argument is passed, use a default query
         default_query = "Find recent papers on large language model safety and count them."
@@ -0,0 +1,229 @@
+"""Batch mode: run many research queries from a JSONL file on one warm runner.
+
+Each input line is a JSON object with the query in "query" (or "prompt",
+"body", "title", or the field given by --field) and an optional "id" /
+"request_id"; a bare JSON string also works. Queries run concurrently (bounded
+by --concurrency), each in its own session, and every result is appended to
+the output JSONL as soon as it finishes. A checkpoint next to the output
+records the input offset up to which everything is done, so a crashed run
+resumes where it left off.
+
+Command: python batch.py queries.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from google.genai import types
+
+if __package__:
+    from .agent import check_environment, close_clients, final_response_text, get_runner, model_pool, start_clients
+else:
+    from agent import check_environment, close_clients, final_response_text, get_runner, model_pool, start_clients
+from agent_common.rate_limit import rate_limiter, set_batch_priority
+
+QUERY_FIELDS = ("query", "prompt", "body", "title")
+USER_ID = "batch_user"
+
+
+def _parse_query(raw: bytes, field: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Returns (query, id) for one JSONL line; query is None for blank lines."""
+    text = raw.decode("utf-8").strip()
+    if not text:
+        return None, None
+    record = json.loads(text)
+    if isinstance(record, str):
+        return record, None
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object or string, got {type(record).__name__}: {text[:80]}")
+    fields = (field,) if field else QUERY_FIELDS
+    query = next((record[f] for f in fields if record.get(f)), None)
+    if query is None:
+        raise ValueError(f"no query field ({', '.join(fields)}) in line: {text[:80]}")
+    record_id = record.get("id", record.get("request_id"))
+    return str(query), None if record_id is None else str(record_id)
+
+
+class Checkpoint:
+    """Tracks the input offset below which every line has a result."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.line = 0  # number of leading input lines fully done
+        self.offset = 0  # byte offset just after those lines
+        self._ends: Dict[int, int] = {}  # line number -> byte offset after it
+        self._done: Set[int] = set()
+
+    def load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.line, self.offset = saved["line"], saved["offset"]
+
+    def started(self, line_no: int, end_offset: int) -> None:
+        self._ends[line_no] = end_offset
+
+    def finished(self, line_no: int) -> None:
+        self._done.add(line_no)
+        advanced = False
+        while self.line + 1 in self._done:
+            self.line += 1
+            self._done.discard(self.line)
+            self.offset = self._ends.pop(self.line)
+            advanced = True
+        if advanced:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"line": self.line, "offset": self.offset}, f)
+            os.replace(tmp, self.path)
+
+
+def _already_written(output_path: str, after_line: int) -> Set[int]:
+    """Line numbers past the checkpoint that already have a result in the output."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for raw in f:
+            try:
+                line_no = json.loads(raw)["line"]
+            except (ValueError, KeyError, TypeError):
+                continue  # torn last line from a crash
+            if line_no > after_line:
+                done.add(line_no)
+    return done
+
+
+async def run_query(query: str) -> Tuple[str, int]:
+    """Runs one query in a fresh session; returns (final text, event count)."""
+    runner = get_runner()
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=USER_ID, session_id=f"batch-{uuid.uuid4().hex}"
+    )
+    events = []
+    try:
+        async for event in runner.run_async(
+            user_id=USER_ID,
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=query)]),
+        ):
+            events.append(event)
+    finally:
+        # Batch sessions are never revisited; don't let them pile up in the session store
+        await runner.session_service.delete_session(
+            app_name=runner.app_name, user_id=USER_ID, session_id=session.id
+        )
+    return final_response_text(events), len(events)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 4,
+    field: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Runs every query in `input_path`, appending results to `output_path`. Returns the summary."""
+    # Model calls from the workers (tasks inherit this) queue behind interactive requests in the same process
+    set_batch_priority()
+    checkpoint = Checkpoint(checkpoint_path or output_path + ".checkpoint")
+    checkpoint.load()
+    skip = _already_written(output_path, checkpoint.line)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def worker():
+            nonlocal errors
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                line_no, record_id, query = item
+                t0 = time.perf_counter()
+                result: Dict[str, Any] = {"line": line_no, "id": record_id, "query": query}
+                try:
+                    result["response"], result["events"] = await run_query(query)
+                except Exception as e:
+                    errors += 1
+                    result["error"] = f"{type(e).__name__}: {e}"
+                result["latency_s"] = round(time.perf_counter() - t0, 3)
+                latencies.append(result["latency_s"])
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                checkpoint.finished(line_no)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            with open(input_path, "rb") as source:
+                source.seek(checkpoint.offset)
+                line_no, offset = checkpoint.line, checkpoint.offset
+                for raw in iter(source.readline, b""):
+                    line_no += 1
+                    offset += len(raw)
+                    checkpoint.started(line_no, offset)
+                    try:
+                        query, record_id = _parse_query(raw, field)
+                    except ValueError as e:
+                        query, record_id = None, None
+                        out.write(json.dumps({"line": line_no, "error": f"bad input: {e}"}) + "\n")
+                        errors += 1
+                    if query is None or line_no in skip:
+                        checkpoint.finished(line_no)
+                        continue
+                    await queue.put((line_no, record_id or str(line_no), query))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "queries": len(latencies),
+        "errors": errors,
+        "skipped_already_done": len(skip),
+        "wall_time_s": round(elapsed, 3),
+        "throughput_qps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "latency_p99_s": _percentile(latencies, 99),
+        "latency_max_s": max(latencies, default=0.0),
+        "model_pool": model_pool.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    await start_clients()
+    try:
+        summary = await run_batch(args.input, args.output, args.concurrency, args.field, args.checkpoint)
+    finally:
+        await close_clients()
+    print("\n--- Batch Summary ---")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    check_environment()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one query per line")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries in flight at once")
+    parser.add_argument("--field", help="JSON field holding the query (default: query/prompt/body/title)")
+    parser.add_argument("--checkpoint", help="checkpoint path (default: <output>.checkpoint)")
+    asyncio.run(main(parser.parse_args()))
+    print("✅ Batch finished.")
@@ -0,0 +1,21 @@
+"""Custom services for `adk web` / `adk api_server` run from this directory.
+
+Registers the "walsqlite" session scheme (agent_common.session_store), so any
+agent here can keep durable, multi-process sessions:
+
+    adk web --session_service_uri walsqlite:///sessions.db .
+"""
+from urllib.parse import urlparse
+
+from google.adk.cli.service_registry import get_service_registry
+
+
+def walsqlite_session_factory(uri: str, **kwargs):
+    from agent_common.session_store import SqliteSessionService
+
+    # Same convention as ADK's sqlite:// scheme: walsqlite:///rel.db, walsqlite:////abs/path.db
+    path = urlparse(uri).path
+    return SqliteSessionService(path[1:] if path.startswith("/") else path or "sessions.db")
+
+
+get_service_registry().register_session_service("walsqlite", walsqlite_session_factory)